@@ -0,0 +1,735 @@
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# umask del proceso, leída una vez al importar (os.umask solo se puede leer cambiándola)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def escribir_atomico(ruta, texto):
+
+    # Escribe el texto en un temporal del mismo directorio y lo renombra sobre la ruta final.
+    # Si el proceso se corta a mitad de escritura el archivo original queda intacto.
+    # mkstemp crea el temporal con permisos 0600: se le dan los del archivo que reemplaza
+    # (o los de un archivo nuevo según la umask) para que no cambien al renombrar.
+
+    try:
+        permisos = os.stat(ruta).st_mode & 0o7777
+    except FileNotFoundError:
+        permisos = 0o666 & ~_UMASK
+
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    fd, temporal = tempfile.mkstemp(dir=directorio, prefix=".", suffix=".tmp")
+    try:
+        os.chmod(temporal, permisos)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(texto)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def firma_archivo(ruta):
+
+    # (mtime en ns, tamaño) del archivo, o None si no existe.
+    # Sirve para detectar si otro proceso lo modificó.
+
+    try:
+        estado = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return (estado.st_mtime_ns, estado.st_size)
+
+
+class AgendaDesactualizada(Exception):
+
+    # Otro escritor guardó la agenda después de la última lectura de este planificador.
+    pass
+
+
+class CandadoArchivo:
+
+    # Candado exclusivo sobre ruta, entre procesos (flock / msvcrt.locking) y entre
+    # hilos del mismo proceso. Es reentrante para el hilo que lo tiene.
+    # Solo lo toman los escritores; las lecturas nunca esperan, porque los archivos
+    # se reemplazan enteros (escribir_atomico) y la bitácora solo crece.
+
+    _estados = {}
+    _estados_candado = threading.Lock()
+
+    def __init__(self, ruta):
+
+        self.ruta = ruta
+        with self._estados_candado:
+            self._estado = self._estados.setdefault(
+                os.path.abspath(ruta), {"hilo": threading.RLock(), "archivo": None, "nivel": 0}
+            )
+
+
+    def __enter__(self):
+
+        estado = self._estado
+        estado["hilo"].acquire()
+        try:
+            if estado["nivel"] == 0:
+                archivo = open(self.ruta, "a+b")
+                try:
+                    _bloquear(archivo)
+                except BaseException:
+                    archivo.close()
+                    raise
+                estado["archivo"] = archivo
+            estado["nivel"] += 1
+        except BaseException:
+            estado["hilo"].release()
+            raise
+        return self
+
+
+    def __exit__(self, *excepcion):
+
+        estado = self._estado
+        try:
+            estado["nivel"] -= 1
+            if estado["nivel"] == 0:
+                archivo, estado["archivo"] = estado["archivo"], None
+                try:
+                    _desbloquear(archivo)
+                finally:
+                    archivo.close()
+        finally:
+            estado["hilo"].release()
+
+
+def _bloquear(archivo):
+
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+        return
+
+    # msvcrt.locking reintenta durante unos segundos y después falla: se insiste
+    archivo.seek(0)
+    while True:
+        try:
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _desbloquear(archivo):
+
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+    else:
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class BitacoraInconsistente(Exception):
+
+    # La bitácora (archivo + ".log") no continúa la instantánea y no es por una
+    # compactación en curso: quedó de otra época de la agenda
+
+    pass
+
+
+def leer_version(archivo):
+
+    # Número de versión de la agenda guardada en archivo (archivo + ".version").
+    # Cada escritura lo incrementa; 0 si todavía no hay ninguna.
+
+    return _leer_version(archivo)[0]
+
+
+def leer_epoca(archivo):
+
+    # Época de la numeración de la bitácora: cambia cada vez que alguien reescribe la
+    # agenda con la secuencia vuelta a 0 (AlmacenamientoJSON.guardar). Una bitácora
+    # leída en otra época no se puede continuar aunque las secuencias parezcan seguir.
+
+    return _leer_version(archivo)[1]
+
+
+def _leer_version(archivo):
+
+    # (versión, época) de archivo + ".version" ("versión época"; los archivos de antes
+    # de las épocas tienen solo la versión)
+
+    try:
+        with open(archivo + ".version", "r", encoding="utf-8") as f:
+            partes = f.read().split()
+        return int(partes[0]) if partes else 0, int(partes[1]) if len(partes) > 1 else 0
+    except (FileNotFoundError, ValueError):
+        return 0, 0
+
+
+def nueva_version(archivo, nueva_epoca=False):
+
+    # Se llama con el candado de escritura tomado, después de guardar
+
+    version, epoca = _leer_version(archivo)
+    if nueva_epoca:
+        epoca += 1
+    escribir_atomico(archivo + ".version", f"{version + 1} {epoca}")
+
+
+# Lecturas seguidas de la bitácora sin que continúe la instantánea antes de darla por vieja
+REINTENTOS_LECTURA = 5
+
+
+def leer_eventos(archivo):
+
+    # Lee los eventos (serializados, con fechas como texto) de cualquiera de los dos formatos:
+    # - lista JSON simple (formato histórico de eventos.json)
+    # - instantánea {"secuencia": n, "eventos": [...]} más la bitácora archivo + ".log"
+    # Devuelve (eventos, última secuencia aplicada).
+    # No toma el candado: si entre la instantánea y la bitácora otro proceso compactó
+    # (la bitácora ya no sigue a la instantánea leída), se vuelve a leer, pocas veces.
+    # Si sigue sin continuarla, la bitácora es vieja: BitacoraInconsistente (los
+    # almacenamientos la apartan, ver AlmacenamientoJSON._leer).
+
+    for _ in range(REINTENTOS_LECTURA):
+        leido = _leer_eventos(archivo)
+        if leido is not None:
+            return leido
+
+    raise BitacoraInconsistente(
+        f"La bitácora {archivo}.log no continúa la instantánea de {archivo} "
+        f"(secuencia {_secuencia_instantanea(archivo)})"
+    )
+
+
+def _leer_eventos(archivo):
+
+    try:
+        with open(archivo, "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        datos = []
+
+    if isinstance(datos, dict):
+        secuencia = datos.get("secuencia", 0)
+        eventos = datos.get("eventos", [])
+    else:
+        secuencia = 0
+        eventos = datos
+
+    # Las bajas por id se aplican juntas al final (un solo recorrido de la lista)
+    eliminados = set()
+
+    try:
+        with open(archivo + ".log", "r", encoding="utf-8") as f:
+            for linea in f:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    # última línea incompleta por un corte durante la escritura
+                    break
+
+                if registro["seq"] <= secuencia:
+                    continue  # ya incluido en la instantánea
+                if registro["seq"] != secuencia + 1:
+                    return None  # la bitácora es de una instantánea más nueva
+                secuencia = registro["seq"]
+
+                if registro["op"] == "baja" and "id" in registro:
+                    eliminados.add(registro["id"])
+                else:
+                    _aplicar_registro(eventos, registro)
+    except FileNotFoundError:
+        pass
+
+    if eliminados:
+        eventos = [e for e in eventos if e.get("id") not in eliminados]
+
+    return eventos, secuencia
+
+
+def _aplicar_registro(eventos, registro):
+
+    if registro["op"] == "alta":
+        eventos.append(registro["evento"])
+        return
+
+    # baja de un evento sin id: se elimina el primero con el mismo tipo, sala y día
+    fecha = datetime.fromisoformat(registro["fecha"]).date()
+    for i, e in enumerate(eventos):
+        if (
+            e.get("tipo") == registro["tipo"] and
+            e.get("sala") == registro["sala"] and
+            datetime.fromisoformat(e["fecha"]).date() == fecha
+        ):
+            del eventos[i]
+            break
+
+
+class AlmacenamientoEventos:
+
+    # Interfaz de persistencia del planificador.
+    # Los eventos entran y salen serializados (fecha como texto ISO);
+    # obtener_eventos devuelve la lista serializada completa y solo se
+    # llama cuando el almacenamiento necesita reescribir todo.
+    # candado() protege las escrituras de varios planificadores sobre lo mismo
+    # (por defecto no hace nada) y firma() incluye la versión guardada.
+
+    def candado(self):
+        return nullcontext()
+
+    def cargar(self):
+        raise NotImplementedError
+
+    def guardar(self, eventos):
+        raise NotImplementedError
+
+    def registrar_altas(self, eventos, obtener_eventos):
+        raise NotImplementedError
+
+    def registrar_bajas(self, eventos, obtener_eventos):
+        raise NotImplementedError
+
+    def firma(self):
+        # Valor que cambia cada vez que cambia lo guardado en disco
+        raise NotImplementedError
+
+
+class AlmacenamientoJSON(AlmacenamientoEventos):
+
+    # Formato histórico: toda la agenda en un único archivo JSON que se reescribe en cada cambio.
+
+    def __init__(self, archivo="data/eventos.json"):
+        self.archivo = archivo
+
+
+    def candado(self):
+        return CandadoArchivo(self.archivo + ".lock")
+
+
+    def cargar(self):
+        eventos, _ = self._leer()
+        return eventos
+
+
+    def guardar(self, eventos):
+
+        # La lista simple vuelve la secuencia a 0: época nueva, para que quien siga la
+        # bitácora (DiarioEventos.novedades) no tome lo que se anote después como continuación
+
+        with self.candado():
+            escribir_atomico(
+                self.archivo, json.dumps(eventos, ensure_ascii=False, indent=2)
+            )
+
+            # una bitácora vieja ya no corresponde a este archivo
+            if os.path.exists(self.archivo + ".log"):
+                os.remove(self.archivo + ".log")
+
+            nueva_version(self.archivo, nueva_epoca=True)
+
+
+    def registrar_altas(self, eventos, obtener_eventos):
+        self.guardar(obtener_eventos())
+
+
+    def registrar_bajas(self, eventos, obtener_eventos):
+        self.guardar(obtener_eventos())
+
+
+    def _leer(self):
+
+        # leer_eventos; una bitácora que no continúa la instantánea se aparta
+        # (archivo + ".log.descartada", por si hay que revisarla a mano) con el candado
+        # tomado, y la agenda queda en lo que dice la instantánea, en una época nueva.
+
+        try:
+            return leer_eventos(self.archivo)
+        except BitacoraInconsistente:
+            with self.candado():
+                try:
+                    return leer_eventos(self.archivo)
+                except BitacoraInconsistente:
+                    os.replace(self.archivo + ".log", self.archivo + ".log.descartada")
+                    nueva_version(self.archivo, nueva_epoca=True)
+                    return leer_eventos(self.archivo)
+
+
+    def firma(self):
+        return (
+            leer_version(self.archivo), firma_archivo(self.archivo), firma_archivo(self.archivo + ".log")
+        )
+
+
+class DiarioEventos(AlmacenamientoJSON):
+
+    # Persistencia por bitácora: cada alta o baja agrega una línea JSON a archivo + ".log".
+    # Cuando la bitácora supera umbral_bytes se escribe una instantánea nueva en
+    # segundo plano y se descartan de la bitácora las líneas que ya quedaron incluidas.
+
+    UMBRAL_BYTES = 1024 * 1024
+
+    def __init__(self, archivo="data/eventos.json", umbral_bytes=UMBRAL_BYTES):
+
+        super().__init__(archivo)
+        self.bitacora = archivo + ".log"
+        self.umbral_bytes = umbral_bytes
+        self.secuencia = 0
+        self.epoca = 0
+
+        self._candado = threading.Lock()
+        self._compactacion = None
+
+
+    def cargar(self):
+
+        # Carga la última instantánea y reaplica la bitácora.
+        # La época se lee antes: si cambia durante la lectura, novedades lo nota.
+
+        self.epoca = leer_epoca(self.archivo)
+        eventos, self.secuencia = self._leer()
+        return eventos
+
+
+    def guardar(self, eventos):
+
+        # Reescribe todo con una secuencia nueva, para que una compactación en segundo
+        # plano armada antes (con la agenda anterior) no pise esta instantánea.
+        # Sigue la numeración (y la época) que está en disco.
+
+        with self.candado():
+            with self._candado:
+                self.secuencia += 1
+                self.epoca = leer_epoca(self.archivo)
+            self.compactar(eventos)
+            nueva_version(self.archivo)
+
+
+    def registrar_altas(self, eventos, obtener_eventos):
+        self.anotar([{"op": "alta", "evento": e} for e in eventos], obtener_eventos)
+
+
+    def registrar_bajas(self, eventos, obtener_eventos):
+
+        registros = []
+        for evento in eventos:
+            registro = {
+                "op": "baja",
+                "tipo": evento["tipo"],
+                "sala": evento["sala"],
+                "fecha": datetime.fromisoformat(evento["fecha"]).date().isoformat(),
+            }
+            if "id" in evento:
+                registro["id"] = evento["id"]
+            registros.append(registro)
+
+        self.anotar(registros, obtener_eventos)
+
+
+    def anotar(self, registros, obtener_eventos):
+
+        # Agrega los registros ({"op": "alta", "evento": ...} o {"op": "baja", ...}) a la bitácora.
+        # obtener_eventos devuelve la lista serializada actual y solo se llama si hay que compactar.
+
+        with self.candado(), self._candado:
+            lineas = []
+            for registro in registros:
+                self.secuencia += 1
+                lineas.append(json.dumps({"seq": self.secuencia, **registro}, ensure_ascii=False))
+
+            with open(self.bitacora, "a", encoding="utf-8") as f:
+                f.write("\n".join(lineas) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+                tamano = f.tell()
+
+            nueva_version(self.archivo)
+
+        en_curso = self._compactacion is not None and self._compactacion.is_alive()
+        if tamano > self.umbral_bytes and not en_curso:
+            self.compactar(obtener_eventos(), en_segundo_plano=True)
+
+
+    def compactar(self, eventos, en_segundo_plano=False):
+
+        # Escribe una instantánea con los eventos dados (deben reflejar todo lo anotado hasta ahora).
+        # No espera a una compactación anterior en curso: cada una se escribe con el
+        # candado tomado y no pisa una instantánea más nueva (ver _escribir_instantanea).
+
+        with self._candado:
+            secuencia = self.secuencia
+            epoca = self.epoca
+
+        if en_segundo_plano:
+            self._compactacion = threading.Thread(
+                target=self._escribir_instantanea, args=(eventos, secuencia, epoca)
+            )
+            self._compactacion.start()
+        else:
+            self._escribir_instantanea(eventos, secuencia, epoca)
+
+
+    def novedades(self):
+
+        # Registros que otros anotaron en la bitácora después de la última secuencia
+        # cargada o anotada por este almacenamiento, sin tomar el candado.
+        # None si ya no están todos (se compactó o se reescribió todo): hay que cargar de nuevo.
+        # Se llama cuando cambió la versión, así que sin registros nuevos también es None:
+        # el cambio fue una reescritura (p. ej. AlmacenamientoJSON.guardar borra la bitácora).
+
+        if leer_epoca(self.archivo) != self.epoca:
+            return None
+
+        registros = []
+        try:
+            with open(self.bitacora, "r", encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except json.JSONDecodeError:
+                        break  # línea vacía o a medio escribir
+                    if registro["seq"] > self.secuencia + len(registros):
+                        if registro["seq"] != self.secuencia + len(registros) + 1:
+                            return None
+                        registros.append(registro)
+        except FileNotFoundError:
+            pass
+
+        if not registros:
+            return None
+
+        with self._candado:
+            self.secuencia += len(registros)
+        return registros
+
+
+    def firma(self):
+
+        # Solo la versión: una compactación reescribe los archivos sin cambiar la agenda
+        # y no tiene que hacer recargar a nadie.
+
+        return leer_version(self.archivo)
+
+
+    def esperar(self):
+
+        # Espera a que termine una compactación en curso, si la hay.
+
+        if self._compactacion is not None:
+            self._compactacion.join()
+            self._compactacion = None
+
+
+    def _escribir_instantanea(self, eventos, secuencia, epoca):
+
+        texto = json.dumps({"secuencia": secuencia, "eventos": eventos}, ensure_ascii=False)
+
+        # Con el candado de escritura: otro planificador (u otra compactación) pudo
+        # guardar una instantánea más nueva mientras se armaba esta, o reescribir
+        # todo en otra época (entonces estos eventos ya son viejos)
+        with self.candado():
+            if leer_epoca(self.archivo) != epoca or _secuencia_instantanea(self.archivo) > secuencia:
+                return
+            escribir_atomico(self.archivo, texto)
+            self._recortar_bitacora(secuencia)
+
+
+    def _recortar_bitacora(self, secuencia):
+
+        # Conservar solo lo anotado después de la instantánea
+        with self._candado:
+            try:
+                with open(self.bitacora, "r", encoding="utf-8") as f:
+                    lineas = [linea for linea in f if linea.strip()]
+            except FileNotFoundError:
+                return
+
+            pendientes = []
+            for linea in lineas:
+                try:
+                    if json.loads(linea)["seq"] > secuencia:
+                        pendientes.append(linea)
+                except json.JSONDecodeError:
+                    break
+
+            if pendientes:
+                escribir_atomico(self.bitacora, "".join(pendientes))
+            else:
+                os.remove(self.bitacora)
+
+
+class AlmacenamientoSQLite(AlmacenamientoEventos):
+
+    # Agenda en una base SQLite: una fila por evento y una por (evento, recurso).
+    # Altas y bajas son inserciones/borrados puntuales (el índice por (sala, día) lo
+    # usan las bajas sin id). Es solo otro lugar donde guardar: cargar() lee todas las
+    # filas, el planificador carga la agenda completa al empezar (tarda según el tamaño
+    # de la agenda) y el uso por día, las salas ocupadas y los rangos de fechas se
+    # calculan con sus índices en memoria, no con consultas SQL.
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS eventos (
+            id INTEGER PRIMARY KEY,
+            uid TEXT,
+            tipo TEXT NOT NULL,
+            sala TEXT NOT NULL,
+            fecha TEXT NOT NULL,
+            dia TEXT NOT NULL,
+            extra TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_eventos_uid ON eventos (uid);
+        CREATE INDEX IF NOT EXISTS idx_eventos_dia ON eventos (dia);
+        CREATE INDEX IF NOT EXISTS idx_eventos_sala_dia ON eventos (sala, dia);
+
+        CREATE TABLE IF NOT EXISTS evento_recursos (
+            evento_id INTEGER NOT NULL REFERENCES eventos (id) ON DELETE CASCADE,
+            recurso TEXT NOT NULL,
+            cantidad INTEGER NOT NULL,
+            PRIMARY KEY (evento_id, recurso)
+        );
+    """
+
+    def __init__(self, archivo="data/eventos.db"):
+
+        self.archivo = archivo
+        self._conexion = sqlite3.connect(archivo, check_same_thread=False)
+        self._conexion.execute("PRAGMA foreign_keys = ON")
+        self._conexion.execute("PRAGMA journal_mode = WAL")
+
+        # bases creadas antes de que los eventos tuvieran identificador
+        columnas = [fila[1] for fila in self._conexion.execute("PRAGMA table_info(eventos)")]
+        if columnas and "uid" not in columnas:
+            self._conexion.execute("ALTER TABLE eventos ADD COLUMN uid TEXT")
+
+        self._conexion.executescript(self.ESQUEMA)
+
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+    def candado(self):
+        return CandadoArchivo(self.archivo + ".lock")
+
+
+    def firma(self):
+
+        # data_version cambia cuando otra conexión (otro proceso) confirma cambios;
+        # lo que confirma esta misma conexión no la cambia
+
+        return self._conexion.execute("PRAGMA data_version").fetchone()[0]
+
+
+    def cargar(self):
+        return self._consultar_eventos("", ())
+
+
+    def guardar(self, eventos):
+
+        with self._conexion:
+            self._conexion.execute("DELETE FROM eventos")
+            self._insertar(eventos)
+
+
+    def registrar_altas(self, eventos, obtener_eventos):
+
+        with self._conexion:
+            self._insertar(eventos)
+
+
+    def registrar_bajas(self, eventos, obtener_eventos):
+
+        with self._conexion:
+            for evento in eventos:
+                if "id" in evento:
+                    self._conexion.execute("DELETE FROM eventos WHERE uid = ?", (evento["id"],))
+                    continue
+                self._conexion.execute(
+                    "DELETE FROM eventos WHERE id = ("
+                    " SELECT id FROM eventos WHERE sala = ? AND dia = ? AND tipo = ? LIMIT 1)",
+                    (evento["sala"], _dia(evento["fecha"]), evento["tipo"]),
+                )
+
+
+    def _insertar(self, eventos):
+
+        for evento in eventos:
+            extra = {
+                clave: valor for clave, valor in evento.items()
+                if clave not in ("id", "tipo", "sala", "fecha", "recursos")
+            }
+            cursor = self._conexion.execute(
+                "INSERT INTO eventos (uid, tipo, sala, fecha, dia, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    evento.get("id"), evento["tipo"], evento["sala"], evento["fecha"], _dia(evento["fecha"]),
+                    json.dumps(extra, ensure_ascii=False) if extra else None,
+                ),
+            )
+            self._conexion.executemany(
+                "INSERT INTO evento_recursos (evento_id, recurso, cantidad) VALUES (?, ?, ?)",
+                [
+                    (cursor.lastrowid, recurso, cantidad)
+                    for recurso, cantidad in evento.get("recursos", {}).items()
+                ],
+            )
+
+
+    def _consultar_eventos(self, filtro, parametros):
+
+        filas = self._conexion.execute(
+            "SELECT e.id, e.uid, e.tipo, e.sala, e.fecha, e.extra, r.recurso, r.cantidad"
+            " FROM eventos e LEFT JOIN evento_recursos r ON r.evento_id = e.id "
+            + filtro + " ORDER BY e.fecha, e.id",
+            parametros,
+        )
+
+        eventos = []
+        ultimo_id = None
+        for id_fila, uid, tipo, sala, fecha, extra, recurso, cantidad in filas:
+            if id_fila != ultimo_id:
+                ultimo_id = id_fila
+                eventos.append({"tipo": tipo, "sala": sala, "fecha": fecha, "recursos": {}})
+                if uid is not None:
+                    eventos[-1]["id"] = uid
+                if extra:
+                    eventos[-1].update(json.loads(extra))
+            if recurso is not None:
+                eventos[-1]["recursos"][recurso] = cantidad
+        return eventos
+
+
+def _dia(fecha):
+    return datetime.fromisoformat(fecha).date().isoformat()
+
+
+def _secuencia_instantanea(archivo):
+
+    # Secuencia de la instantánea guardada en archivo, leyendo solo el comienzo
+    # (se escribe primero); 0 para la lista simple o si no existe.
+
+    try:
+        with open(archivo, "r", encoding="utf-8") as f:
+            inicio = f.read(64)
+    except FileNotFoundError:
+        return 0
+
+    coincidencia = re.match(r'\s*\{\s*"secuencia"\s*:\s*(\d+)', inicio)
+    return int(coincidencia.group(1)) if coincidencia else 0
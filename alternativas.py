@@ -0,0 +1,140 @@
+import heapq
+from datetime import date, timedelta
+
+from franjas import franjas_evento
+
+
+# Alternativas para un evento que no entra: pares (sala, día) donde sí entraría,
+# ordenados por cercanía al día pedido, hacia adelante y hacia atrás.
+
+
+class BuscadorAlternativas:
+
+    # Búsqueda best-first sobre la disponibilidad ya calculada del planificador.
+    #
+    # 1. Salas compatibles: las que permiten el evento según las reglas que dependen
+    #    de la sala (VALIDADORES_SALA); el resto de las reglas no cambia con la sala.
+    # 2. Días con recursos suficientes para todo el año, de una sola vez con
+    #    dias_disponibles (calendario vectorizado).
+    # 3. Un flujo de candidatos por sala y sentido (adelante / atrás), en orden de
+    #    distancia, y una cola de prioridad con la cabeza de cada flujo. Se sacan
+    #    de la cola las k más cercanas; solo se mira la sala de los días que se visitan.
+    #
+    # La sala libre y los recursos del día se controlan con la misma regla que
+    # _validar_disponibilidad_sala y _validar_recursos_fecha (incluido el horario
+    # si el evento tiene "fin").
+
+    VALIDADORES_SALA = (
+        "validar_exclusiones_por_sala", "validar_evento_por_sala", "_validar_personal_obligatorio",
+    )
+
+    def __init__(self, planificador):
+        self.planificador = planificador
+
+
+    def buscar(self, evento, k=5):
+
+        # Lista de hasta k {"sala", "fecha" (date), "distancia" (días, negativa hacia atrás)}.
+        # No incluye la sala y el día pedidos. Vacía si el evento no entraría en ningún
+        # lado (falla una regla que no depende ni de la sala ni del día).
+
+        planificador = self.planificador
+        if self.falla_en_cualquier_lugar(evento):
+            return []
+
+        salas = self.salas_compatibles(evento)
+        if not salas or k <= 0:
+            return []
+
+        pedida = evento["fecha"].date()
+        hoy = date.today()
+        ultimo = hoy + timedelta(days=365)
+        recursos = evento.get("recursos", {})
+        desde, hasta = franjas_evento(evento)
+
+        # Días donde el total del día ya deja lugar; con eventos con horario ese día
+        # puede entrar igual (cuenta el máximo simultáneo), y eso se mira al visitarlo
+        libres = set(planificador.dias_disponibles(hoy, ultimo, recursos))
+        alcanzan = {}
+
+        def recursos_libres(dia):
+            if dia in libres:
+                return True
+            if dia not in alcanzan:
+                alcanzan[dia] = planificador._dia_con_horario(dia) and planificador._recursos_alcanzan(
+                    recursos, planificador._uso_maximo(dia, desde, hasta)
+                )
+            return alcanzan[dia]
+
+        def candidatos(sala, dias):
+            for dia in dias:
+                if sala == evento["sala"] and dia == pedida:
+                    continue
+                if recursos_libres(dia) and not planificador._sala_ocupada_en(sala, dia, desde, hasta):
+                    yield dia
+
+        cola = []
+        for orden, sala in enumerate(salas):
+            adelante = _dias(max(pedida, hoy), ultimo, 1)
+            atras = _dias(min(pedida - timedelta(days=1), ultimo), hoy, -1)
+            for sentido, dias in ((0, adelante), (1, atras)):
+                _empujar(cola, pedida, sentido, orden, sala, candidatos(sala, dias))
+
+        alternativas = []
+        while cola and len(alternativas) < k:
+            _, sentido, orden, dia, sala, flujo = heapq.heappop(cola)
+            alternativas.append({"sala": sala, "fecha": dia, "distancia": (dia - pedida).days})
+            _empujar(cola, pedida, sentido, orden, sala, flujo)
+
+        return alternativas
+
+
+    def salas_compatibles(self, evento):
+
+        # Salas donde las reglas permiten el evento; primero la sala pedida
+
+        salas = list((self.planificador.recursos or {}).get("salas", {}))
+        if evento.get("sala") in salas:
+            salas.remove(evento["sala"])
+            salas.insert(0, evento["sala"])
+
+        validadores = [getattr(self.planificador, nombre) for nombre in self.VALIDADORES_SALA]
+        return [
+            sala for sala in salas
+            if not any(validar({**evento, "sala": sala}) for validar in validadores)
+        ]
+
+
+    def falla_en_cualquier_lugar(self, evento):
+
+        # Reglas que dan lo mismo para cualquier sala y día (cantidades, exclusiones entre
+        # recursos, corequisitos, mínimos del tipo): si alguna falla, cambiar de sala o
+        # de día no sirve
+
+        planificador = self.planificador
+        return any(
+            getattr(planificador, nombre)(evento)
+            for etapa in planificador.ETAPAS_VALIDACION
+            for nombre in etapa
+            if nombre not in self.VALIDADORES_SALA and nombre not in planificador.VALIDADORES_POR_DIA
+        )
+
+
+def _dias(desde, hasta, paso):
+
+    # Días de desde a hasta (incluidos), de a paso (1 o -1)
+
+    dia = desde
+    while (dia <= hasta) if paso > 0 else (dia >= hasta):
+        yield dia
+        dia += timedelta(days=paso)
+
+
+def _empujar(cola, pedida, sentido, orden, sala, flujo):
+
+    # Pone en la cola el próximo candidato del flujo (si queda alguno).
+    # Empates de distancia: primero hacia adelante, después por orden de sala.
+
+    dia = next(flujo, None)
+    if dia is not None:
+        heapq.heappush(cola, (abs((dia - pedida).days), sentido, orden, dia, sala, flujo))
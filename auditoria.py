@@ -0,0 +1,405 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+
+from almacenamiento import AlmacenamientoSQLite, leer_eventos
+from franjas import FRANJAS_POR_DIA, franjas_evento
+from planificador import PlanificadorEventos
+
+
+# Auditoría completa de la agenda guardada.
+#
+#   python -m auditoria --eventos data/eventos.json --procesos 8 --salida auditoria.json
+#
+# Vuelve a correr sobre todos los eventos (y las ocurrencias de las series) los
+# validadores que no dependen del día, y además controla por día que ninguna sala
+# tenga eventos superpuestos y que ningún recurso supere su capacidad.
+# La agenda se reparte en particiones de días completos entre procesos.
+#
+# Cada violación es un diccionario:
+#   {"categoria": "evento" | "sala" | "recurso", "fecha": date, "ids": [...],
+#    "sala" | "recurso": ..., "mensajes": [...]}
+
+
+def auditar_agenda(planificador, procesos=None, particiones=None):
+
+    # Devuelve la lista de violaciones ordenada por fecha.
+    # procesos=1 audita en el proceso actual (sin pool).
+
+    procesos = procesos or os.cpu_count() or 1
+    catalogo = planificador._catalogo
+
+    eventos = planificador.eventos
+    if planificador.series:
+        ocurrencias = [
+            catalogo.compactar(o) for o in planificador.ocurrencias_entre(*planificador.rango_agenda())
+        ]
+        eventos = sorted(eventos + ocurrencias, key=lambda e: e.fecha)
+
+    if not eventos:
+        return []
+
+    columnas = _columnas(eventos, catalogo)
+    cortes = _cortes(columnas["dias"], particiones or procesos * 4)
+    trozos = [
+        {clave: valores[inicio:fin] for clave, valores in columnas.items()}
+        for inicio, fin in zip(cortes, cortes[1:])
+    ]
+
+    contexto = (
+        planificador.recursos, planificador.restricciones,
+        list(catalogo.tipos), list(catalogo.salas), list(catalogo.recursos),
+    )
+
+    if procesos == 1:
+        _iniciar(*contexto)
+        resultados = map(_auditar_particion, trozos)
+        violaciones = [v for parcial in resultados for v in parcial]
+    else:
+        with ProcessPoolExecutor(procesos, initializer=_iniciar, initargs=contexto) as pool:
+            violaciones = [v for parcial in pool.map(_auditar_particion, trozos) for v in parcial]
+
+    violaciones.sort(key=lambda v: v["fecha"])
+    return violaciones
+
+
+def _columnas(eventos, catalogo):
+
+    # Agenda en columnas (vectores NumPy + lista de ids), que se copian rápido entre procesos
+
+    tipos, salas = catalogo.ordinales(eventos)
+
+    desde = np.zeros(len(eventos), dtype=np.int16)
+    hasta = np.full(len(eventos), FRANJAS_POR_DIA, dtype=np.int16)
+    for i, e in enumerate(eventos):
+        if e.fin is not None:
+            desde[i], hasta[i] = franjas_evento(e)
+
+    return {
+        "ids": [e.id for e in eventos],
+        "dias": np.fromiter((e.fecha.toordinal() for e in eventos), dtype=np.int32, count=len(eventos)),
+        "desde": desde,
+        "hasta": hasta,
+        "tipos": tipos,
+        "salas": salas,
+        "recursos": catalogo.matriz_recursos(eventos),
+    }
+
+
+def _cortes(dias, particiones):
+
+    # Límites [0, ..., n] de hasta `particiones` trozos parecidos, sin partir ningún día
+
+    n = len(dias)
+    cortes = {0, n}
+    for k in range(1, particiones):
+        objetivo = n * k // particiones
+        cortes.add(int(np.searchsorted(dias, dias[objetivo], side="left")))
+    return sorted(cortes)
+
+
+# Lado de los procesos de trabajo
+
+_auditor = None
+
+
+def _iniciar(recursos, restricciones, tipos, salas, nombres_recursos):
+
+    global _auditor
+
+    planificador = PlanificadorEventos()
+    planificador.recursos = recursos
+    planificador.restricciones = restricciones
+    planificador._compilar_reglas()
+
+    # Capacidad por columna de recurso; los recursos fuera del catálogo no tienen tope
+    capacidad = {}
+    for recurso, total in planificador._reglas.capacidades:
+        capacidad[recurso] = min(total, capacidad.get(recurso, total))
+
+    _auditor = {
+        "planificador": planificador,
+        "etapas": [
+            [getattr(planificador, nombre) for nombre in etapa if nombre not in planificador.VALIDADORES_POR_DIA]
+            for etapa in planificador.ETAPAS_VALIDACION
+        ],
+        "tipos": tipos,
+        "salas": salas,
+        "recursos": nombres_recursos,
+        "columna": {recurso: j for j, recurso in enumerate(nombres_recursos)},
+        "ordinal_tipo": {tipo: j for j, tipo in enumerate(tipos)},
+        "capacidad": np.array(
+            [capacidad.get(r, np.iinfo(np.int64).max) for r in nombres_recursos], dtype=np.int64
+        ),
+        "cache": {},
+    }
+
+
+def _auditar_particion(trozo):
+    return _violaciones_por_evento(trozo) + _violaciones_por_dia(trozo)
+
+
+def _violaciones_por_evento(trozo):
+
+    # Validadores de reglas, solo sobre los eventos que _sospechosos no pudo descartar;
+    # eventos con el mismo tipo, sala y recursos se validan una sola vez
+
+    auditor = _auditor
+    cache = auditor["cache"]
+    matriz = trozo["recursos"]
+    nombres = auditor["recursos"]
+    violaciones = []
+
+    for i in np.flatnonzero(_sospechosos(trozo)).tolist():
+        tipo, sala = int(trozo["tipos"][i]), int(trozo["salas"][i])
+        clave = (tipo, sala, matriz[i].tobytes())
+
+        errores = cache.get(clave)
+        if errores is None:
+            columnas = np.flatnonzero(matriz[i])
+            evento = {
+                "tipo": auditor["tipos"][tipo],
+                "sala": auditor["salas"][sala],
+                "recursos": dict(zip([nombres[j] for j in columnas], matriz[i, columnas].tolist())),
+            }
+            errores = cache[clave] = _validar_etapas(auditor["etapas"], evento)
+
+        if errores:
+            violaciones.append({
+                "categoria": "evento",
+                "fecha": date.fromordinal(int(trozo["dias"][i])),
+                "ids": [trozo["ids"][i]],
+                "sala": auditor["salas"][sala],
+                "mensajes": errores,
+            })
+
+    return violaciones
+
+
+def _sospechosos(trozo):
+
+    # Máscara de eventos que podrían no cumplir alguna regla, calculada por columnas.
+    # Es una condición necesaria de los validadores de reglas (nunca descarta un
+    # evento inválido); los mensajes los dan los validadores en _violaciones_por_evento.
+
+    auditor = _auditor
+    reglas = auditor["planificador"]._reglas
+    matriz = trozo["recursos"].astype(np.int64)
+    n = len(matriz)
+
+    def columna(recurso):
+        j = auditor["columna"].get(recurso)
+        return matriz[:, j] if j is not None and j < matriz.shape[1] else np.zeros(n, dtype=np.int64)
+
+    # _validar_disponibilidad_recursos
+    sospechoso = ~matriz.any(axis=1)
+    sospechoso |= (matriz > auditor["capacidad"][:matriz.shape[1]]).any(axis=1)
+
+    # validar_corequisitos_por_recurso
+    for recurso, requeridos in reglas.corequisitos_recurso:
+        cantidad = columna(recurso)
+        for requerido in requeridos:
+            sospechoso |= (cantidad != 0) & (columna(requerido) < cantidad)
+
+    # validar_corequisitos_por_categoria
+    requerimientos = {}
+    for recurso, requeridos in reglas.corequisitos_categoria.items():
+        for requerido in requeridos:
+            requerimientos[requerido] = requerimientos.get(requerido, 0) + columna(recurso)
+    for requerido, total in requerimientos.items():
+        sospechoso |= columna(requerido) < total
+
+    # Reglas que dependen del tipo: _validar_reglas_evento y validar_exclusiones_por_evento
+    tipos = trozo["tipos"]
+    for ordinal in np.unique(tipos).tolist():
+        filas = tipos == ordinal
+        tipo = auditor["tipos"][ordinal]
+        if tipo not in reglas.minimos_evento:
+            sospechoso |= filas
+            continue
+        problema = np.zeros(n, dtype=bool)
+        for recurso, minimo in reglas.minimos_evento[tipo]:
+            problema |= columna(recurso) < minimo
+        if reglas.requiere_instrumentos[tipo]:
+            problema |= sum(columna(r) for r in reglas.instrumentos) == 0
+        for recurso in reglas.prohibidos_evento.get(tipo, ()):
+            problema |= columna(recurso) > 0
+        sospechoso |= filas & problema
+
+    # Reglas que dependen de la sala: validar_exclusiones_por_sala,
+    # validar_evento_por_sala y _validar_personal_obligatorio
+    salas = trozo["salas"]
+    for ordinal in np.unique(salas).tolist():
+        filas = salas == ordinal
+        sala = auditor["salas"][ordinal]
+        problema = np.zeros(n, dtype=bool)
+        for recurso in reglas.prohibidos_sala.get(sala, ()):
+            problema |= columna(recurso) > 0
+        for tipo in reglas.eventos_prohibidos.get(sala, ()):
+            ordinal_tipo = auditor["ordinal_tipo"].get(tipo)
+            if ordinal_tipo is not None:
+                problema |= tipos == ordinal_tipo
+        for rol, minimo in reglas.personal_obligatorio.get(sala, ()):
+            problema |= columna(rol) < minimo
+        sospechoso |= filas & problema
+
+    return sospechoso
+
+
+def _validar_etapas(etapas, evento):
+
+    # Igual que el planificador: se corta en la primera etapa con errores
+
+    errores = []
+    for etapa in etapas:
+        for validar in etapa:
+            errores += validar(evento)
+        if errores:
+            break
+    return errores
+
+
+def _violaciones_por_dia(trozo):
+
+    # Salas con eventos superpuestos y recursos con más uso simultáneo que capacidad
+
+    auditor = _auditor
+    dias = trozo["dias"]
+    ids = trozo["ids"]
+    violaciones = []
+
+    limites = [0, *(np.flatnonzero(np.diff(dias)) + 1).tolist(), len(dias)]
+    for inicio, fin in zip(limites, limites[1:]):
+        fecha = date.fromordinal(int(dias[inicio]))
+        salas = trozo["salas"][inicio:fin]
+        desde = trozo["desde"][inicio:fin]
+        hasta = trozo["hasta"][inicio:fin]
+        matriz = trozo["recursos"][inicio:fin]
+
+        # Salas: solo hace falta mirar las que tienen más de un evento ese día
+        for sala, cantidad in Counter(salas.tolist()).items():
+            if cantidad < 2:
+                continue
+            filas = np.flatnonzero(salas == sala)
+            superpuestos = _superpuestos(filas, desde, hasta)
+            if superpuestos:
+                nombre = auditor["salas"][sala]
+                violaciones.append({
+                    "categoria": "sala",
+                    "fecha": fecha,
+                    "ids": [ids[inicio + f] for f in superpuestos],
+                    "sala": nombre,
+                    "mensajes": [
+                        f"La sala {nombre} tiene {len(superpuestos)} eventos superpuestos el {fecha}."
+                    ],
+                })
+
+        # Recursos: los eventos de día completo se suman directo; los que tienen horario,
+        # por el máximo de la suma acumulada de entradas y salidas por franja
+        con_horario = (desde != 0) | (hasta != FRANJAS_POR_DIA)
+        uso = matriz[~con_horario].sum(axis=0, dtype=np.int64)
+        if con_horario.any():
+            parcial = matriz[con_horario].astype(np.int64)
+            cambios = np.zeros((FRANJAS_POR_DIA + 1, matriz.shape[1]), dtype=np.int64)
+            _sumar_por_franja(cambios, desde[con_horario], parcial)
+            _sumar_por_franja(cambios, hasta[con_horario], -parcial)
+            uso += np.cumsum(cambios[:FRANJAS_POR_DIA], axis=0).max(axis=0)
+
+        for j in np.flatnonzero(uso > auditor["capacidad"][:len(uso)]):
+            recurso = auditor["recursos"][j]
+            violaciones.append({
+                "categoria": "recurso",
+                "fecha": fecha,
+                "ids": [ids[inicio + f] for f in np.flatnonzero(matriz[:, j])],
+                "recurso": recurso,
+                "mensajes": [
+                    f"El {fecha} se usan a la vez {int(uso[j])} '{recurso}' "
+                    f"y hay {int(auditor['capacidad'][j])}."
+                ],
+            })
+
+    return violaciones
+
+
+def _sumar_por_franja(cambios, franjas, matriz):
+
+    # cambios[franjas[i]] += matriz[i] agrupando por franja (más rápido que np.add.at)
+
+    orden = np.argsort(franjas, kind="stable")
+    valores, inicios = np.unique(franjas[orden], return_index=True)
+    cambios[valores] += np.add.reduceat(matriz[orden], inicios, axis=0)
+
+
+def _superpuestos(filas, desde, hasta):
+
+    # Filas cuyos intervalos [desde, hasta) se cruzan con el de alguna otra
+
+    orden = sorted(filas.tolist(), key=lambda f: desde[f])
+    superpuestos = set()
+    fin_maximo, fila_maximo = -1, None
+    for f in orden:
+        if desde[f] < fin_maximo:
+            superpuestos.update((f, fila_maximo))
+        if hasta[f] > fin_maximo:
+            fin_maximo, fila_maximo = hasta[f], f
+    return sorted(superpuestos)
+
+
+def main(argumentos=None):
+
+    parser = argparse.ArgumentParser(description="Auditoría completa de la agenda")
+    parser.add_argument("--eventos", default="data/eventos.json",
+                        help="JSON (con o sin bitácora .log) o base SQLite (.db)")
+    parser.add_argument("--recursos", default="data/recursos.json")
+    parser.add_argument("--restricciones", default="data/restricciones.json")
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--salida", help="archivo JSON donde guardar las violaciones")
+    args = parser.parse_args(argumentos)
+
+    inicio = time.perf_counter()
+
+    planificador = PlanificadorEventos()
+    planificador.cargar_recursos_json(args.recursos)
+    planificador.cargar_restricciones_json(args.restricciones)
+
+    # Solo lectura: no se usa cargar_eventos para no reescribir el archivo
+    if args.eventos.endswith(".db"):
+        almacenamiento = AlmacenamientoSQLite(args.eventos)
+        eventos = almacenamiento.cargar()
+        almacenamiento.cerrar()
+    else:
+        eventos, _ = leer_eventos(args.eventos)
+    planificador._usar_eventos_cargados(eventos)
+    carga = time.perf_counter() - inicio
+
+    violaciones = auditar_agenda(planificador, args.procesos)
+    total = time.perf_counter() - inicio
+
+    print(
+        f"{len(planificador.eventos)} eventos y {len(planificador.series)} series auditados "
+        f"en {total:.2f} s (carga {carga:.2f} s)"
+    )
+    for categoria, cantidad in sorted(Counter(v["categoria"] for v in violaciones).items()):
+        print(f"  {categoria}: {cantidad} violaciones")
+    for v in violaciones[:20]:
+        print(f"  {v['fecha']} [{v['categoria']}] {' '.join(v['mensajes'])}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(
+                [{**v, "fecha": v["fecha"].isoformat()} for v in violaciones],
+                f, ensure_ascii=False, indent=2
+            )
+        print(f"Violaciones guardadas en {args.salida}")
+
+    return 1 if violaciones else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
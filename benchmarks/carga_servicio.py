@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import json
+from datetime import date, timedelta
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from benchmarks.generador import GeneradorEventos
+from instrumentacion import percentil
+
+
+# Prueba de carga del servicio de reservas (servicio.py).
+#
+#   python -m servicio &
+#   python -m benchmarks.carga_servicio --conexiones 64 --duracion 10
+#   python -m benchmarks.carga_servicio --mezcla validar=50,sugerir=30,agregar=15,eliminar=5
+#
+# Cada conexión (persistente) manda pedidos uno tras otro hasta que se termina el
+# tiempo, eligiendo la operación según la mezcla. Los eventos salen de
+# GeneradorEventos con los recursos y restricciones del servicio, así que solo se
+# rechazan por sala ocupada o falta de recursos. Al final muestra pedidos por
+# segundo y latencias (p50, p90, p99, p99.9 y máxima) por operación.
+
+MEZCLA = "validar=60,sugerir=20,disponibilidad=5,agregar=10,eliminar=5"
+
+
+class Conexion:
+
+    def __init__(self, host, puerto):
+        self.host = host
+        self.puerto = puerto
+        self._lector = None
+        self._escritor = None
+
+
+    async def pedir(self, metodo, ruta, datos=None):
+
+        # (estado, respuesta JSON); reabre la conexión si el servidor la cerró
+
+        if self._escritor is None:
+            self._lector, self._escritor = await asyncio.open_connection(self.host, self.puerto)
+
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8") if datos is not None else b""
+        self._escritor.write(
+            f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(cuerpo)}\r\n\r\n".encode("latin-1")
+            + cuerpo
+        )
+        await self._escritor.drain()
+
+        estado = int((await self._lector.readline()).split()[1])
+        cabeceras = {}
+        while True:
+            linea = await self._lector.readline()
+            if linea in (b"\r\n", b"\n", b""):
+                break
+            nombre, _, valor = linea.decode("latin-1").partition(":")
+            cabeceras[nombre.strip().lower()] = valor.strip()
+
+        respuesta = json.loads(await self._lector.readexactly(int(cabeceras.get("content-length", 0))))
+        if cabeceras.get("connection", "").lower() == "close":
+            self.cerrar()
+        return estado, respuesta
+
+
+    def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+
+
+def _serializar(evento):
+    return {**evento, "fecha": evento["fecha"].isoformat()}
+
+
+async def _trabajar(conexion, generador, mezcla, dias, fin, mediciones, ids):
+
+    operaciones, pesos = zip(*mezcla.items())
+    hoy = date.today()
+    azar = generador.azar
+
+    while perf_counter() < fin:
+        operacion = azar.choices(operaciones, pesos)[0]
+        if operacion == "eliminar" and not ids:
+            operacion = "agregar"
+
+        evento = _serializar(generador.evento(hoy + timedelta(days=azar.randrange(1, dias))))
+        if operacion == "validar":
+            pedido = ("POST", "/validar", evento)
+        elif operacion == "sugerir":
+            pedido = ("POST", "/sugerir", {**evento, "k": 3})
+        elif operacion == "disponibilidad":
+            desde = hoy + timedelta(days=azar.randrange(dias))
+            pedido = ("POST", "/disponibilidad", {
+                "desde": desde.isoformat(), "hasta": (desde + timedelta(days=30)).isoformat(),
+                "recursos": evento["recursos"],
+            })
+        elif operacion == "agregar":
+            pedido = ("POST", "/eventos", evento)
+        else:
+            pedido = ("DELETE", f"/eventos/{ids.pop(azar.randrange(len(ids)))}", None)
+
+        inicio = perf_counter()
+        estado, respuesta = await conexion.pedir(*pedido)
+        latencias, estados = mediciones.setdefault(operacion, ([], {}))
+        latencias.append(perf_counter() - inicio)
+        estados[estado] = estados.get(estado, 0) + 1
+
+        if operacion == "agregar" and estado == 201:
+            ids.append(respuesta["id"])
+
+
+async def ejecutar_carga(url, conexiones, duracion, mezcla, recursos, restricciones, dias=365, semilla=0):
+
+    # {operación: {"n", "por_s", "estados", "p50_ms", ...}} más "total"
+
+    partes = urlsplit(url)
+    host, puerto = partes.hostname or "127.0.0.1", partes.port or 80
+
+    mediciones = {}
+    ids = []
+    clientes = [Conexion(host, puerto) for _ in range(conexiones)]
+    generadores = [
+        GeneradorEventos(recursos, restricciones, semilla=semilla + i) for i in range(conexiones)
+    ]
+
+    inicio = perf_counter()
+    try:
+        await asyncio.gather(*(
+            _trabajar(cliente, generador, mezcla, dias, inicio + duracion, mediciones, ids)
+            for cliente, generador in zip(clientes, generadores)
+        ))
+    finally:
+        for cliente in clientes:
+            cliente.cerrar()
+    transcurrido = perf_counter() - inicio
+
+    todas = [l for latencias, _ in mediciones.values() for l in latencias]
+    estados = {}
+    for _, por_estado in mediciones.values():
+        for estado, cantidad in por_estado.items():
+            estados[estado] = estados.get(estado, 0) + cantidad
+
+    resumen = {
+        operacion: _resumir(latencias, estados_op, transcurrido)
+        for operacion, (latencias, estados_op) in sorted(mediciones.items())
+    }
+    resumen["total"] = _resumir(todas, estados, transcurrido)
+
+    conexion = Conexion(host, puerto)
+    try:
+        _, resumen["servicio"] = await conexion.pedir("GET", "/estado")
+    finally:
+        conexion.cerrar()
+    return resumen
+
+
+def _resumir(latencias, estados, transcurrido):
+
+    ordenadas = sorted(latencias)
+    return {
+        "n": len(ordenadas),
+        "por_s": round(len(ordenadas) / transcurrido, 1) if transcurrido else 0.0,
+        "estados": {str(estado): cantidad for estado, cantidad in sorted(estados.items())},
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 2),
+        "p90_ms": round(percentil(ordenadas, 90) * 1000, 2),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 2),
+        "p999_ms": round(percentil(ordenadas, 99.9) * 1000, 2),
+        "max_ms": round(ordenadas[-1] * 1000, 2) if ordenadas else 0.0,
+    }
+
+
+def imprimir(resumen):
+
+    print(f"{'operación':<16}{'pedidos':>9}{'pedidos/s':>11}{'p50 ms':>9}{'p90 ms':>9}"
+          f"{'p99 ms':>9}{'p99.9 ms':>10}{'máx ms':>9}  estados")
+    for operacion, datos in resumen.items():
+        if operacion == "servicio":
+            continue
+        print(
+            f"{operacion:<16}{datos['n']:>9}{datos['por_s']:>11}{datos['p50_ms']:>9}{datos['p90_ms']:>9}"
+            f"{datos['p99_ms']:>9}{datos['p999_ms']:>10}{datos['max_ms']:>9}  {datos['estados']}"
+        )
+
+    servicio = resumen.get("servicio", {})
+    if servicio:
+        print(
+            f"\nServicio: {servicio['consultas']} consultas en {servicio['lotes']} lotes "
+            f"({servicio['consultas_por_lote']} por lote, {servicio['calculadas']} calculadas), "
+            f"{servicio['escrituras']} escrituras"
+        )
+
+
+def main(argumentos=None):
+
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de reservas")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--conexiones", type=int, default=32, help="clientes simultáneos")
+    parser.add_argument("--duracion", type=float, default=10.0, help="segundos")
+    parser.add_argument("--mezcla", default=MEZCLA, help="operación=peso separados por coma")
+    parser.add_argument("--recursos", default="data/recursos.json",
+                        help="los mismos que usa el servicio")
+    parser.add_argument("--restricciones", default="data/restricciones.json")
+    parser.add_argument("--dias", type=int, default=365, help="los eventos caen en los próximos N días")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="guardar el resumen en este JSON")
+    args = parser.parse_args(argumentos)
+
+    mezcla = {}
+    for parte in args.mezcla.split(","):
+        operacion, _, peso = parte.partition("=")
+        if operacion not in ("validar", "sugerir", "disponibilidad", "agregar", "eliminar"):
+            parser.error(f"operación desconocida en --mezcla: {operacion}")
+        mezcla[operacion] = float(peso or 1)
+
+    with open(args.recursos, "r", encoding="utf-8") as f:
+        recursos = json.load(f)
+    with open(args.restricciones, "r", encoding="utf-8") as f:
+        restricciones = json.load(f)
+
+    resumen = asyncio.run(ejecutar_carga(
+        args.url, args.conexiones, args.duracion, mezcla, recursos, restricciones, args.dias, args.semilla
+    ))
+    imprimir(resumen)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resumen, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
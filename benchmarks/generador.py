@@ -0,0 +1,206 @@
+import random
+from datetime import date, datetime, timedelta
+
+from reglas import ReglasCompiladas
+
+
+# Generador de catálogos y agendas sintéticas con la misma forma que
+# data/recursos.json, data/restricciones.json y data/eventos.json.
+
+
+def generar_recursos(n_recursos=200, n_salas=30, n_tipos=20, semilla=0):
+
+    # Reparte n_recursos entre equipos (60 %), instrumentos (30 %) y personal (10 %).
+    # "Equipo 000" hace de cable: el resto de los equipos e instrumentos lo requiere.
+
+    azar = random.Random(semilla)
+
+    n_personal = max(1, n_recursos // 10)
+    n_instrumentos = max(1, (n_recursos * 3) // 10)
+    n_equipos = max(1, n_recursos - n_personal - n_instrumentos)
+
+    return {
+        "equipos": {
+            f"Equipo {i:03d}": azar.randint(20, 200) if i else 100000
+            for i in range(n_equipos)
+        },
+        "instrumentos": {
+            f"Instrumento {i:03d}": azar.randint(5, 50) for i in range(n_instrumentos)
+        },
+        "salas": {f"Sala {i:02d}": 1 for i in range(n_salas)},
+        "personal": {
+            f"Personal {i:03d}": azar.randint(n_salas, 4 * n_salas) for i in range(n_personal)
+        },
+        "eventos": [f"Evento {i:02d}" for i in range(n_tipos)],
+    }
+
+
+def generar_restricciones(recursos, semilla=0):
+
+    azar = random.Random(semilla)
+
+    equipos = list(recursos["equipos"])
+    instrumentos = list(recursos["instrumentos"])
+    personal = list(recursos["personal"])
+    salas = list(recursos["salas"])
+    tipos = list(recursos["eventos"])
+    cable = equipos[0]
+
+    # Corequisitos 1 a 1 entre pares de equipos consecutivos
+    coreq_recursos = {}
+    for i in range(1, len(equipos) - 1, 10):
+        coreq_recursos[equipos[i]] = [equipos[i + 1]]
+
+    por_sala = {}
+    for i, sala in enumerate(salas):
+        reglas = {"equipos": azar.sample(equipos[1:], min(3, len(equipos) - 1))}
+        if i % 3 == 0:
+            reglas["instrumentos"] = True
+        por_sala[sala] = reglas
+
+    return {
+        "corequisitos": {
+            "recursos": coreq_recursos,
+            "categorias": {
+                "equipos": {"requiere": [cable], "excepto": [cable]},
+                "instrumentos": {"requiere": [cable], "excepto": instrumentos[:1]},
+            },
+        },
+        "exclusiones": {
+            "por_sala": por_sala,
+            "por_evento": {
+                tipo: {"prohibido": azar.sample(equipos[1:], min(2, len(equipos) - 1))}
+                for tipo in tipos[::2]
+            },
+            "eventos_prohibidos": {
+                sala: azar.sample(tipos, len(tipos) // 4) for sala in salas
+            },
+        },
+        "reglas_evento": {
+            tipo: (
+                {"requiere_instrumentos": True} if i % 4 == 3
+                else {equipos[1 + i % (len(equipos) - 1)]: 1}
+            )
+            for i, tipo in enumerate(tipos)
+        },
+        "personal_obligatorio": {sala: {personal[0]: 1} for sala in salas},
+    }
+
+
+class GeneradorEventos:
+
+    # Arma eventos que cumplen todas las reglas estáticas (exclusiones, corequisitos,
+    # mínimos y personal); solo pueden fallar por sala ocupada o falta de recursos ese día.
+
+    def __init__(self, recursos, restricciones, semilla=0, recursos_por_evento=6):
+
+        self.recursos = recursos
+        self.reglas = ReglasCompiladas(recursos, restricciones)
+        self.azar = random.Random(semilla)
+        self.recursos_por_evento = recursos_por_evento
+
+        # (sala, tipo) -> recursos que se pueden pedir
+        self._candidatos = {}
+        self._requeridos = dict(self.reglas.corequisitos_recurso)
+
+        # sala -> tipos que se pueden hacer ahí sin contradecir alguna regla
+        self._tipos = {
+            sala: [t for t in recursos["eventos"] if self._compatible(sala, t)]
+            for sala in recursos["salas"]
+        }
+        self._salas = [sala for sala, tipos in self._tipos.items() if tipos]
+
+
+    def _prohibidos(self, sala, tipo):
+        return (
+            set(self.reglas.prohibidos_sala.get(sala, ())) |
+            set(self.reglas.prohibidos_evento.get(tipo, ()))
+        )
+
+
+    def _compatible(self, sala, tipo):
+
+        if tipo in self.reglas.eventos_prohibidos.get(sala, ()):
+            return False
+
+        prohibidos = self._prohibidos(sala, tipo)
+        if self.reglas.requiere_instrumentos.get(tipo) and self.reglas.instrumentos <= prohibidos:
+            return False
+        return all(
+            r not in prohibidos and not prohibidos.intersection(self._requeridos.get(r, ()))
+            for r, _ in self.reglas.minimos_evento.get(tipo, ())
+        )
+
+
+    def evento(self, fecha):
+
+        azar = self.azar
+        reglas = self.reglas
+
+        sala = azar.choice(self._salas)
+        tipo = azar.choice(self._tipos[sala])
+
+        candidatos = self._candidatos.get((sala, tipo))
+        if candidatos is None:
+            prohibidos = self._prohibidos(sala, tipo)
+            candidatos = [
+                r for r in reglas.ordinal
+                if r not in prohibidos and r not in self.recursos["salas"]
+                and not prohibidos.intersection(self._requeridos.get(r, ()))
+            ]
+            self._candidatos[(sala, tipo)] = candidatos
+
+        pedidos = {}
+        for recurso in azar.sample(candidatos, min(self.recursos_por_evento, len(candidatos))):
+            pedidos[recurso] = 1
+
+        for recurso, minimo in reglas.minimos_evento.get(tipo, ()):
+            pedidos[recurso] = max(pedidos.get(recurso, 0), minimo)
+        if reglas.requiere_instrumentos.get(tipo) and not any(r in reglas.instrumentos for r in pedidos):
+            instrumentos = [r for r in candidatos if r in reglas.instrumentos]
+            pedidos[azar.choice(instrumentos)] = 1
+        for rol, minimo in reglas.personal_obligatorio.get(sala, ()):
+            pedidos[rol] = max(pedidos.get(rol, 0), minimo)
+
+        # Completar corequisitos hasta que no falte nada
+        cambio = True
+        while cambio:
+            cambio = False
+            for recurso, requeridos in reglas.corequisitos_recurso:
+                cantidad = pedidos.get(recurso, 0)
+                for req in requeridos if cantidad else ():
+                    if pedidos.get(req, 0) < cantidad:
+                        pedidos[req] = cantidad
+                        cambio = True
+
+            requerido_categoria = {}
+            for recurso, cantidad in pedidos.items():
+                for req in reglas.corequisitos_categoria.get(recurso, ()):
+                    requerido_categoria[req] = requerido_categoria.get(req, 0) + cantidad
+            for req, total in requerido_categoria.items():
+                if pedidos.get(req, 0) < total:
+                    pedidos[req] = total
+                    cambio = True
+
+        return {
+            "tipo": tipo,
+            "sala": sala,
+            "fecha": datetime.combine(fecha, datetime.min.time()),
+            "recursos": pedidos,
+        }
+
+
+def generar_eventos(recursos, restricciones, n_eventos, semilla=0, dias=365):
+
+    # n_eventos repartidos al azar entre hoy y hoy + dias. No se validan entre sí:
+    # con muchos eventos hay días con salas y recursos sobre-reservados, como en
+    # una agenda importada sin control.
+
+    generador = GeneradorEventos(recursos, restricciones, semilla)
+    azar = random.Random(semilla + 1)
+    hoy = date.today()
+
+    return [
+        generador.evento(hoy + timedelta(days=azar.randrange(dias)))
+        for _ in range(n_eventos)
+    ]
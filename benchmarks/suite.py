@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from almacenamiento import AlmacenamientoJSON, AlmacenamientoSQLite, DiarioEventos
+from benchmarks.generador import (
+    GeneradorEventos, generar_eventos, generar_recursos, generar_restricciones,
+)
+from instrumentacion import percentil
+from planificador import PlanificadorEventos
+
+
+# Benchmarks del planificador sobre agendas sintéticas.
+#
+#   python -m benchmarks.suite --eventos 1000,10000,100000
+#   python -m benchmarks.suite --comparar benchmarks/resultados/bench-....json
+#
+# Cada corrida se guarda en benchmarks/resultados/ para poder compararla con otras.
+
+
+CARPETA_RESULTADOS = os.path.join(os.path.dirname(__file__), "resultados")
+
+
+def resumir(latencias):
+
+    # latencias en segundos -> estadísticas en ms y operaciones por segundo
+
+    ordenadas = sorted(latencias)
+    total = sum(ordenadas)
+    return {
+        "n": len(ordenadas),
+        "total_s": round(total, 6),
+        "ops_por_s": round(len(ordenadas) / total, 2) if total else None,
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 4),
+        "p90_ms": round(percentil(ordenadas, 90) * 1000, 4),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 4),
+        "max_ms": round(ordenadas[-1] * 1000, 4) if ordenadas else 0.0,
+    }
+
+
+def medir(operacion, argumentos):
+
+    # Ejecuta operacion(*args) para cada elemento y devuelve las latencias.
+
+    latencias = []
+    for args in argumentos:
+        inicio = time.perf_counter()
+        operacion(*args)
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def crear_almacenamiento(tipo, carpeta):
+
+    if tipo == "sqlite":
+        return AlmacenamientoSQLite(os.path.join(carpeta, "eventos.db"))
+    if tipo == "diario":
+        return DiarioEventos(os.path.join(carpeta, "eventos.json"))
+    return AlmacenamientoJSON(os.path.join(carpeta, "eventos.json"))
+
+
+def ejecutar_escenario(n_eventos, parametros):
+
+    azar = random.Random(parametros["semilla"])
+    carpeta = tempfile.mkdtemp(prefix="bench-planificador-")
+
+    try:
+        recursos = generar_recursos(
+            parametros["recursos"], parametros["salas"], parametros["tipos"], parametros["semilla"]
+        )
+        restricciones = generar_restricciones(recursos, parametros["semilla"])
+        eventos = generar_eventos(recursos, restricciones, n_eventos, parametros["semilla"])
+
+        archivo_recursos = os.path.join(carpeta, "recursos.json")
+        archivo_restricciones = os.path.join(carpeta, "restricciones.json")
+        archivo_eventos = os.path.join(carpeta, "eventos.json")
+
+        with open(archivo_recursos, "w", encoding="utf-8") as f:
+            json.dump(recursos, f, ensure_ascii=False)
+        with open(archivo_restricciones, "w", encoding="utf-8") as f:
+            json.dump(restricciones, f, ensure_ascii=False)
+        with open(archivo_eventos, "w", encoding="utf-8") as f:
+            json.dump(
+                [{**e, "id": uuid.uuid4().hex, "fecha": e["fecha"].isoformat()} for e in eventos],
+                f, ensure_ascii=False
+            )
+        del eventos
+
+        def cargar():
+            planificador = PlanificadorEventos(crear_almacenamiento("json", carpeta))
+            planificador.cargar_recursos_json(archivo_recursos)
+            planificador.cargar_restricciones_json(archivo_restricciones)
+            planificador.cargar_eventos_json(archivo_eventos)
+            return planificador
+
+        resultados = {}
+        repeticiones = parametros["repeticiones"]
+
+        resultados["cargar_eventos_json"] = medir(cargar, [()] * repeticiones)
+
+        planificador = cargar()
+        resultados["guardar_eventos_json"] = medir(
+            planificador.guardar_eventos_json, [(archivo_eventos,)] * repeticiones
+        )
+
+        # Las altas y bajas se persisten con el almacenamiento elegido
+        almacenamiento = crear_almacenamiento(parametros["almacenamiento"], carpeta)
+        planificador.almacenamiento = almacenamiento
+        almacenamiento.guardar(planificador._eventos_serializados())
+
+        generador = GeneradorEventos(recursos, restricciones, parametros["semilla"] + 7)
+        hoy = date.today()
+        n_operaciones = parametros["operaciones"]
+
+        candidatos = [
+            (generador.evento(hoy + timedelta(days=azar.randrange(365))),)
+            for _ in range(n_operaciones)
+        ]
+        resultados["agregar_evento"] = medir(planificador.agregar_evento, candidatos)
+
+        consultas = []
+        for (evento,) in candidatos:
+            consultas.append((evento["sala"], evento["fecha"].date(), evento))
+        resultados["sugerir_proxima_fecha_libre"] = medir(
+            planificador.sugerir_proxima_fecha_libre, consultas
+        )
+
+        bajas = [
+            (e["tipo"], e["sala"], e["fecha"])
+            for e in azar.sample(planificador.eventos, min(n_operaciones, len(planificador.eventos)))
+        ]
+        resultados["eliminar_evento"] = medir(planificador.eliminar_evento, bajas)
+
+        if isinstance(almacenamiento, DiarioEventos):
+            almacenamiento.esperar()
+        if isinstance(almacenamiento, AlmacenamientoSQLite):
+            almacenamiento.cerrar()
+
+        return {operacion: resumir(latencias) for operacion, latencias in resultados.items()}
+
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def imprimir(resultados):
+
+    for n_eventos, operaciones in resultados.items():
+        print(f"\n== {n_eventos} eventos ==")
+        print(f"{'operación':<30}{'n':>6}{'ops/s':>12}{'p50 ms':>12}{'p90 ms':>12}{'p99 ms':>12}{'max ms':>12}")
+        for operacion, e in operaciones.items():
+            print(
+                f"{operacion:<30}{e['n']:>6}{e['ops_por_s'] or 0:>12.1f}"
+                f"{e['p50_ms']:>12.3f}{e['p90_ms']:>12.3f}{e['p99_ms']:>12.3f}{e['max_ms']:>12.3f}"
+            )
+
+
+def comparar(actual, archivo_previo):
+
+    # Muestra la razón actual / previa del p50 y p99 de cada operación (> 1 = más lento).
+
+    with open(archivo_previo, "r", encoding="utf-8") as f:
+        previo = json.load(f)["resultados"]
+
+    print(f"\n== comparación con {archivo_previo} (actual / previo) ==")
+    for n_eventos, operaciones in actual.items():
+        for operacion, e in operaciones.items():
+            antes = previo.get(n_eventos, {}).get(operacion)
+            if not antes or not antes["p50_ms"] or not antes["p99_ms"]:
+                continue
+            print(
+                f"{n_eventos:>8} {operacion:<30}"
+                f" p50 x{e['p50_ms'] / antes['p50_ms']:.2f}"
+                f" p99 x{e['p99_ms'] / antes['p99_ms']:.2f}"
+            )
+
+
+def main(argumentos=None):
+
+    parser = argparse.ArgumentParser(description="Benchmarks del planificador de eventos")
+    parser.add_argument("--eventos", default="1000,10000,100000",
+                        help="tamaños de agenda separados por coma (hasta 1000000)")
+    parser.add_argument("--recursos", type=int, default=200)
+    parser.add_argument("--salas", type=int, default=30)
+    parser.add_argument("--tipos", type=int, default=20)
+    parser.add_argument("--operaciones", type=int, default=500,
+                        help="altas, sugerencias y bajas medidas por escenario")
+    parser.add_argument("--repeticiones", type=int, default=3,
+                        help="repeticiones de la carga y el guardado completos")
+    parser.add_argument("--almacenamiento", choices=["json", "diario", "sqlite"], default="diario",
+                        help="persistencia usada por agregar_evento y eliminar_evento")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default=CARPETA_RESULTADOS)
+    parser.add_argument("--comparar", help="archivo de resultados previo")
+    args = parser.parse_args(argumentos)
+
+    parametros = {
+        "recursos": args.recursos,
+        "salas": args.salas,
+        "tipos": args.tipos,
+        "operaciones": args.operaciones,
+        "repeticiones": args.repeticiones,
+        "almacenamiento": args.almacenamiento,
+        "semilla": args.semilla,
+    }
+
+    resultados = {}
+    for n_eventos in (int(n) for n in args.eventos.split(",")):
+        resultados[str(n_eventos)] = ejecutar_escenario(n_eventos, parametros)
+
+    imprimir(resultados)
+
+    os.makedirs(args.salida, exist_ok=True)
+    archivo = os.path.join(args.salida, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(archivo, "w", encoding="utf-8") as f:
+        json.dump(
+            {"fecha": datetime.now().isoformat(), "parametros": parametros, "resultados": resultados},
+            f, ensure_ascii=False, indent=2
+        )
+    print(f"\nResultados guardados en {archivo}")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
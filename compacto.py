@@ -0,0 +1,265 @@
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+
+# Representación compacta de los eventos guardados en el planificador.
+#
+# Tipo y sala se guardan como ordinales de un Catalogo (cada nombre existe una sola
+# vez en memoria) y los recursos como dos arreglos paralelos y cortos: los ordinales
+# (en recursos.json) de los recursos pedidos y sus cantidades. Los registros se leen igual que los diccionarios de
+# siempre (evento["sala"], evento.get("recursos", {}), "fin" in evento); la conversión
+# a diccionario se hace solo al guardar (copy()).
+
+
+class Catalogo:
+
+    # Tablas de nombres internados: nombre <-> ordinal para tipos, salas y recursos.
+    # Los recursos de recursos.json toman los primeros ordinales, en orden de aparición;
+    # los nombres desconocidos se agregan al final. Un ordinal nunca cambia.
+
+    def __init__(self):
+
+        self.tipos = []
+        self.salas = []
+        self.recursos = []
+        self._ordinal_tipo = {}
+        self._ordinal_sala = {}
+        self.ordinal_recurso = {}
+
+
+    def registrar_recursos(self, recursos):
+
+        # Interna los nombres del catálogo (recursos.json) para que ocupen los primeros ordinales.
+
+        for categoria in recursos.values():
+            if isinstance(categoria, dict):
+                for recurso in categoria:
+                    self.ordinal(self.recursos, self.ordinal_recurso, recurso)
+        for sala in recursos.get("salas", {}):
+            self.ordinal(self.salas, self._ordinal_sala, sala)
+        for tipo in recursos.get("eventos", []):
+            self.ordinal(self.tipos, self._ordinal_tipo, tipo)
+
+
+    def compactar(self, evento):
+
+        # Diccionario -> EventoCompacto
+
+        recursos = evento.get("recursos") or {}
+        pares = sorted(
+            (self.ordinal(self.recursos, self.ordinal_recurso, recurso), cantidad)
+            for recurso, cantidad in recursos.items()
+            if cantidad
+        )
+
+        extra = {
+            clave: valor for clave, valor in evento.items()
+            if clave not in EventoCompacto.CLAVES
+        }
+
+        return EventoCompacto(
+            self,
+            evento.get("id"),
+            self.ordinal(self.tipos, self._ordinal_tipo, evento["tipo"]),
+            self.ordinal(self.salas, self._ordinal_sala, evento["sala"]),
+            evento["fecha"],
+            evento.get("fin"),
+            array("i", [ordinal for ordinal, _ in pares]),
+            array("i", [cantidad for _, cantidad in pares]),
+            extra or None,
+        )
+
+
+    def sumar_por_dia(self, eventos):
+
+        # Eventos compactos ordenados por fecha -> (días, matriz días x recursos) con el
+        # uso total de cada día; las columnas siguen el orden de self.recursos.
+
+        if not eventos:
+            return [], np.zeros((0, len(self.recursos)), dtype=np.int64)
+
+        dias = [e.fecha.date() for e in eventos]
+        inicios = [0] + [i for i in range(1, len(dias)) if dias[i] != dias[i - 1]]
+
+        totales = np.add.reduceat(self.matriz_recursos(eventos).astype(np.int64), inicios, axis=0)
+        return [dias[i] for i in inicios], totales
+
+
+    def matriz_recursos(self, eventos):
+
+        # Matriz densa (eventos x recursos) int32 con los recursos de eventos compactos,
+        # armada de una vez a partir de los pares (ordinal, cantidad) de todos los registros.
+
+        matriz = np.zeros((len(eventos), len(self.recursos)), dtype=np.int32)
+        if not eventos:
+            return matriz
+
+        largos = np.fromiter((len(e._ordinales) for e in eventos), dtype=np.int64, count=len(eventos))
+        ordinales = np.frombuffer(b"".join(e._ordinales.tobytes() for e in eventos), dtype=np.int32)
+        cantidades = np.frombuffer(b"".join(e._cantidades.tobytes() for e in eventos), dtype=np.int32)
+        matriz[np.repeat(np.arange(len(eventos)), largos), ordinales] = cantidades
+        return matriz
+
+
+    def ordinales(self, eventos):
+
+        # (ordinales de tipo, ordinales de sala) de eventos compactos, como vectores int32
+
+        return (
+            np.fromiter((e._tipo for e in eventos), dtype=np.int32, count=len(eventos)),
+            np.fromiter((e._sala for e in eventos), dtype=np.int32, count=len(eventos)),
+        )
+
+
+    def ordinal(self, nombres, indice, nombre):
+
+        ordinal = indice.get(nombre)
+        if ordinal is None:
+            ordinal = indice[nombre] = len(nombres)
+            nombres.append(nombre)
+        return ordinal
+
+
+class EventoCompacto(Mapping):
+
+    # Evento con __slots__; se comporta como un diccionario de solo lectura
+    # (salvo "id", "fin" y los campos extra, que se pueden asignar).
+
+    CLAVES = ("id", "tipo", "sala", "fecha", "fin", "recursos")
+
+    __slots__ = ("_catalogo", "id", "_tipo", "_sala", "fecha", "fin", "_ordinales", "_cantidades", "_extra")
+
+    def __init__(self, catalogo, id_evento, tipo, sala, fecha, fin, ordinales, cantidades, extra=None):
+
+        self._catalogo = catalogo
+        self.id = id_evento
+        self._tipo = tipo
+        self._sala = sala
+        self.fecha = fecha
+        self.fin = fin
+        self._ordinales = ordinales
+        self._cantidades = cantidades
+        self._extra = extra
+
+
+    def __getitem__(self, clave):
+
+        if clave == "fecha":
+            return self.fecha
+        if clave == "sala":
+            return self._catalogo.salas[self._sala]
+        if clave == "tipo":
+            return self._catalogo.tipos[self._tipo]
+        if clave == "recursos":
+            return RecursosCompactos(self._ordinales, self._cantidades, self._catalogo)
+        if clave == "id" and self.id is not None:
+            return self.id
+        if clave == "fin" and self.fin is not None:
+            return self.fin
+        if self._extra is not None and clave in self._extra:
+            return self._extra[clave]
+        raise KeyError(clave)
+
+
+    def __setitem__(self, clave, valor):
+
+        if clave in ("id", "fin"):
+            setattr(self, clave, valor)
+        elif clave in self.CLAVES:
+            raise TypeError(f"El campo '{clave}' de un evento guardado no se puede modificar")
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[clave] = valor
+
+
+    def __contains__(self, clave):
+
+        if clave == "fin":
+            return self.fin is not None
+        if clave == "id":
+            return self.id is not None
+        if clave in self.CLAVES:
+            return True
+        return self._extra is not None and clave in self._extra
+
+
+    def get(self, clave, defecto=None):
+        return self[clave] if clave in self else defecto
+
+
+    def __iter__(self):
+
+        for clave in self.CLAVES:
+            if clave in self:
+                yield clave
+        if self._extra is not None:
+            yield from self._extra
+
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+    def __repr__(self):
+        return f"EventoCompacto({self.copy()!r})"
+
+
+    def copy(self):
+
+        # Diccionario equivalente (recursos como diccionario común)
+
+        evento = dict(self)
+        evento["recursos"] = dict(evento["recursos"])
+        return evento
+
+
+class RecursosCompactos(Mapping):
+
+    # Vista {recurso: cantidad} de los arreglos (ordinales, cantidades) de un registro,
+    # en el orden del catálogo
+
+    __slots__ = ("_ordinales", "_cantidades", "_catalogo")
+
+    def __init__(self, ordinales, cantidades, catalogo):
+        self._ordinales = ordinales
+        self._cantidades = cantidades
+        self._catalogo = catalogo
+
+
+    def __getitem__(self, recurso):
+
+        cantidad = self.get(recurso)
+        if cantidad is None:
+            raise KeyError(recurso)
+        return cantidad
+
+
+    def get(self, recurso, defecto=None):
+
+        ordinal = self._catalogo.ordinal_recurso.get(recurso)
+        if ordinal is None:
+            return defecto
+        for i, o in enumerate(self._ordinales):
+            if o == ordinal:
+                return self._cantidades[i]
+        return defecto
+
+
+    def __iter__(self):
+
+        nombres = self._catalogo.recursos
+        for ordinal in self._ordinales:
+            yield nombres[ordinal]
+
+
+    def items(self):
+
+        nombres = self._catalogo.recursos
+        return [(nombres[o], c) for o, c in zip(self._ordinales, self._cantidades)]
+
+
+    def __len__(self):
+        return len(self._ordinales)
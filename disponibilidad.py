@@ -0,0 +1,194 @@
+from datetime import timedelta
+import copy
+
+import numpy as np
+
+
+class MotorDisponibilidad:
+
+    # Calendario vectorizado de disponibilidad.
+    # - uso: matriz (días x recursos) con lo ya reservado cada día
+    # - ocupacion: matriz (días x salas) con la cantidad de eventos por sala y día
+    # Las columnas de recursos salen de recursos.json; la fila 0 corresponde a self.origen.
+
+    DIAS_BLOQUE = 366
+
+    def __init__(self, recursos, origen):
+
+        self.indice_recurso = {}
+        capacidades = []
+
+        for categoria in recursos.values():
+            if not isinstance(categoria, dict):
+                continue
+            for recurso, total in categoria.items():
+                if recurso in self.indice_recurso:
+                    # el mismo nombre en dos categorías: manda la menor capacidad
+                    columna = self.indice_recurso[recurso]
+                    capacidades[columna] = min(capacidades[columna], total)
+                    continue
+                self.indice_recurso[recurso] = len(capacidades)
+                capacidades.append(total)
+
+        self.capacidad = np.array(capacidades, dtype=np.int64)
+
+        self.indice_sala = {
+            sala: i for i, sala in enumerate(recursos.get("salas", {}))
+        }
+
+        self.origen = origen
+        self.uso = np.zeros((self.DIAS_BLOQUE, len(self.capacidad)), dtype=np.int64)
+        self.ocupacion = np.zeros((self.DIAS_BLOQUE, len(self.indice_sala)), dtype=np.int32)
+
+
+    def registrar(self, evento, signo=1):
+
+        # Suma (signo=1) o resta (signo=-1) un evento del calendario.
+
+        fecha = evento["fecha"].date()
+        self._asegurar_rango(fecha, fecha + timedelta(days=1))
+        fila = (fecha - self.origen).days
+
+        for recurso, cantidad in evento.get("recursos", {}).items():
+            columna = self.indice_recurso.get(recurso)
+            if columna is not None:
+                self.uso[fila, columna] += signo * cantidad
+
+        columna = self._columna_sala(evento["sala"])
+        self.ocupacion[fila, columna] += signo
+
+
+    def registrar_totales(self, dias, recursos, totales, salas):
+
+        # Carga de una vez el uso de muchos días: totales es una matriz (días x recursos)
+        # con columnas en el orden de la lista recursos; salas es {(sala, fecha): eventos}.
+
+        if dias:
+            self._asegurar_rango(dias[0], dias[-1] + timedelta(days=1))
+
+        columnas = [(j, self.indice_recurso[r]) for j, r in enumerate(recursos) if r in self.indice_recurso]
+        if columnas and dias:
+            origen, destino = zip(*columnas)
+            filas = [(d - self.origen).days for d in dias]
+            self.uso[np.ix_(filas, destino)] += totales[:, list(origen)]
+
+        for (sala, fecha), cantidad in salas.items():
+            columna = self._columna_sala(sala)
+            self._asegurar_rango(fecha, fecha + timedelta(days=1))
+            self.ocupacion[(fecha - self.origen).days, columna] += cantidad
+
+
+    def vector_recursos(self, recursos):
+
+        # Convierte {recurso: cantidad} en un vector según las columnas del catálogo.
+
+        vector = np.zeros(len(self.capacidad), dtype=np.int64)
+        for recurso, cantidad in recursos.items():
+            columna = self.indice_recurso.get(recurso)
+            if columna is not None:
+                vector[columna] = cantidad
+        return vector
+
+
+    def primera_fecha_libre(self, sala, fecha_inicial, recursos, max_dias=365):
+
+        # Primer día en [fecha_inicial, fecha_inicial + max_dias) con la sala libre
+        # y capacidad suficiente para todos los recursos pedidos.
+
+        libres = self._dias_libres(sala, fecha_inicial, max_dias, recursos)
+
+        if not libres.any():
+            return None
+        return fecha_inicial + timedelta(days=int(libres.argmax()))
+
+
+    def dias_libres(self, sala, inicio, fin, recursos):
+
+        # Vector booleano con un valor por día de [inicio, fin]: True si el paquete
+        # de recursos entra ese día (y la sala está libre, salvo sala=None).
+
+        return self._dias_libres(sala, inicio, (fin - inicio).days + 1, recursos)
+
+
+    def restantes(self, inicio, fin):
+
+        # Matriz (días x recursos) con la capacidad libre de cada día de [inicio, fin].
+
+        return self.capacidad - self._filas(self.uso, inicio, (fin - inicio).days + 1)
+
+
+    def copia(self):
+
+        # Copia para una vista de consulta (ver PlanificadorEventos._publicar_vista):
+        # registrar modifica las matrices en el lugar, así que no se comparten.
+
+        otra = copy.copy(self)
+        otra.uso = self.uso.copy()
+        otra.ocupacion = self.ocupacion.copy()
+        otra.indice_sala = dict(self.indice_sala)
+        return otra
+
+
+    def _dias_libres(self, sala, fecha_inicial, dias, recursos):
+
+        # Las consultas no amplían las matrices (pueden correr en paralelo con otras):
+        # fuera del calendario no hay nada reservado, y una sala desconocida está libre.
+
+        solicitado = self.vector_recursos(recursos)
+        inicio = (fecha_inicial - self.origen).days
+        desde, hasta = max(inicio, 0), min(inicio + dias, self.uso.shape[0])
+
+        libres = np.full(dias, bool(np.all(solicitado <= self.capacidad)))
+        if desde < hasta:
+            tramo = np.all(self.uso[desde:hasta] + solicitado <= self.capacidad, axis=1)
+            columna_sala = self.indice_sala.get(sala)
+            if columna_sala is not None:
+                tramo &= self.ocupacion[desde:hasta, columna_sala] == 0
+            libres[desde - inicio:hasta - inicio] = tramo
+        return libres
+
+
+    def _filas(self, matriz, fecha_inicial, dias):
+
+        # Filas de [fecha_inicial, fecha_inicial + dias), con ceros para los días
+        # que la matriz todavía no cubre.
+
+        inicio = (fecha_inicial - self.origen).days
+        fin = inicio + dias
+        if inicio >= 0 and fin <= matriz.shape[0]:
+            return matriz[inicio:fin]
+
+        filas = np.zeros((dias, matriz.shape[1]), dtype=matriz.dtype)
+        desde, hasta = max(inicio, 0), min(fin, matriz.shape[0])
+        if desde < hasta:
+            filas[desde - inicio:hasta - inicio] = matriz[desde:hasta]
+        return filas
+
+
+    def _columna_sala(self, sala):
+
+        # Las salas que no figuran en recursos.json se agregan como columnas nuevas.
+
+        if sala not in self.indice_sala:
+            self.indice_sala[sala] = len(self.indice_sala)
+            extra = np.zeros((self.ocupacion.shape[0], 1), dtype=np.int32)
+            self.ocupacion = np.hstack([self.ocupacion, extra])
+        return self.indice_sala[sala]
+
+
+    def _asegurar_rango(self, inicio, fin):
+
+        # Amplía las matrices (con un bloque de margen) para cubrir [inicio, fin).
+
+        antes = max(0, (self.origen - inicio).days)
+        if antes:
+            antes += self.DIAS_BLOQUE
+            self.uso = np.vstack([np.zeros((antes, self.uso.shape[1]), dtype=self.uso.dtype), self.uso])
+            self.ocupacion = np.vstack([np.zeros((antes, self.ocupacion.shape[1]), dtype=self.ocupacion.dtype), self.ocupacion])
+            self.origen -= timedelta(days=antes)
+
+        despues = (fin - self.origen).days - self.uso.shape[0]
+        if despues > 0:
+            despues += self.DIAS_BLOQUE
+            self.uso = np.vstack([self.uso, np.zeros((despues, self.uso.shape[1]), dtype=self.uso.dtype)])
+            self.ocupacion = np.vstack([self.ocupacion, np.zeros((despues, self.ocupacion.shape[1]), dtype=self.ocupacion.dtype)])
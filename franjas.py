@@ -0,0 +1,154 @@
+from datetime import datetime
+
+
+# Ocupación por franjas horarias dentro de un día.
+#
+# Un evento con "fin" ocupa solo las franjas entre "fecha" y "fin"; uno sin "fin"
+# ocupa el día completo (como los eventos de siempre). Las horas se redondean hacia
+# afuera a múltiplos de MINUTOS_FRANJA.
+
+MINUTOS_FRANJA = 15
+FRANJAS_POR_DIA = 24 * 60 // MINUTOS_FRANJA
+
+
+def franjas_evento(evento):
+
+    # (primera franja, franja final excluida) del evento dentro de su día
+
+    fin = evento.get("fin")
+    if fin is None:
+        return 0, FRANJAS_POR_DIA
+
+    inicio_dia = datetime.combine(evento["fecha"].date(), datetime.min.time())
+    segundos_franja = MINUTOS_FRANJA * 60
+
+    desde = int((evento["fecha"] - inicio_dia).total_seconds()) // segundos_franja
+    hasta = -(-int((fin - inicio_dia).total_seconds()) // segundos_franja)
+    return desde, min(max(hasta, desde + 1), FRANJAS_POR_DIA)
+
+
+def hora_franja(fecha, franja):
+
+    # datetime del comienzo de una franja del día fecha
+
+    minutos = franja * MINUTOS_FRANJA
+    return datetime.combine(fecha, datetime.min.time()).replace(hour=minutos // 60, minute=minutos % 60)
+
+
+class ArbolMaximos:
+
+    # Árbol de segmentos sobre las franjas de un día:
+    # sumar un valor en un rango y consultar el máximo de un rango, ambos en O(log n).
+    # maximo[nodo] ya incluye pendiente[nodo] (lo sumado a todo el segmento del nodo).
+
+    def __init__(self, n=FRANJAS_POR_DIA):
+
+        self.n = n
+        self.maximo = [0] * (4 * n)
+        self.pendiente = [0] * (4 * n)
+
+
+    def sumar(self, desde, hasta, valor):
+        self._sumar(1, 0, self.n, desde, hasta, valor)
+
+
+    def maximo_en(self, desde, hasta):
+        return self._maximo(1, 0, self.n, desde, hasta)
+
+
+    def copia(self):
+
+        otro = ArbolMaximos.__new__(ArbolMaximos)
+        otro.n = self.n
+        otro.maximo = self.maximo[:]
+        otro.pendiente = self.pendiente[:]
+        return otro
+
+
+    def _sumar(self, nodo, izquierda, derecha, desde, hasta, valor):
+
+        if hasta <= izquierda or derecha <= desde:
+            return
+
+        if desde <= izquierda and derecha <= hasta:
+            self.maximo[nodo] += valor
+            self.pendiente[nodo] += valor
+            return
+
+        medio = (izquierda + derecha) // 2
+        self._sumar(2 * nodo, izquierda, medio, desde, hasta, valor)
+        self._sumar(2 * nodo + 1, medio, derecha, desde, hasta, valor)
+        self.maximo[nodo] = self.pendiente[nodo] + max(self.maximo[2 * nodo], self.maximo[2 * nodo + 1])
+
+
+    def _maximo(self, nodo, izquierda, derecha, desde, hasta):
+
+        if hasta <= izquierda or derecha <= desde:
+            return float("-inf")
+
+        if desde <= izquierda and derecha <= hasta:
+            return self.maximo[nodo]
+
+        medio = (izquierda + derecha) // 2
+        return self.pendiente[nodo] + max(
+            self._maximo(2 * nodo, izquierda, medio, desde, hasta),
+            self._maximo(2 * nodo + 1, medio, derecha, desde, hasta),
+        )
+
+
+class OcupacionDia:
+
+    # Ocupación por franjas de un día: un árbol por sala (eventos simultáneos)
+    # y uno por recurso (cantidad en uso). Los árboles se crean al primer uso.
+
+    def __init__(self):
+
+        self.con_horario = 0
+        self.salas = {}
+        self.recursos = {}
+
+
+    def registrar(self, evento, signo=1):
+
+        # Suma (signo=1) o resta (signo=-1) un evento.
+
+        desde, hasta = franjas_evento(evento)
+        if "fin" in evento:
+            self.con_horario += signo
+
+        self._arbol(self.salas, evento["sala"]).sumar(desde, hasta, signo)
+        for recurso, cantidad in evento.get("recursos", {}).items():
+            if cantidad:
+                self._arbol(self.recursos, recurso).sumar(desde, hasta, signo * cantidad)
+
+
+    def sala_ocupada(self, sala, desde, hasta):
+
+        arbol = self.salas.get(sala)
+        return arbol is not None and arbol.maximo_en(desde, hasta) > 0
+
+
+    def copia(self):
+
+        # Copia independiente (registrar modifica los árboles en el lugar).
+
+        otra = OcupacionDia()
+        otra.con_horario = self.con_horario
+        otra.salas = {sala: arbol.copia() for sala, arbol in self.salas.items()}
+        otra.recursos = {recurso: arbol.copia() for recurso, arbol in self.recursos.items()}
+        return otra
+
+
+    def uso_maximo(self, desde, hasta):
+
+        # {recurso: máximo uso simultáneo entre las franjas desde y hasta}
+
+        return {recurso: arbol.maximo_en(desde, hasta) for recurso, arbol in self.recursos.items()}
+
+
+    def _arbol(self, arboles, clave):
+
+        arbol = arboles.get(clave)
+        if arbol is None:
+            arbol = arboles[clave] = ArbolMaximos()
+        return arbol
@@ -0,0 +1,395 @@
+import argparse
+import csv
+import json
+import sys
+from contextlib import nullcontext
+from datetime import date, datetime
+from itertools import chain
+from operator import itemgetter
+from time import perf_counter
+
+from almacenamiento import (
+    AgendaDesactualizada, AlmacenamientoEventos, AlmacenamientoJSON, AlmacenamientoSQLite, DiarioEventos,
+    leer_eventos,
+)
+from planificador import PlanificadorEventos
+from recurrencias import fechas_serie, regla_desde_texto
+
+
+# Importación, validación y exportación de reservas por línea de comandos.
+#
+#   python -m planificador import reservas.csv [--rechazos rechazos.jsonl]
+#   python -m planificador validate reservas.jsonl
+#   python -m planificador export agenda.csv [--desde 2025-01-01 --hasta 2025-12-31]
+#
+# Formatos (por extensión o con --formato; "-" es stdin / stdout):
+# - JSONL: un evento por línea, igual que en eventos.json
+#   {"tipo": ..., "sala": ..., "fecha": "2025-05-01T00:00:00", "recursos": {...}}
+# - CSV: columnas id, tipo, sala, fecha, fin, recursos (objeto JSON) y recurrencia
+#   (objeto JSON); cualquier otra columna se toma como la cantidad de ese recurso.
+#
+# Las filas se leen y validan de a lotes (PlanificadorEventos.agregar_eventos_lote),
+# así que en memoria solo está la agenda y el lote en curso. Las filas rechazadas
+# se escriben, con sus errores, en un archivo JSONL aparte. validate hace lo mismo
+# sin guardar nada: cada fila se valida contra la agenda más las filas anteriores.
+# eventos.json queda en el formato que tenía: la lista simple sigue siendo lista
+# simple y una instantánea con bitácora sigue siéndolo.
+
+CAMPOS = ("id", "tipo", "sala", "fecha", "fin", "recursos", "recurrencia")
+
+
+def main(argumentos=None):
+
+    parser = argparse.ArgumentParser(prog="python -m planificador", description="Reservas por línea de comandos")
+    parser.add_argument("--eventos", default="data/eventos.json",
+                        help="agenda: JSON (con bitácora .log) o base SQLite (.db)")
+    parser.add_argument("--recursos", default="data/recursos.json")
+    parser.add_argument("--restricciones", default="data/restricciones.json")
+    parser.add_argument("--formato", choices=("csv", "jsonl"),
+                        help="por defecto según la extensión del archivo")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    for nombre, ayuda in (("import", "agregar reservas a la agenda"),
+                          ("validate", "validar reservas sin guardarlas")):
+        comando = comandos.add_parser(nombre, help=ayuda)
+        comando.add_argument("archivo", help="CSV o JSONL de entrada ('-' = stdin)")
+        comando.add_argument("--rechazos", help="JSONL con las filas rechazadas "
+                                                "(por defecto <archivo>.rechazos.jsonl)")
+        comando.add_argument("--lote", type=int, default=1000, help="filas por lote")
+        comando.add_argument("--rapido", action="store_true",
+                             help="solo el primer error de cada fila (fallo rápido)")
+
+    exportar_ = comandos.add_parser("export", help="exportar la agenda")
+    exportar_.add_argument("archivo", help="CSV o JSONL de salida ('-' = stdout)")
+    exportar_.add_argument("--desde", type=date.fromisoformat)
+    exportar_.add_argument("--hasta", type=date.fromisoformat)
+
+    args = parser.parse_args(argumentos)
+    formato = args.formato or _formato(args.archivo)
+
+    almacenamiento = _almacenamiento(args.eventos)
+    lista_simple = isinstance(almacenamiento, DiarioEventos) and not _es_instantanea(args.eventos)
+    planificador = PlanificadorEventos(almacenamiento)
+    planificador.cargar_recursos_json(args.recursos)
+    planificador.cargar_restricciones_json(args.restricciones)
+
+    try:
+        # Solo import escribe. export y validate no usan cargar_eventos, que guarda los
+        # ids que asigna a los eventos que no tenían (y reescribiría el archivo).
+        if args.comando == "import":
+            planificador.cargar_eventos()
+        elif isinstance(almacenamiento, AlmacenamientoSQLite):
+            planificador._usar_eventos_cargados(almacenamiento.cargar())
+        else:
+            planificador._usar_eventos_cargados(leer_eventos(args.eventos)[0])
+
+        if args.comando == "export":
+            exportar(planificador, args.archivo, formato, args.desde, args.hasta)
+            return 0
+
+        nombre = "importadas"
+        if args.comando == "validate":
+            planificador.almacenamiento = _SinGuardar()
+            nombre = "válidas"
+
+        rechazos = args.rechazos
+        if rechazos is None:
+            rechazos = "rechazos.jsonl" if args.archivo == "-" else args.archivo + ".rechazos.jsonl"
+
+        progreso = importar(
+            planificador, args.archivo, formato, rechazos, args.lote, args.rapido, nombre
+        )
+
+        # Instantánea única con todo lo importado (la bitácora no se compactó durante la importación),
+        # en el formato que ya tenía el archivo. Si otra sesión escribió mientras tanto, no se
+        # pisa: la bitácora ya tiene todo y se lee igual sobre cualquiera de los dos formatos.
+        if args.comando == "import" and progreso.aceptadas and isinstance(almacenamiento, DiarioEventos):
+            final = AlmacenamientoJSON(args.eventos) if lista_simple else almacenamiento
+            try:
+                with planificador._guardando():
+                    final.guardar(planificador._eventos_serializados())
+            except AgendaDesactualizada:
+                pass
+            almacenamiento.esperar()
+
+        if progreso.rechazadas:
+            print(f"Filas rechazadas en {rechazos}", file=sys.stderr)
+        return 1 if progreso.rechazadas else 0
+
+    finally:
+        if isinstance(almacenamiento, AlmacenamientoSQLite):
+            almacenamiento.cerrar()
+
+
+def importar(planificador, archivo, formato, rechazos, lote=1000, fallo_rapido=False, nombre="importadas"):
+
+    # Agrega las filas del archivo de a lotes (o solo las valida, si el almacenamiento
+    # del planificador no guarda). Devuelve el Progreso final.
+
+    progreso = Progreso(nombre)
+    pendientes = []  # (número de fila, fila, evento)
+    ids_pendientes = set()
+
+    # Las filas que no se pueden leer se rechazan enseguida y las de un lote al procesarlo:
+    # se juntan y se escriben al final, en el orden del archivo
+    rechazadas = []  # (número de fila, fila, errores)
+
+    def rechazar(numero, fila, errores):
+        rechazadas.append((numero, fila, errores))
+
+    def procesar_lote():
+        resultados = planificador.agregar_eventos_lote(
+            [evento for _, _, evento in pendientes], fallo_rapido=fallo_rapido
+        )
+        for (numero, fila, _), (exito, errores) in zip(pendientes, resultados):
+            if not exito:
+                rechazar(numero, fila, errores)
+        progreso.anotar(sum(exito for exito, _ in resultados), len(resultados))
+        pendientes.clear()
+        ids_pendientes.clear()
+
+    for numero, fila in leer_filas(archivo, formato):
+        try:
+            evento = evento_desde_fila(fila, formato)
+        except (ValueError, TypeError, KeyError) as error:
+            rechazar(numero, fila, [f"Fila inválida: {error}"])
+            progreso.anotar(0, 1)
+            continue
+
+        id_evento = evento.get("id")
+        if id_evento is not None and (
+            id_evento in ids_pendientes
+            or planificador.obtener_evento(id_evento) is not None
+            or planificador.obtener_serie(id_evento) is not None
+        ):
+            rechazar(numero, fila, [f"Ya existe un evento con el id '{id_evento}'."])
+            progreso.anotar(0, 1)
+            continue
+
+        if "recurrencia" in evento:
+            # Las series van de a una, respetando el orden del archivo
+            if pendientes:
+                procesar_lote()
+            exito, errores = planificador.agregar_serie(evento)
+            if not exito:
+                rechazar(numero, fila, errores)
+            progreso.anotar(int(exito), 1)
+            continue
+
+        pendientes.append((numero, fila, evento))
+        if id_evento is not None:
+            ids_pendientes.add(id_evento)
+        if len(pendientes) >= lote:
+            procesar_lote()
+
+    if pendientes:
+        procesar_lote()
+
+    rechazadas.sort(key=itemgetter(0))
+    with open(rechazos, "w", encoding="utf-8") as salida_rechazos:
+        for numero, fila, errores in rechazadas:
+            salida_rechazos.write(
+                json.dumps({"fila": numero, "datos": fila, "errores": errores}, ensure_ascii=False) + "\n"
+            )
+
+    progreso.terminar()
+    return progreso
+
+
+def exportar(planificador, archivo, formato, desde=None, hasta=None):
+
+    # Escribe la agenda evento por evento (y las series al final).
+    # Con desde/hasta solo los eventos de esos días y las series con ocurrencias en ellos.
+
+    eventos = planificador.eventos
+    series = list(planificador.series.values())
+    if desde is not None or hasta is not None:
+        inicio, fin = planificador.rango_agenda()
+        desde, hasta = desde or inicio, hasta or fin
+        eventos = planificador.eventos_entre(desde, hasta)
+        series = [s for s in series if next(fechas_serie(s, desde, hasta), None) is not None]
+
+    progreso = Progreso("exportados")
+    with _abrir(archivo, "w") as salida:
+        if formato == "csv":
+            escritor = csv.DictWriter(salida, fieldnames=CAMPOS)
+            escritor.writeheader()
+            escribir = lambda e: escritor.writerow(fila_csv(e))
+        else:
+            escribir = lambda e: salida.write(json.dumps(e, ensure_ascii=False) + "\n")
+
+        for evento in chain(eventos, series):
+            escribir(planificador._serializar_evento(evento))
+            progreso.anotar(1, 1)
+
+    progreso.terminar()
+    return progreso
+
+
+def leer_filas(archivo, formato):
+
+    # (número de fila, fila) de a una: diccionario de texto (CSV) o línea sin parsear (JSONL)
+
+    with _abrir(archivo, "r") as entrada:
+        if formato == "csv":
+            yield from enumerate(csv.DictReader(entrada), start=2)
+        else:
+            for numero, linea in enumerate(entrada, start=1):
+                if linea.strip():
+                    yield numero, linea.rstrip("\n")
+
+
+def evento_desde_fila(fila, formato):
+
+    # Fila de entrada -> evento como lo espera el planificador (fechas como datetime).
+    # Lanza ValueError / TypeError / KeyError si la fila no se puede interpretar.
+
+    if formato == "csv":
+        evento = {}
+        recursos = {}
+        for campo, valor in fila.items():
+            if campo is None or valor is None or valor == "":
+                continue
+            if campo in ("recursos", "recurrencia"):
+                evento[campo] = json.loads(valor)
+            elif campo in CAMPOS:
+                evento[campo] = valor
+            else:
+                recursos[campo] = int(valor)
+        if recursos:
+            evento["recursos"] = {**evento.get("recursos", {}), **recursos}
+    else:
+        evento = json.loads(fila)
+
+    return evento_desde_objeto(evento)
+
+
+def evento_desde_objeto(evento):
+
+    # Objeto JSON ya leído -> evento para el planificador (también lo usa servicio.py).
+
+    if not isinstance(evento, dict):
+        raise ValueError("cada evento debe ser un objeto JSON")
+
+    for campo in ("tipo", "sala", "fecha"):
+        if campo not in evento:
+            raise ValueError(f"falta el campo '{campo}'")
+
+    evento["fecha"] = datetime.fromisoformat(evento["fecha"])
+    if "fin" in evento:
+        evento["fin"] = datetime.fromisoformat(evento["fin"])
+    if "recurrencia" in evento:
+        evento["recurrencia"] = regla_desde_texto(evento["recurrencia"])
+
+    recursos = evento.setdefault("recursos", {})
+    if not isinstance(recursos, dict):
+        raise TypeError("'recursos' debe ser un objeto {recurso: cantidad}")
+    for recurso, cantidad in recursos.items():
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool):
+            raise ValueError(f"la cantidad de '{recurso}' debe ser un número entero")
+
+    return evento
+
+
+def fila_csv(evento):
+
+    # Evento serializado -> fila CSV (recursos y recurrencia como JSON)
+
+    fila = {campo: evento.get(campo, "") for campo in CAMPOS}
+    fila["recursos"] = json.dumps(evento.get("recursos", {}), ensure_ascii=False)
+    if "recurrencia" in evento:
+        fila["recurrencia"] = json.dumps(evento["recurrencia"], ensure_ascii=False)
+    return fila
+
+
+class Progreso:
+
+    # Cuenta filas y muestra avance y velocidad por stderr (a lo sumo cada `cada` segundos).
+
+    def __init__(self, nombre, cada=2.0):
+
+        self.nombre = nombre
+        self.cada = cada
+        self.filas = 0
+        self.aceptadas = 0
+        self.inicio = perf_counter()
+        self._ultimo = self.inicio
+
+
+    @property
+    def rechazadas(self):
+        return self.filas - self.aceptadas
+
+
+    def anotar(self, aceptadas, filas):
+
+        self.aceptadas += aceptadas
+        self.filas += filas
+
+        ahora = perf_counter()
+        if ahora - self._ultimo >= self.cada:
+            self._ultimo = ahora
+            print(self.resumen(ahora), file=sys.stderr, flush=True)
+
+
+    def terminar(self):
+        print(self.resumen(perf_counter()), file=sys.stderr, flush=True)
+
+
+    def resumen(self, ahora):
+
+        segundos = ahora - self.inicio
+        velocidad = self.filas / segundos if segundos > 0 else 0.0
+        texto = f"{self.filas} filas, {self.aceptadas} {self.nombre}"
+        if self.rechazadas:
+            texto += f", {self.rechazadas} rechazadas"
+        return f"{texto} en {segundos:.1f} s ({velocidad:.0f} filas/s)"
+
+
+class _SinGuardar(AlmacenamientoEventos):
+
+    # validate: lo aceptado cuenta para las filas siguientes, pero no se guarda
+
+    def guardar(self, eventos):
+        pass
+
+    def registrar_altas(self, eventos, obtener_eventos):
+        pass
+
+    def registrar_bajas(self, eventos, obtener_eventos):
+        pass
+
+    def firma(self):
+        return None
+
+
+def _almacenamiento(archivo):
+
+    # La importación anota las altas en la bitácora y escribe el archivo una sola vez al final
+
+    if archivo.endswith(".db"):
+        return AlmacenamientoSQLite(archivo)
+    return DiarioEventos(archivo, umbral_bytes=float("inf"))
+
+
+def _es_instantanea(archivo):
+
+    # True si el archivo ya es una instantánea {"secuencia", "eventos"}; False si es la
+    # lista simple o todavía no existe (el formato que usa la aplicación por defecto)
+
+    try:
+        with open(archivo, "r", encoding="utf-8") as f:
+            return f.read(64).lstrip().startswith("{")
+    except FileNotFoundError:
+        return False
+
+
+def _formato(archivo):
+    return "csv" if archivo.lower().endswith(".csv") else "jsonl"
+
+
+def _abrir(archivo, modo):
+
+    if archivo == "-":
+        return nullcontext(sys.stdin if modo == "r" else sys.stdout)
+    return open(archivo, modo, encoding="utf-8", newline="")
@@ -0,0 +1,106 @@
+from collections import deque
+import math
+
+
+class Instrumentacion:
+
+    # Métricas por validador (o por cualquier paso con nombre): cantidad de llamadas,
+    # rechazos, tiempo acumulado y percentiles sobre las últimas MUESTRAS duraciones.
+
+    MUESTRAS = 10000
+
+    def __init__(self):
+        self._metricas = {}
+
+
+    def registrar(self, nombre, segundos, rechazo=False):
+
+        metrica = self._metricas.get(nombre)
+        if metrica is None:
+            metrica = self._metricas[nombre] = {
+                "llamadas": 0,
+                "rechazos": 0,
+                "total": 0.0,
+                "muestras": deque(maxlen=self.MUESTRAS),
+            }
+
+        metrica["llamadas"] += 1
+        metrica["total"] += segundos
+        metrica["muestras"].append(segundos)
+        if rechazo:
+            metrica["rechazos"] += 1
+
+
+    def resumen(self):
+
+        # {nombre: {llamadas, rechazos, tasa_rechazo, total_ms, media_ms, p50_ms, p90_ms, p99_ms}}
+
+        resumen = {}
+        for nombre, metrica in self._metricas.items():
+            muestras = sorted(metrica["muestras"])
+            llamadas = metrica["llamadas"]
+            resumen[nombre] = {
+                "llamadas": llamadas,
+                "rechazos": metrica["rechazos"],
+                "tasa_rechazo": metrica["rechazos"] / llamadas,
+                "total_ms": metrica["total"] * 1000,
+                "media_ms": metrica["total"] * 1000 / llamadas,
+                "p50_ms": percentil(muestras, 50) * 1000,
+                "p90_ms": percentil(muestras, 90) * 1000,
+                "p99_ms": percentil(muestras, 99) * 1000,
+            }
+        return resumen
+
+
+def percentil(valores, p):
+
+    # Percentil p (0-100) por el método del rango más cercano; valores ya ordenados.
+    # También lo usan los benchmarks (benchmarks/suite.py, benchmarks/carga_servicio.py).
+
+    if not valores:
+        return 0.0
+    indice = min(len(valores) - 1, max(0, math.ceil(p * len(valores) / 100) - 1))
+    return valores[indice]
+
+
+class OrdenAdaptativo:
+
+    # Orden de validadores para el modo de fallo rápido: primero los que encuentran
+    # rechazos con menos costo esperado (tiempo medio / probabilidad de rechazo).
+    # El orden se recalcula cada REORDENAR_CADA evaluaciones.
+
+    REORDENAR_CADA = 100
+
+    def __init__(self, nombres):
+
+        self.orden = nombres = tuple(nombres)
+        self._llamadas = dict.fromkeys(nombres, 0)
+        self._rechazos = dict.fromkeys(nombres, 0)
+        self._tiempo = dict.fromkeys(nombres, 0.0)
+        self._evaluaciones = 0
+
+
+    def registrar(self, nombre, segundos, rechazo):
+
+        self._llamadas[nombre] += 1
+        self._tiempo[nombre] += segundos
+        if rechazo:
+            self._rechazos[nombre] += 1
+
+
+    def evaluacion_terminada(self):
+
+        self._evaluaciones += 1
+        if self._evaluaciones % self.REORDENAR_CADA == 0:
+            self.orden = tuple(sorted(self.orden, key=self._costo_por_rechazo))
+
+
+    def _costo_por_rechazo(self, nombre):
+
+        # Suavizado de Laplace para no descartar validadores que todavía no rechazaron nada
+        llamadas = self._llamadas[nombre]
+        if not llamadas:
+            return 0.0
+        media = self._tiempo[nombre] / llamadas
+        probabilidad = (self._rechazos[nombre] + 1) / (llamadas + 2)
+        return media / probabilidad
@@ -1,16 +1,47 @@
 import streamlit as st
 from planificador import PlanificadorEventos
-import json
-from datetime import datetime
+from datetime import datetime, time, timedelta
+from franjas import MINUTOS_FRANJA
 
 
 
 # Inicializar planificador y cargar eventos
-
-planificador = PlanificadorEventos()
-planificador.cargar_eventos_json()
-planificador.cargar_recursos_json()
-planificador.cargar_restricciones_json()
+# Una sola instancia compartida entre reruns y sesiones; solo se vuelve a
+# leer un archivo cuando cambia en disco.
+
+@st.cache_resource
+def obtener_planificador():
+    planificador = PlanificadorEventos()
+    planificador.cargar_eventos_json()
+    planificador.cargar_recursos_json()
+    planificador.cargar_restricciones_json()
+    return planificador
+
+
+planificador = obtener_planificador()
+planificador.recargar_si_modificado()
+
+# Reservas que dejaron de cumplir las reglas tras el último cambio de recursos/restricciones
+if planificador.eventos_invalidos:
+    st.warning(
+        f"Tras el último cambio de reglas, {len(planificador.eventos_invalidos)} "
+        "reservas ya no las cumplen."
+    )
+    with st.expander("Ver reservas afectadas", expanded=False):
+        st.dataframe(
+            {
+                "Fecha": [e["fecha"].strftime("%Y-%m-%d") for e in planificador.eventos_invalidos],
+                "Tipo": [e["tipo"] for e in planificador.eventos_invalidos],
+                "Sala": [e["sala"] for e in planificador.eventos_invalidos],
+                "Errores": [" | ".join(e["errores"]) for e in planificador.eventos_invalidos],
+                "Id": [e["id"] for e in planificador.eventos_invalidos],
+            },
+            hide_index=True,
+            width="stretch"
+        )
+
+EVENTOS_POR_PAGINA = 50
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
 
 
 # Página principal
@@ -19,9 +50,40 @@ st.title(" Planificador de Eventos Musicales")
 
 # Mostrar recursos y restricciones (desplegables)
 with st.expander("Recursos disponibles", expanded=False):
-    with open("data/recursos.json", "r", encoding="utf-8") as f:
-        recursos = json.load(f)
-    st.json(recursos)
+    st.json(planificador.recursos)
+
+# Diagnóstico: tiempos y rechazos de cada validador
+with st.sidebar:
+    st.header("Diagnóstico")
+    if st.toggle("Medir validaciones", value=planificador.instrumentacion_activa()):
+        planificador.activar_instrumentacion()
+    else:
+        planificador.desactivar_instrumentacion()
+
+    estadisticas = planificador.estadisticas_validacion()
+    if estadisticas:
+        st.dataframe(
+            {
+                "Paso": list(estadisticas),
+                "Llamadas": [e["llamadas"] for e in estadisticas.values()],
+                "Rechazos": [e["rechazos"] for e in estadisticas.values()],
+                "Media ms": [round(e["media_ms"], 3) for e in estadisticas.values()],
+                "p50 ms": [round(e["p50_ms"], 3) for e in estadisticas.values()],
+                "p99 ms": [round(e["p99_ms"], 3) for e in estadisticas.values()],
+                "Total ms": [round(e["total_ms"], 1) for e in estadisticas.values()],
+            },
+            hide_index=True
+        )
+    elif planificador.instrumentacion_activa():
+        st.caption("Todavía no hay mediciones.")
+
+    sugerencias = planificador.estadisticas_sugerencias()
+    st.caption(
+        f"Cache de sugerencias: {sugerencias['aciertos']} aciertos, "
+        f"{sugerencias['fallos']} fallos ({sugerencias['tasa_aciertos']:.0%}), "
+        f"{sugerencias['entradas']}/{sugerencias['capacidad']} entradas, "
+        f"{sugerencias['invalidaciones']} invalidadas"
+    )
 
 
 # Opciones principales
@@ -36,27 +98,104 @@ opcion = st.radio(
 
 if opcion == "Ver agenda":
     st.header(" Agenda de Eventos")
-    if not planificador.eventos:
+    if not planificador.eventos and not planificador.series:
         st.info("No hay eventos registrados.")
     else:
-        for e in planificador.eventos:
-            st.markdown(f"**Tipo:** {e.get('tipo', 'Desconocido')}")
-            st.markdown(f"**Sala:** {e.get('sala', 'Desconocida')}")
-            st.markdown(f"**Fecha:** {e.get('fecha').strftime('%Y-%m-%d')}")
-            st.markdown("**Recursos asignados:**")
-            for rec, cant in e.get("recursos", {}).items():
-                st.markdown(f"- {rec}: {cant}")
-            st.markdown("---")
+        # Filtros: rango de fechas, sala y tipo
+        primer_dia, ultimo_dia = planificador.rango_agenda()
+        col1, col2 = st.columns(2)
+        with col1:
+            desde = st.date_input("Desde", primer_dia)
+        with col2:
+            hasta = st.date_input("Hasta", ultimo_dia)
+
+        col3, col4 = st.columns(2)
+        with col3:
+            sala_filtro = st.selectbox(
+                "Sala", ["Todas"] + list(planificador.recursos.get("salas", {}))
+            )
+        with col4:
+            tipo_filtro = st.selectbox(
+                "Tipo de evento", ["Todos"] + list(planificador.recursos.get("eventos", []))
+            )
+
+        eventos_filtrados = planificador.consultar_eventos(
+            desde,
+            hasta,
+            sala=None if sala_filtro == "Todas" else sala_filtro,
+            tipo=None if tipo_filtro == "Todos" else tipo_filtro
+        )
+
+        if not eventos_filtrados:
+            st.info("No hay eventos que coincidan con los filtros.")
+        else:
+            # Paginación: solo se arma la tabla de la página visible
+            paginas = (len(eventos_filtrados) - 1) // EVENTOS_POR_PAGINA + 1
+            pagina = st.number_input("Página", min_value=1, max_value=paginas, value=1, step=1)
+            st.caption(f"{len(eventos_filtrados)} eventos · página {pagina} de {paginas}")
+
+            inicio_pagina = (pagina - 1) * EVENTOS_POR_PAGINA
+            st.dataframe(
+                planificador.tabla_eventos(
+                    eventos_filtrados[inicio_pagina:inicio_pagina + EVENTOS_POR_PAGINA]
+                ),
+                hide_index=True,
+                width="stretch"
+            )
 
 # Opción: Eliminar Evento
 
 elif opcion == "Eliminar evento":
     st.header(" Eliminar Evento")
 
-    if not planificador.eventos:
+    # Resultado de la última eliminación: st.rerun() descarta lo que se mostró antes,
+    # así que el mensaje se guarda en session_state y se muestra en la ejecución siguiente
+    if "mensaje_eliminar" in st.session_state:
+        st.success(st.session_state.pop("mensaje_eliminar"))
+
+    # Copia de la agenda: otras sesiones pueden estar modificándola mientras se recorre
+    eventos, series = planificador.instantanea()
+
+    # Series recurrentes: se eliminan completas o una ocurrencia por vez
+    if series:
+        st.subheader("Series recurrentes")
+        etiquetas_series = {
+            s["id"]: (
+                f"{s['tipo']} | {s['sala']} | "
+                f"{', '.join(DIAS_SEMANA[d] for d in sorted(s['recurrencia']['dias_semana']))} | "
+                f"hasta {s['recurrencia']['hasta']}"
+            )
+            for s in series
+        }
+        id_serie = st.selectbox(
+            "Seleccione la serie", list(etiquetas_series), format_func=etiquetas_series.get
+        )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Eliminar serie"):
+                exito, mensaje = planificador.eliminar_serie(id_serie)
+                if exito:
+                    st.session_state.mensaje_eliminar = mensaje
+                    st.rerun()
+                else:
+                    st.error(mensaje)
+        with col2:
+            fecha_excluida = st.date_input("Ocurrencia a quitar")
+            if st.button("Quitar ocurrencia"):
+                exito, mensaje = planificador.excluir_ocurrencia(id_serie, fecha_excluida)
+                if exito:
+                    st.session_state.mensaje_eliminar = mensaje
+                    st.rerun()
+                else:
+                    st.error(mensaje)
+
+        st.markdown("---")
+
+    if not eventos and not series:
         st.info("No hay eventos planificados.")
     else:
-        # Confirmación simple para limpiar agenda
+        # Confirmación simple para limpiar agenda (eventos y series)
         if "confirmar_borrado" not in st.session_state:
             st.session_state.confirmar_borrado = False
 
@@ -65,18 +204,16 @@ elif opcion == "Eliminar evento":
                 st.session_state.confirmar_borrado = True
                 st.rerun()
         else:
-            st.warning("¿Estás seguro de que quieres eliminar TODOS los eventos?")
+            st.warning("¿Estás seguro de que quieres eliminar TODOS los eventos y series?")
             col1, col2 = st.columns(2)
 
             with col1:
                 if st.button("Sí, eliminar todo"):
-                    cantidad = len(planificador.eventos)
-                    planificador.eventos = []
-
-                    with open("data/eventos.json", "w", encoding="utf-8") as f:
-                        json.dump([], f, ensure_ascii=False, indent=2)
+                    cantidad = planificador.eliminar_eventos(
+                        [e["id"] for e in eventos] + [s["id"] for s in series]
+                    )
 
-                    st.success(f"Se eliminaron {cantidad} eventos.")
+                    st.session_state.mensaje_eliminar = f"Se eliminaron {cantidad} eventos y series."
                     st.session_state.confirmar_borrado = False
                     st.rerun()
 
@@ -87,37 +224,24 @@ elif opcion == "Eliminar evento":
 
         st.markdown("---")
 
+    if eventos:
         # Eliminar un solo evento
-        opciones = [
-            f"{e['tipo']} | {e['sala']} | {e['fecha'].strftime('%Y-%m-%d')}"
-            for e in planificador.eventos
-        ]
+        etiquetas = {
+            e["id"]: f"{e['tipo']} | {e['sala']} | {e['fecha'].strftime('%Y-%m-%d')}"
+            for e in eventos
+        }
 
-        seleccion = st.selectbox("Seleccione el evento a eliminar", opciones)
-        indice = opciones.index(seleccion)
-        evento_seleccionado = planificador.eventos[indice]
+        id_seleccionado = st.selectbox(
+            "Seleccione el evento a eliminar",
+            list(etiquetas),
+            format_func=etiquetas.get
+        )
 
         if st.button("Eliminar"):
-            exito, mensaje = planificador.eliminar_evento(
-                evento_seleccionado["tipo"],
-                evento_seleccionado["sala"],
-                evento_seleccionado["fecha"].date()
-            )
+            exito, mensaje = planificador.eliminar_evento_por_id(id_seleccionado)
 
             if exito:
-                st.success(mensaje)
-
-                with open("data/eventos.json", "w", encoding="utf-8") as f:
-                    json.dump(
-                        [
-                            {**ev, "fecha": ev["fecha"].date().isoformat()}
-                            for ev in planificador.eventos
-                        ],
-                        f,
-                        ensure_ascii=False,
-                        indent=2
-                    )
-
+                st.session_state.mensaje_eliminar = mensaje
                 st.rerun()
             else:
                 st.error(mensaje)
@@ -136,8 +260,30 @@ elif opcion == "Agregar evento":
     sala = st.selectbox("Sala", list(planificador.recursos.get("salas", {}).keys()))
     fecha = st.date_input("Fecha del evento")
 
-    # Recursos dinámicos 
+    # Sin horario el evento ocupa la sala y los recursos todo el día
+    con_horario = st.checkbox("Reservar solo un horario")
+    if con_horario:
+        col_inicio, col_fin = st.columns(2)
+        with col_inicio:
+            hora_inicio = st.time_input(
+                "Hora de inicio", time(9, 0), step=timedelta(minutes=MINUTOS_FRANJA)
+            )
+        with col_fin:
+            hora_fin = st.time_input(
+                "Hora de fin", time(10, 0), step=timedelta(minutes=MINUTOS_FRANJA)
+            )
+
+    # Repetición semanal: se guarda una sola serie
+    repetir = st.checkbox("Repetir cada semana")
+    if repetir:
+        dias_repeticion = st.multiselect(
+            "Días", list(range(7)), default=[fecha.weekday()], format_func=DIAS_SEMANA.__getitem__
+        )
+        repetir_hasta = st.date_input("Repetir hasta", fecha + timedelta(days=28))
+
+    # Recursos dinámicos (con lo que queda libre ese día)
     recursos_asignados = {}
+    libres_del_dia = planificador.disponibilidad_entre(fecha, fecha)[fecha]
     st.markdown("**Recursos para asignar**")
 
     for categoria, recursos_categoria in planificador.recursos.items():
@@ -149,11 +295,46 @@ elif opcion == "Agregar evento":
                     min_value=0,
                     value=0,
                     step=1,
-                    key=f"{categoria}_{rec}"
+                    key=f"{categoria}_{rec}",
+                    help=f"Libres el {fecha}: {libres_del_dia.get(rec, 0)}"
                 )
                 if cant > 0:
                     recursos_asignados[rec] = cant
 
+    # Disponibilidad mientras se completa el formulario (sin guardar nada)
+    if recursos_asignados:
+        borrador = {
+            "tipo": tipo,
+            "sala": sala,
+            "fecha": datetime.combine(fecha, datetime.min.time()),
+            "recursos": recursos_asignados
+        }
+        if con_horario:
+            borrador["fecha"] = datetime.combine(fecha, hora_inicio)
+            borrador["fin"] = datetime.combine(fecha, hora_fin)
+
+        entra, avisos = planificador.validar_evento(borrador)
+        if entra:
+            st.info("El evento entra en esa fecha.")
+        else:
+            st.warning("Así como está, el evento no entra:\n\n" + "\n".join(f"- {a}" for a in avisos))
+
+            alternativas = planificador.sugerir_alternativas(borrador, k=5)
+            if alternativas:
+                st.caption(
+                    "Alternativas más cercanas: "
+                    + ", ".join(f"sala {a['sala']} el {a['fecha']}" for a in alternativas)
+                )
+
+        proximos = planificador.dias_disponibles(
+            fecha, fecha + timedelta(days=30), recursos_asignados, sala
+        )
+        if proximos:
+            st.caption(
+                "Días con la sala y estos recursos libres (próximos 30): "
+                + ", ".join(str(d) for d in proximos[:10])
+            )
+
     # Botón para agregar
     if st.button("Agregar Evento"):
         if not tipo or not sala or not fecha:
@@ -166,24 +347,22 @@ elif opcion == "Agregar evento":
                 "fecha": datetime.combine(fecha, datetime.min.time()),
                 "recursos": recursos_asignados
             }
-
-            # Intentar agregar evento
-            exito, errores = planificador.agregar_evento(evento_nuevo)
+            if con_horario:
+                evento_nuevo["fecha"] = datetime.combine(fecha, hora_inicio)
+                evento_nuevo["fin"] = datetime.combine(fecha, hora_fin)
+
+            # Intentar agregar evento (o la serie completa)
+            if repetir:
+                evento_nuevo["recurrencia"] = {
+                    "dias_semana": dias_repeticion,
+                    "hasta": repetir_hasta,
+                }
+                exito, errores = planificador.agregar_serie(evento_nuevo)
+            else:
+                exito, errores = planificador.agregar_evento(evento_nuevo)
 
             if exito:
                 st.success("Evento agregado correctamente!")
-
-                # Guardar en JSON
-                with open("data/eventos.json", "w", encoding="utf-8") as f:
-                    json.dump(
-                        [
-                            {**ev, "fecha": ev["fecha"].date().isoformat()}
-                            for ev in planificador.eventos
-                        ],
-                        f,
-                        ensure_ascii=False,
-                        indent=2
-                    )
                 st.rerun()
             else:
                 st.error("No se pudo agregar el evento. Corrija los siguientes errores:")
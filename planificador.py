@@ -1,70 +1,260 @@
+from bisect import bisect_left, insort
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta
+from functools import wraps
+from operator import itemgetter
+from time import perf_counter
+import copy
 import json
+import threading
+import uuid
+
+from alternativas import BuscadorAlternativas
+from almacenamiento import (
+    AgendaDesactualizada, AlmacenamientoJSON, DiarioEventos, firma_archivo, leer_eventos,
+)
+from compacto import Catalogo
+from disponibilidad import MotorDisponibilidad
+from franjas import FRANJAS_POR_DIA, OcupacionDia, franjas_evento, hora_franja
+from instrumentacion import Instrumentacion, OrdenAdaptativo
+from programador import ProgramadorEventos
+from recurrencias import (
+    fechas_serie, ocurre_el, ocurrencia, regla_a_texto, regla_desde_texto, validar_regla,
+)
+from reglas import ReglasCompiladas
+from sugerencias import CacheSugerencias
+
+
+# clave de orden de self.eventos
+_fecha_evento = itemgetter("fecha")
+
+
+def _dias_serie(serie):
+    return fechas_serie(serie, serie["fecha"].date(), serie["recurrencia"]["hasta"])
+
+
+def _lectura(metodo):
+
+    # Consultas: leen la última vista publicada de la agenda (ver _publicar_vista),
+    # sin candado. No esperan a los escritores ni los hacen esperar, y nunca ven una
+    # escritura (ni una recarga desde disco) aplicada a medias.
+
+    @wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        return metodo(self._vista_actual(), *args, **kwargs)
+
+    return envoltura
+
+
+def _escritura(metodo):
+
+    # Métodos que modifican la agenda: uno a la vez por planificador (ver _escribiendo).
+    # Si otro planificador guardó desde la última carga, se pone al día antes de validar.
+    # Si guarda justo entre la validación y el guardado, _guardando lo detecta
+    # (AgendaDesactualizada) y la operación se repite, recargada y con el candado
+    # del almacenamiento tomado, así que se vuelve a validar contra lo último guardado.
+
+    @wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        with self._escribiendo():
+            if self._escrituras:
+                return metodo(self, *args, **kwargs)
+
+            self._escrituras += 1
+            try:
+                if self._agenda_desactualizada():
+                    self._ponerse_al_dia()
+                try:
+                    return metodo(self, *args, **kwargs)
+                except AgendaDesactualizada:
+                    with self.almacenamiento.candado():
+                        self.cargar_eventos()
+                        return metodo(self, *args, **kwargs)
+            finally:
+                self._escrituras -= 1
+
+    return envoltura
+
 
 class PlanificadorEventos:
     
     # Clase principal del sistema.
     
-
-    def __init__(self):
+    # Validadores que ejecuta agregar_evento, agrupados en etapas:
+    # 1. fecha y cantidades  2. exclusiones  3. corequisitos, reglas y personal
+    # 4. sala libre (con sugerencia)  5. recursos libres ese día (con sugerencia)
+    ETAPAS_VALIDACION = (
+        ("_validar_fechas", "_validar_disponibilidad_recursos"),
+        ("validar_exclusiones_por_sala", "validar_exclusiones_por_evento", "validar_evento_por_sala"),
+        (
+            "validar_corequisitos_por_recurso", "validar_corequisitos_por_categoria",
+            "_validar_reglas_evento", "_validar_personal_obligatorio",
+        ),
+        ("_validar_disponibilidad_sala",),
+        ("_validar_recursos_fecha",),
+    )
+
+    # Validadores que dependen del día del evento; el resto da lo mismo para cualquier fecha
+    VALIDADORES_POR_DIA = ("_validar_fechas", "_validar_disponibilidad_sala", "_validar_recursos_fecha")
+
+    # Validadores que buscan una fecha alternativa cuando fallan (se omite en fallo rápido)
+    VALIDADORES_CON_SUGERENCIA = ("_validar_disponibilidad_sala", "_validar_recursos_fecha")
+
+    def __init__(self, almacenamiento=None):
         
         self.recursos = None
         self.restricciones = None
+
+        # Agenda ordenada por fecha, como registros compactos (ver compacto.py):
+        # se leen como diccionarios, pero tipo, sala y recursos son ordinales del catálogo
         self.eventos = []
+        self._catalogo = Catalogo()
+
+        # Series recurrentes: id -> serie, y día de la semana -> series que lo usan.
+        # Las ocurrencias no se guardan; _con_series cachea por día la ocupación
+        # de eventos + ocurrencias (None si ese día no hay ocurrencias).
+        self.series = {}
+        self._series_por_dia_semana = {}
+        self._con_series = {}
+
+        # Índices de ocupación mantenidos de forma incremental:
+        # - fecha -> {recurso: cantidad total usada ese día}
+        # - (sala, fecha) -> cantidad de eventos en esa sala ese día
+        self._uso_por_dia = {}
+        self._salas_ocupadas = {}
+
+        # Índices por identificador y por (tipo, sala, fecha)
+        self._por_id = {}
+        self._por_clave = {}
+
+        # fecha -> OcupacionDia, solo para los días con algún evento con horario ("fin");
+        # en los demás días todos los eventos ocupan el día completo
+        self._franjas = {}
+
+        # Calendario vectorizado para buscar fechas libres (requiere recursos cargados)
+        self._motor = None
+
+        # Respuestas de sugerir_proxima_fecha_libre; cada alta o baja invalida solo
+        # las que miraron su día (ver sugerencias.py)
+        self._sugerencias = CacheSugerencias()
+
+        # Restricciones compiladas; se regeneran al cargar recursos o restricciones
+        self._reglas = ReglasCompiladas(None, None)
+
+        # Dónde se persisten las altas y bajas (por defecto data/eventos.json completo)
+        self.almacenamiento = almacenamiento or AlmacenamientoJSON()
+
+        # Archivos cargados y su firma (mtime, tamaño) para recargar_si_modificado;
+        # la de los eventos es la del almacenamiento (versión de la agenda guardada)
+        self._archivos = {}
+        self._firmas = {}
+
+        # Un solo escritor a la vez; las consultas leen una vista aparte (ver _lectura,
+        # _escritura y _publicar_vista). _cambios cuenta las modificaciones de la agenda
+        # y de las reglas, para saber si la vista quedó vieja.
+        self._candado = threading.RLock()
+        self._escritor = None
+        self._escrituras = 0
+        self._cambios = 0
+        self._vista = None
+        self._vista_pedida = False
+
+        # Generación de la cache de sugerencias con la que se armó esta vista
+        # (None en el planificador mismo, que siempre está al día)
+        self._generacion = None
+
+        # Reservas que dejaron de cumplir las reglas en la última recarga de
+        # recursos.json / restricciones.json (ver revalidar_por_cambio_de_reglas)
+        self.eventos_invalidos = []
+
+        # Métricas de validadores y persistencia (None = desactivadas)
+        self._instrumentacion = None
+
+        # Orden dinámico de validadores para agregar_evento(..., fallo_rapido=True)
+        self._orden_fallo_rapido = OrdenAdaptativo(
+            nombre for etapa in self.ETAPAS_VALIDACION for nombre in etapa
+            if nombre != "_validar_fechas"
+        )
+
+        self._publicar_vista()
 
     # Métodos principales para agregar y eliminar eventos
 
-    def agregar_evento(self, evento):
-
-        errores = []
+    @_escritura
+    def agregar_evento(self, evento, fallo_rapido=False):
 
-        # 1. TODAS las validaciones de evento
+        # Con fallo_rapido=True la validación se corta en el primer error (sin sugerencias),
+        # pensado para programación automática donde solo importa si entra o no.
 
-
-        errores += self._validar_fechas(evento)
-        errores += self._validar_disponibilidad_recursos(evento)
+        errores = self._validar_evento(evento, fallo_rapido)
 
         if errores:
             return False, errores
-        
 
-        errores += self.validar_exclusiones_por_sala(evento)
-        errores += self.validar_exclusiones_por_evento(evento)
-        errores += self.validar_evento_por_sala(evento)
-        
-        if errores:
-            return False, errores
+        # Guardar evento
+        registro = self._insertar_evento(evento)
+        self._persistir_altas([registro])
+        return True, "Evento agregado correctamente"
 
 
-        errores += self.validar_corequisitos_por_recurso(evento)
-        errores += self.validar_corequisitos_por_categoria(evento)
-        errores += self._validar_reglas_evento(evento)
-        errores += self._validar_personal_obligatorio(evento)
-        
+    @_lectura
+    def validar_evento(self, evento, fallo_rapido=False):
 
+        # Igual que agregar_evento pero sin agregar ni guardar nada:
+        # devuelve (True, []) si el evento entra tal como está, o (False, errores).
 
-        if errores:
-            return False, errores
+        errores = self._validar_evento(evento, fallo_rapido)
+        return not errores, errores
 
-        # aquí se valida sala y sugerencia
-        errores += self._validar_disponibilidad_sala(evento)
 
-        if errores:
-            return False, errores
-        
-        # si hay recursos ocupados ese dia, sugiere fecha
-        errores += self._validar_recursos_fecha(evento)
+    def agregar_eventos_lote(self, eventos, transaccional=False, fallo_rapido=False):
 
-        if errores:
-            return False, errores
+        # Agrega varios eventos de una vez (p. ej. importaciones masivas).
+        # Se validan en orden, así que los eventos aceptados cuentan para los siguientes.
+        # Devuelve una lista con un (exito, errores) por evento y guarda el JSON una sola vez.
+        # Con transaccional=True basta un rechazo para que no se agregue ninguno.
 
-        # 3. Guardar evento
-        self.eventos.append(evento)
-        self.eventos.sort(key=lambda e: e["fecha"])
-        self.guardar_eventos_json()
-        return True, "Evento agregado correctamente"
+        return self._agregar_eventos_lote(list(eventos), transaccional, fallo_rapido)
+
+
+    @_escritura
+    def _agregar_eventos_lote(self, eventos, transaccional, fallo_rapido):
 
+        resultados = []
+        aceptados = []
 
+        for evento in eventos:
+            errores = self._validar_evento(evento, fallo_rapido)
+
+            if errores:
+                resultados.append((False, errores))
+                if transaccional:
+                    break
+                continue
+
+            aceptados.append(self._insertar_evento(evento))
+            resultados.append((True, "Evento agregado correctamente"))
+
+        if transaccional and any(not exito for exito, _ in resultados):
+            # Deshacer todo lo agregado en este lote
+            for evento in aceptados:
+                self._quitar_evento(evento)
+
+            cancelado = ["Lote cancelado: otro evento del lote fue rechazado"]
+            resultados = [
+                (False, errores if not exito else cancelado)
+                for exito, errores in resultados
+            ]
+            resultados += [(False, cancelado)] * (len(eventos) - len(resultados))
+            return resultados
+
+        if aceptados:
+            self._persistir_altas(aceptados)
+
+        return resultados
+
+
+    @_escritura
     def eliminar_evento(self, tipo, sala, fecha):
         
         # Elimina un evento del planificador buscando por:
@@ -75,25 +265,550 @@ class PlanificadorEventos:
         if isinstance(fecha, datetime):
             fecha = fecha.date()
 
-        evento_a_eliminar = None
-        for e in self.eventos:
-            if (
-                e.get("tipo") == tipo and
-                e.get("sala") == sala and
-                e.get("fecha").date() == fecha
-            ):
-                evento_a_eliminar = e
-                break
+        candidatos = self._por_clave.get((tipo, sala, fecha))
+        if not candidatos:
+            return False, "Evento no encontrado"
+
+        evento_a_eliminar = candidatos[0]
+        self._quitar_evento(evento_a_eliminar)
+        self._persistir_bajas([evento_a_eliminar])  # actualizar JSON tras eliminar
+        return True, "Evento eliminado correctamente"
 
-        if evento_a_eliminar is None:
+
+    @_escritura
+    def eliminar_evento_por_id(self, id_evento):
+
+        evento = self._por_id.get(id_evento)
+        if evento is None:
             return False, "Evento no encontrado"
 
-        self.eventos.remove(evento_a_eliminar)
-        self.guardar_eventos_json()  # actualizar JSON tras eliminar
+        self._quitar_evento(evento)
+        self._persistir_bajas([evento])
         return True, "Evento eliminado correctamente"
 
+
+    def eliminar_eventos(self, ids):
+
+        # Elimina varios eventos (o series completas) por identificador en una sola
+        # pasada y guarda una vez. Devuelve la cantidad de eventos y series eliminados.
+
+        return self._eliminar_eventos(set(ids))
+
+
+    @_escritura
+    def _eliminar_eventos(self, ids):
+
+        eliminados = [self._por_id[i] for i in ids if i in self._por_id]
+        series = [self.series[i] for i in ids if i in self.series]
+        if not eliminados and not series:
+            return 0
+
+        if eliminados:
+            quitar = {id(e) for e in eliminados}
+            self.eventos = [e for e in self.eventos if id(e) not in quitar]
+            for evento in eliminados:
+                self._desindexar_evento(evento)
+        for serie in series:
+            self._desindexar_serie(serie)
+
+        self._persistir_bajas(eliminados + series)
+        return len(eliminados) + len(series)
+
+
+    def obtener_evento(self, id_evento):
+        return self._por_id.get(id_evento)
+
+
+    # Series recurrentes (ver recurrencias.py)
+
+    @_escritura
+    def agregar_serie(self, serie):
+
+        # Valida la serie contra la agenda ocurrencia por ocurrencia (se corta en la
+        # primera que falla) y la guarda una sola vez, sin expandir.
+
+        errores = self._validar_serie(serie)
+        if errores:
+            return False, errores
+
+        if "id" not in serie:
+            serie["id"] = self._nuevo_id()
+        self._indexar_serie(serie)
+        self._persistir_altas([serie])
+        return True, "Serie agregada correctamente"
+
+
+    @_escritura
+    def eliminar_serie(self, id_serie):
+
+        serie = self.series.get(id_serie)
+        if serie is None:
+            return False, "Serie no encontrada"
+
+        self._desindexar_serie(serie)
+        self._persistir_bajas([serie])
+        return True, "Serie eliminada correctamente"
+
+
+    @_escritura
+    def excluir_ocurrencia(self, id_serie, fecha):
+
+        # Saca un día de la serie (p. ej. un feriado) sin tocar el resto.
+
+        serie = self.series.get(id_serie)
+        if isinstance(fecha, datetime):
+            fecha = fecha.date()
+        if serie is None or not ocurre_el(serie, fecha):
+            return False, "Ocurrencia no encontrada"
+
+        # La serie se reemplaza por una copia: la vista publicada puede estar leyéndola
+        recurrencia = serie["recurrencia"]
+        recurrencia = dict(recurrencia, excepciones=recurrencia["excepciones"] | {fecha})
+        nueva = self.series[id_serie] = dict(serie, recurrencia=recurrencia)
+        for dia_semana in set(recurrencia["dias_semana"]):
+            self._series_por_dia_semana[dia_semana] = [
+                nueva if s is serie else s for s in self._series_por_dia_semana[dia_semana]
+            ]
+        self._cambios += 1
+        self._con_series.clear()
+        self._sugerencias.invalidar((fecha,))
+        with self._guardando():
+            self.almacenamiento.guardar(self._eventos_serializados())
+        return True, "Ocurrencia eliminada correctamente"
+
+
+    def obtener_serie(self, id_serie):
+        return self.series.get(id_serie)
+
+
+    @_lectura
+    def ocurrencias_entre(self, inicio, fin):
+
+        # Ocurrencias de todas las series con día en [inicio, fin], ordenadas por fecha.
+
+        if isinstance(inicio, datetime):
+            inicio = inicio.date()
+        if isinstance(fin, datetime):
+            fin = fin.date()
+
+        ocurrencias = [
+            ocurrencia(serie, fecha)
+            for serie in self.series.values()
+            for fecha in fechas_serie(serie, inicio, fin)
+        ]
+        ocurrencias.sort(key=_fecha_evento)
+        return ocurrencias
+
+
+    @_lectura
+    def sugerir_alternativas(self, evento, k=5):
+
+        # Las k salas y días más cercanos al pedido (antes o después) donde el evento
+        # entraría, entre las salas que las reglas permiten (ver alternativas.py).
+
+        return BuscadorAlternativas(self).buscar(evento, k)
+
+
+    def programar_solicitudes(self, solicitudes, presupuesto_segundos=5.0, confirmar=True):
+
+        # Elige sala y fecha para un lote de solicitudes flexibles (ver programador.py).
+        # Devuelve un (exito, evento | errores) por solicitud.
+
+        return ProgramadorEventos(self).programar(solicitudes, presupuesto_segundos, confirmar)
+
+
+    # Consultas por rango de fechas (self.eventos se mantiene ordenada por fecha)
+
+    @_lectura
+    def eventos_entre(self, inicio, fin):
+
+        # Eventos cuyo día está entre inicio y fin (ambos incluidos), ordenados por fecha.
+        # Acepta date o datetime; cuesta O(log N + k) con k = eventos devueltos.
+
+        if isinstance(inicio, datetime):
+            inicio = inicio.date()
+        if isinstance(fin, datetime):
+            fin = fin.date()
+
+        desde = bisect_left(
+            self.eventos, datetime.combine(inicio, datetime.min.time()), key=_fecha_evento
+        )
+        hasta = bisect_left(
+            self.eventos, datetime.combine(fin + timedelta(days=1), datetime.min.time()),
+            lo=desde, key=_fecha_evento
+        )
+        return self.eventos[desde:hasta]
+
+
+    @_lectura
+    def eventos_del_dia(self, fecha):
+        return self.eventos_entre(fecha, fecha)
+
+
+    @_lectura
+    def consultar_eventos(self, inicio=None, fin=None, sala=None, tipo=None):
+
+        # Eventos del rango [inicio, fin] (por defecto toda la agenda), opcionalmente
+        # filtrados por sala y tipo. El rango se resuelve por búsqueda binaria y los
+        # filtros con el índice (tipo, sala, día), sin recorrer los demás eventos.
+        # Incluye las ocurrencias de las series que caen en el rango.
+
+        if not self.eventos and not self.series:
+            return []
+
+        primero, ultimo = self.rango_agenda()
+        inicio = inicio or primero
+        fin = fin or ultimo
+        if isinstance(inicio, datetime):
+            inicio = inicio.date()
+        if isinstance(fin, datetime):
+            fin = fin.date()
+
+        if sala is None and tipo is None:
+            eventos = self.eventos_entre(inicio, fin)
+            series = self.series.values()
+        else:
+            eventos = self._eventos_por_clave(inicio, fin, sala, tipo)
+            series = [
+                s for s in self.series.values()
+                if (sala is None or s["sala"] == sala) and (tipo is None or s["tipo"] == tipo)
+            ]
+
+        if series:
+            ocurrencias = [
+                ocurrencia(serie, fecha) for serie in series for fecha in fechas_serie(serie, inicio, fin)
+            ]
+            eventos = sorted(eventos + ocurrencias, key=_fecha_evento)
+        return eventos
+
+
+    def _eventos_por_clave(self, inicio, fin, sala, tipo):
+
+        # Eventos de [inicio, fin] con esa sala y/o tipo, ordenados por fecha, leídos de
+        # _por_clave día por día. Sin uno de los dos filtros se prueba cada nombre del
+        # catálogo; si eso son más consultas que eventos tiene el rango, conviene filtrar
+        # el rango directamente.
+
+        tipos = [tipo] if tipo is not None else self._catalogo.tipos
+        salas = [sala] if sala is not None else self._catalogo.salas
+        dias = (fin - inicio).days + 1
+        if dias <= 0:
+            return []
+
+        desde = bisect_left(
+            self.eventos, datetime.combine(inicio, datetime.min.time()), key=_fecha_evento
+        )
+        hasta = bisect_left(
+            self.eventos, datetime.combine(fin + timedelta(days=1), datetime.min.time()),
+            lo=desde, key=_fecha_evento
+        )
+
+        if dias * len(tipos) * len(salas) > hasta - desde:
+            return [
+                e for e in self.eventos[desde:hasta]
+                if (sala is None or e["sala"] == sala) and (tipo is None or e["tipo"] == tipo)
+            ]
+
+        eventos = []
+        for d in range(dias):
+            fecha = inicio + timedelta(days=d)
+            del_dia = [
+                e for t in tipos for s in salas for e in self._por_clave.get((t, s, fecha), ())
+            ]
+            del_dia.sort(key=_fecha_evento)
+            eventos += del_dia
+        return eventos
+
+
+    @_lectura
+    def rango_agenda(self):
+
+        # (primer día, último día) con eventos u ocurrencias; (None, None) si no hay nada
+
+        dias = [e["fecha"].date() for e in self.eventos[:1] + self.eventos[-1:]]
+        for serie in self.series.values():
+            dias += [serie["fecha"].date(), serie["recurrencia"]["hasta"]]
+        if not dias:
+            return None, None
+        return min(dias), max(dias)
+
+
+    @_lectura
+    def instantanea(self):
+
+        # (eventos, series) de una misma vista, para recorrerlos (p. ej. desde la
+        # interfaz) mientras otras sesiones siguen modificando la agenda
+
+        return list(self.eventos), list(self.series.values())
+
+
+    @_lectura
+    def tabla_eventos(self, eventos):
+
+        # Proyección por columnas de una lista de eventos, lista para st.dataframe.
+
+        return {
+            "Fecha": [e["fecha"].strftime("%Y-%m-%d") for e in eventos],
+            "Horario": [
+                f"{e['fecha']:%H:%M}-{e['fin']:%H:%M}" if "fin" in e else "Todo el día"
+                for e in eventos
+            ],
+            "Tipo": [e["tipo"] for e in eventos],
+            "Sala": [e["sala"] for e in eventos],
+            "Recursos": [
+                ", ".join(f"{rec}: {cant}" for rec, cant in e.get("recursos", {}).items())
+                for e in eventos
+            ],
+            "Id": [e["id"] for e in eventos],
+        }
+
+
+    # Vista de consulta
+
+    @contextmanager
+    def _escribiendo(self, publicar=False):
+
+        # Candado de los escritores, reentrante en el mismo hilo. Las consultas no lo
+        # esperan; si alguna tuvo que leer la vista anterior mientras se escribía (o si
+        # publicar=True, en las cargas completas), la escritura más externa publica una
+        # vista nueva al terminar.
+
+        if self._vista is self:
+            raise RuntimeError("No se puede modificar la agenda dentro de una consulta")
+
+        with self._candado:
+            if publicar:
+                self._vista_pedida = True
+            anterior = self._escritor
+            self._escritor = threading.get_ident()
+            try:
+                yield
+            finally:
+                if anterior is None and self._vista_pedida:
+                    self._publicar_vista()
+                self._escritor = anterior
+
+
+    def _vista_actual(self):
+
+        # Qué leer: el hilo que está escribiendo lee la agenda misma (ve sus propios
+        # cambios); el resto, la última vista publicada. Si está vieja y nadie escribe
+        # se publica una nueva; si hay un escritor, se lee la anterior y se le pide una.
+
+        vista = self._vista
+        if vista is self or self._escritor == threading.get_ident():
+            return self
+
+        if vista._cambios != self._cambios:
+            if self._candado.acquire(blocking=False):
+                try:
+                    vista = self._publicar_vista()
+                finally:
+                    self._candado.release()
+            else:
+                self._vista_pedida = True
+        return vista
+
+
+    def _publicar_vista(self):
+
+        # Arma (con el candado de escritura tomado) una copia superficial del planificador
+        # que las consultas leen sin candado, y la publica reemplazando self._vista.
+        # Se copian los contenedores que las escrituras modifican en el lugar; lo que hay
+        # adentro (usos por día, listas de _por_clave y de series, OcupacionDia) se comparte,
+        # porque las escrituras lo reemplazan en vez de modificarlo (ver _indexar_evento).
+        # _por_id también se comparte: en las consultas solo lo usa obtener_evento.
+
+        vista = self._vista
+        if vista is None or vista._cambios != self._cambios:
+            vista = copy.copy(self)
+            vista.eventos = list(self.eventos)
+            vista.series = dict(self.series)
+            vista._series_por_dia_semana = dict(self._series_por_dia_semana)
+            vista._con_series = dict(self._con_series)
+            vista._uso_por_dia = dict(self._uso_por_dia)
+            vista._salas_ocupadas = dict(self._salas_ocupadas)
+            vista._por_clave = dict(self._por_clave)
+            vista._franjas = dict(self._franjas)
+            if self._motor is not None:
+                vista._motor = self._motor.copia()
+            vista._generacion = self._sugerencias.generacion
+            vista._escritor = None
+            vista._vista = vista
+            self._vista = vista
+
+        self._vista_pedida = False
+        return vista
+
+
+    def _insertar_evento(self, evento):
+
+        # Inserción por búsqueda binaria; los eventos del mismo momento quedan en orden de llegada.
+        # Se guarda (y devuelve) el registro compacto; el id se anota también en el diccionario recibido.
+
+        if "id" not in evento:
+            evento["id"] = self._nuevo_id()
+        registro = self._catalogo.compactar(evento)
+        insort(self.eventos, registro, key=_fecha_evento)
+        self._indexar_evento(registro)
+        return registro
+
+
+    def _quitar_evento(self, evento):
+
+        i = bisect_left(self.eventos, evento["fecha"], key=_fecha_evento)
+        while self.eventos[i] is not evento:
+            i += 1
+
+        del self.eventos[i]
+        self._desindexar_evento(evento)
+
+
     #             VALIDACIONES 
 
+    def _validar_evento(self, evento, fallo_rapido=False):
+
+        # Ejecuta todas las validaciones por etapas y devuelve la lista de errores.
+        # Si una etapa da errores no se ejecutan las siguientes.
+
+        errores = []
+
+        if fallo_rapido:
+            return self._validar_evento_fallo_rapido(evento)
+
+        if self._instrumentacion is not None:
+            return self._validar_evento_medido(evento)
+
+        for etapa in self.ETAPAS_VALIDACION:
+            for nombre in etapa:
+                errores += getattr(self, nombre)(evento)
+            if errores:
+                return errores
+
+        return errores
+
+
+    def _validar_evento_medido(self, evento):
+
+        # Igual que _validar_evento, pero registrando tiempo y rechazos de cada validador.
+
+        errores = []
+
+        for etapa in self.ETAPAS_VALIDACION:
+            for nombre in etapa:
+                inicio = perf_counter()
+                encontrados = getattr(self, nombre)(evento)
+                self._instrumentacion.registrar(
+                    nombre, perf_counter() - inicio, rechazo=bool(encontrados)
+                )
+                errores += encontrados
+            if errores:
+                return errores
+
+        return errores
+
+
+    def _validar_evento_fallo_rapido(self, evento):
+
+        # Devuelve solo los errores del primer validador que rechaza.
+        # _validar_fechas va siempre primero (los demás necesitan una fecha válida);
+        # el resto se ordena según el costo y la tasa de rechazo observados.
+
+        errores = self._validar_fechas(evento)
+        if errores:
+            return errores
+
+        orden = self._orden_fallo_rapido
+        for nombre in orden.orden:
+            validador = getattr(self, nombre)
+
+            inicio = perf_counter()
+            if nombre in self.VALIDADORES_CON_SUGERENCIA:
+                errores = validador(evento, sugerir=False)
+            else:
+                errores = validador(evento)
+            duracion = perf_counter() - inicio
+
+            orden.registrar(nombre, duracion, bool(errores))
+            if self._instrumentacion is not None:
+                self._instrumentacion.registrar(nombre, duracion, rechazo=bool(errores))
+            if errores:
+                break
+
+        orden.evaluacion_terminada()
+        return errores
+
+
+    def orden_fallo_rapido(self):
+
+        # Orden actual de los validadores en el modo de fallo rápido.
+
+        return ("_validar_fechas",) + self._orden_fallo_rapido.orden
+
+
+    def _validar_serie(self, serie):
+
+        # Los validadores que no dependen del día se corren una vez, por etapas;
+        # los de VALIDADORES_POR_DIA, ocurrencia por ocurrencia hasta la primera que falla.
+
+        errores = validar_regla(serie)
+        if errores:
+            return errores
+        serie["recurrencia"] = regla_desde_texto(serie["recurrencia"])
+
+        fechas = fechas_serie(serie, serie["fecha"].date(), serie["recurrencia"]["hasta"])
+        primera = next(fechas, None)
+        if primera is None:
+            return ["La serie no tiene ninguna ocurrencia"]
+
+        evento = ocurrencia(dict(serie, id=serie.get("id")), primera)
+        for etapa in self.ETAPAS_VALIDACION:
+            for nombre in etapa:
+                if nombre not in self.VALIDADORES_POR_DIA:
+                    errores += getattr(self, nombre)(evento)
+            if errores:
+                return errores
+
+        for fecha in (primera, *fechas):
+            evento = ocurrencia(dict(serie, id=serie.get("id")), fecha)
+            for nombre in self.VALIDADORES_POR_DIA:
+                errores = getattr(self, nombre)(evento)
+                if errores:
+                    return [f"Ocurrencia del {fecha}: {error}" for error in errores]
+
+        return []
+
+
+    # Instrumentación
+
+    def activar_instrumentacion(self):
+
+        # Empieza a medir cada validador y la persistencia (no reinicia si ya estaba activa).
+
+        if self._instrumentacion is None:
+            self._instrumentacion = Instrumentacion()
+            self._cambios += 1
+
+
+    def desactivar_instrumentacion(self):
+        self._instrumentacion = None
+        self._cambios += 1
+
+
+    def instrumentacion_activa(self):
+        return self._instrumentacion is not None
+
+
+    def estadisticas_validacion(self):
+
+        # {validador: {llamadas, rechazos, tasa_rechazo, total_ms, media_ms, p50_ms, p90_ms, p99_ms}}
+        # más una entrada "persistencia". Vacío si la instrumentación está desactivada.
+
+        if self._instrumentacion is None:
+            return {}
+        return self._instrumentacion.resumen()
+
+
     # fechas listo
     def _validar_fechas(self, evento):
         
@@ -121,6 +836,15 @@ class PlanificadorEventos:
         if fecha_evento > fecha_maxima:
             errores.append("No se pueden crear eventos con más de un año de anticipación")
 
+        # Eventos con horario: fin posterior al inicio y dentro del mismo día
+        fin = evento.get("fin")
+        if fin is not None:
+            if not isinstance(fin, datetime):
+                errores.append("La hora de fin debe ser un objeto datetime")
+            elif fin <= fecha:
+                errores.append("La hora de fin debe ser posterior a la hora de inicio")
+            elif fin > datetime.combine(fecha_evento + timedelta(days=1), datetime.min.time()):
+                errores.append("El evento debe terminar el mismo día en que empieza")
 
         return errores
 
@@ -132,19 +856,14 @@ class PlanificadorEventos:
         tipo = evento.get("tipo")
         recursos = evento.get("recursos", {})
 
-        reglas_evento = self.restricciones.get("reglas_evento", {})
+        reglas = self._reglas
 
-        if tipo not in reglas_evento:
+        if tipo not in reglas.minimos_evento:
             errores.append(f"No existe el evento '{tipo}'")
             return errores
 
-        reglas = reglas_evento[tipo]
-
         # Reglas de cantidad mínima por recurso
-        for recurso, minimo in reglas.items():
-            if not isinstance(minimo, int) or isinstance(minimo, bool):
-                continue
-
+        for recurso, minimo in reglas.minimos_evento[tipo]:
             usados = recursos.get(recurso, 0)
 
             if usados < minimo:
@@ -154,8 +873,8 @@ class PlanificadorEventos:
                 )
 
         # Reglas lógicas adicionales
-        if reglas.get("requiere_instrumentos"):
-            instrumentos = self.recursos.get("instrumentos", {})
+        if reglas.requiere_instrumentos[tipo]:
+            instrumentos = reglas.instrumentos
 
             total_instrumentos = sum(
                 cantidad for recurso, cantidad in recursos.items()
@@ -179,9 +898,8 @@ class PlanificadorEventos:
 
         errores = []
         recursos_evento = evento.get("recursos", {})
-        coreq_recursos = self.restricciones.get("corequisitos", {}).get("recursos", {})
 
-        for recurso, requeridos in coreq_recursos.items():
+        for recurso, requeridos in self._reglas.corequisitos_recurso:
             cantidad_recurso = recursos_evento.get(recurso, 0)
             if cantidad_recurso == 0:
                 continue  # si no se usa el recurso principal, no hace falta revisar
@@ -202,7 +920,7 @@ class PlanificadorEventos:
         
         errores = []
         recursos_evento = evento.get("recursos", {})
-        categorias = self.restricciones.get("corequisitos", {}).get("categorias", {})
+        corequisitos = self._reglas.corequisitos_categoria
 
         # Acumulador total de requerimientos (ej: cables)
         requerimientos_totales = {}
@@ -211,24 +929,8 @@ class PlanificadorEventos:
             if cantidad == 0:
                 continue
 
-            # Determinar categoría del recurso
-            categoria_recurso = None
-            for categoria, recursos_categoria in self.recursos.items():
-                if isinstance(recursos_categoria, dict) and recurso in recursos_categoria:
-                    categoria_recurso = categoria
-                    break
-
-            if not categoria_recurso:
-                continue
-
-            reglas = categorias.get(categoria_recurso, {})
-            requiere = reglas.get("requiere", [])
-            excepto = reglas.get("excepto", [])
-
-            if recurso in excepto:
-                continue
-
-            for req in requiere:
+            # Requerimientos de la categoría del recurso (ya sin exceptuados)
+            for req in corequisitos.get(recurso, ()):
                 requerimientos_totales[req] = requerimientos_totales.get(req, 0) + cantidad
 
         for req, total_requerido in requerimientos_totales.items():
@@ -252,30 +954,37 @@ class PlanificadorEventos:
         sala = evento.get("sala")
         recursos_evento = evento.get("recursos", {})
 
-        exclusiones_sala = self.restricciones.get("exclusiones", {}).get("por_sala", {})
-
         # Solo aplica si hay reglas para la sala específica
-        reglas = exclusiones_sala.get(sala, {})
-        if not reglas:
+        prohibidos = self._reglas.prohibidos_sala.get(sala)
+        if not prohibidos:
             return errores
 
+        # Descarte rápido: ningún recurso del evento está prohibido en la sala
+        if not any(
+            cantidad > 0 and recurso in prohibidos
+            for recurso, cantidad in recursos_evento.items()
+        ):
+            return errores
+
+        sin_instrumentos, equipos, personal = self._reglas.exclusiones_sala[sala]
+
         # Instrumentos prohibidos
-        if reglas.get("instrumentos", False):
+        if sin_instrumentos:
             for instrumento in recursos_evento:
-                if instrumento in self.recursos.get("instrumentos", {}) and recursos_evento[instrumento] > 0:
+                if instrumento in self._reglas.instrumentos and recursos_evento[instrumento] > 0:
                     errores.append(
                         f"El instrumento '{instrumento}' no puede usarse en la sala {sala}"
                     )
 
         # Equipos prohibidos
-        for equipo in reglas.get("equipos", []):
+        for equipo in equipos:
             if recursos_evento.get(equipo, 0) > 0:
                 errores.append(
                     f"El equipo '{equipo}' no puede usarse en la sala {sala}"
                 )
 
         # Personal prohibido
-        for rol in reglas.get("personal", []):
+        for rol in personal:
             if recursos_evento.get(rol, 0) > 0:
                 errores.append(
                     f"El personal '{rol}' no puede asignarse en la sala {sala}"
@@ -293,13 +1002,7 @@ class PlanificadorEventos:
         tipo = evento.get("tipo")
         recursos_evento = evento.get("recursos", {})
 
-        exclusiones_evento = self.restricciones.get("exclusiones", {}).get("por_evento", {})
-
-        if tipo not in exclusiones_evento:
-            return errores
-
-        reglas = exclusiones_evento[tipo]
-        prohibidos = reglas.get("prohibido", [])
+        prohibidos = self._reglas.prohibidos_evento.get(tipo, ())
 
         for recurso in prohibidos:
             if recursos_evento.get(recurso, 0) > 0:
@@ -314,8 +1017,7 @@ class PlanificadorEventos:
     def validar_evento_por_sala(self, evento):
         errores = []
 
-        eventos_prohibidos = self.restricciones.get("exclusiones", {}).get("eventos_prohibidos", {})
-        prohibidos_en_sala = eventos_prohibidos.get(evento.get("sala"), [])
+        prohibidos_en_sala = self._reglas.eventos_prohibidos.get(evento.get("sala"), ())
 
         if evento.get("tipo") in prohibidos_en_sala:
             errores.append(
@@ -337,14 +1039,9 @@ class PlanificadorEventos:
         sala = evento.get("sala")
         recursos = evento.get("recursos", {})
 
-        reglas_personal = self.restricciones.get("personal_obligatorio", {})
-
-        if sala not in reglas_personal:
-            return errores
-
-        personal_requerido = reglas_personal[sala]
+        personal_requerido = self._reglas.personal_obligatorio.get(sala, ())
 
-        for rol, minimo in personal_requerido.items():
+        for rol, minimo in personal_requerido:
             usados = recursos.get(rol, 0)
             if usados < minimo:
                 errores.append(
@@ -368,18 +1065,14 @@ class PlanificadorEventos:
 
         recursos_solicitados = evento.get("recursos", {})
 
-        for categoria in self.recursos.values():
-            if not isinstance(categoria, dict):
-                continue
+        for recurso, total_disponible in self._reglas.capacidades:
+            solicitado = recursos_solicitados.get(recurso, 0)
 
-            for recurso, total_disponible in categoria.items():
-                solicitado = recursos_solicitados.get(recurso, 0)
-
-                if solicitado > total_disponible:
-                    errores.append(
-                        f"Se disponen de {total_disponible} '{recurso}', "
-                        f"pero se solicitaron {solicitado}."
-                    )
+            if solicitado > total_disponible:
+                errores.append(
+                    f"Se disponen de {total_disponible} '{recurso}', "
+                    f"pero se solicitaron {solicitado}."
+                )
 
         return errores
 
@@ -390,62 +1083,90 @@ class PlanificadorEventos:
 
 
 
-    def _validar_disponibilidad_sala(self, evento):
+    def _validar_disponibilidad_sala(self, evento, sugerir=True):
         errores = []
 
         sala = evento["sala"]
         fecha_evento = evento["fecha"].date()
 
-        for e in self.eventos:
-            if e["sala"] == sala and e["fecha"].date() == fecha_evento:
-                sugerencia = self.sugerir_proxima_fecha_libre(sala, fecha_evento, evento)
+        if "fin" in evento:
+            return self._validar_franja_sala(evento, sugerir)
 
-                
-                errores.append(
-                    f"Ya existe un evento en la sala {sala} para el día {fecha_evento}. "
-                    f"Sugerencia: próxima fecha con recursos libres {sugerencia}"
-                    )
-                break
+        if self._sala_ocupada_en(sala, fecha_evento, 0, FRANJAS_POR_DIA):
+            if not sugerir:
+                return [f"Ya existe un evento en la sala {sala} para el día {fecha_evento}."]
+
+            sugerencia = self.sugerir_proxima_fecha_libre(sala, fecha_evento, evento)
+
+            errores.append(
+                f"Ya existe un evento en la sala {sala} para el día {fecha_evento}. "
+                f"Sugerencia: próxima fecha con recursos libres {sugerencia}"
+                )
 
         return errores
 
 
-        
+    def _validar_franja_sala(self, evento, sugerir=True):
+
+        # Sala libre en el horario del evento (eventos con "fin")
+
+        sala = evento["sala"]
+        fecha_evento = evento["fecha"].date()
+
+        if not self._sala_ocupada_en(sala, fecha_evento, *franjas_evento(evento)):
+            return []
+
+        error = (
+            f"La sala {sala} ya está ocupada el día {fecha_evento} "
+            f"entre {evento['fecha']:%H:%M} y {evento['fin']:%H:%M}."
+        )
+        if not sugerir:
+            return [error]
 
+        sugerencia = self.sugerir_proxima_franja_libre(sala, evento["fecha"], evento)
+        if sugerencia is not None:
+            sugerencia = f"{sugerencia:%Y-%m-%d %H:%M}"
+        return [f"{error} Sugerencia: próxima franja libre {sugerencia}"]
 
 
-    def _validar_recursos_fecha(self, evento):
+    def _validar_recursos_fecha(self, evento, sugerir=True):
         errores = []
 
         fecha_evento = evento.get("fecha").date()
         recursos_solicitados = evento.get("recursos", {})
 
-        recursos_ocupados = {}
-
-        for e in self.eventos:
-            if e.get("fecha").date() != fecha_evento:
-                continue
-
-            for recurso, cantidad in e.get("recursos", {}).items():
-                recursos_ocupados[recurso] = recursos_ocupados.get(recurso, 0) + cantidad
+        # Uso máximo simultáneo durante el evento (el día completo si no tiene horario)
+        recursos_ocupados = self._uso_maximo(fecha_evento, *franjas_evento(evento))
 
         conflictos = []
         
 
-        for categoria in self.recursos.values():
-            if not isinstance(categoria, dict):
-                continue
+        for recurso, total_disponible in self._reglas.capacidades:
+            solicitado = recursos_solicitados.get(recurso, 0)
+            usado = recursos_ocupados.get(recurso, 0)
 
-            for recurso, total_disponible in categoria.items():
-                solicitado = recursos_solicitados.get(recurso, 0)
-                usado = recursos_ocupados.get(recurso, 0)
+            disponible_real = total_disponible - usado
 
-                disponible_real = total_disponible - usado
+            if solicitado > disponible_real:
+                conflictos.append(f"{recurso}:{disponible_real}")
 
-                if solicitado > disponible_real:
-                    conflictos.append(f"{recurso}:{disponible_real}")
+        if conflictos and not sugerir:
+            return [
+                f"No hay suficientes recursos disponibles ese día: {', '.join(conflictos)}."
+            ]
 
-        if conflictos:
+        if conflictos and "fin" in evento:
+            sugerencia = self.sugerir_proxima_franja_libre(evento["sala"], evento["fecha"], evento)
+            if sugerencia is not None:
+                sugerencia = f"{sugerencia:%Y-%m-%d %H:%M}"
+
+            errores.append(
+                f"No hay suficientes recursos disponibles en ese horario: "
+                f"{', '.join(conflictos)}. "
+                f"Sugerencia: próxima franja libre {sugerencia}."
+            )
+
+        elif conflictos:
             sugerencia = self.sugerir_proxima_fecha_libre(
                 evento["sala"], fecha_evento, evento
             )
@@ -469,8 +1190,187 @@ class PlanificadorEventos:
 
     # otros
 
+    @_lectura
     def sugerir_proxima_fecha_libre(self, sala, fecha_inicial, evento):
 
+        # Próxima fecha (desde fecha_inicial, hasta un año) con la sala libre y recursos
+        # suficientes. La respuesta se cachea por sala, fecha y vector de recursos (una
+        # cantidad por cada recurso del catálogo), porque no depende de nada más del evento.
+
+        recursos_solicitados = evento.get("recursos", {})
+        vector = tuple(recursos_solicitados.get(recurso, 0) for recurso, _ in self._reglas.capacidades)
+
+        return self._sugerencias.buscar(
+            sala, fecha_inicial, vector,
+            lambda: self._buscar_fecha_libre(sala, fecha_inicial, evento),
+            self._generacion,
+        )
+
+
+    def estadisticas_sugerencias(self):
+
+        # Aciertos, fallos, invalidaciones y tamaño de la cache de sugerencias
+
+        return self._sugerencias.estadisticas()
+
+
+    def _buscar_fecha_libre(self, sala, fecha_inicial, evento):
+
+        # Busca la próxima fecha libre con el calendario vectorizado.
+        # Si todavía no se cargaron los recursos se usa el recorrido día por día.
+
+        if self._motor is None:
+            return self.sugerir_proxima_fecha_libre_referencia(sala, fecha_inicial, evento)
+
+        recursos_solicitados = evento.get("recursos", {})
+        fecha = self._motor.primera_fecha_libre(sala, fecha_inicial, recursos_solicitados)
+
+        # El calendario no conoce las series: si ese día hay ocurrencias, se confirma
+        # el día y, si no sirve, se sigue buscando desde el siguiente.
+        while fecha is not None and self._ocupacion_con_series(fecha) is not None:
+            if not self._sala_ocupada(sala, fecha) and self._recursos_alcanzan(
+                recursos_solicitados, self._uso_del_dia(fecha)
+            ):
+                return fecha
+
+            restantes = 365 - ((fecha - fecha_inicial).days + 1)
+            if restantes <= 0:
+                return None
+            fecha = self._motor.primera_fecha_libre(
+                sala, fecha + timedelta(days=1), recursos_solicitados, restantes
+            )
+
+        return fecha
+
+
+    # Consultas de disponibilidad (por día completo, sobre el calendario vectorizado)
+
+    @_lectura
+    def disponibilidad_entre(self, inicio, fin, recursos=None):
+
+        # {fecha: {recurso: cantidad libre}} para cada día de [inicio, fin].
+        # recursos limita las columnas devueltas (por defecto, todo el catálogo).
+        # Un evento con horario cuenta como si ocupara todo su día.
+
+        if isinstance(inicio, datetime):
+            inicio = inicio.date()
+        if isinstance(fin, datetime):
+            fin = fin.date()
+
+        nombres = [r for r, _ in self._reglas.capacidades]
+        if recursos is not None:
+            nombres = [r for r in nombres if r in recursos]
+        dias = [inicio + timedelta(days=d) for d in range((fin - inicio).days + 1)]
+
+        if self._motor is None:
+            return {fecha: self._restantes_del_dia(fecha, nombres) for fecha in dias}
+
+        restantes = self._motor.restantes(inicio, fin)
+        columnas = [(r, self._motor.indice_recurso[r]) for r in nombres]
+        disponibilidad = {
+            fecha: {recurso: int(fila[columna]) for recurso, columna in columnas}
+            for fecha, fila in zip(dias, restantes.tolist())
+        }
+
+        # El calendario no incluye las series: se corrigen solo sus días
+        for fecha in self._dias_con_ocurrencias(inicio, fin):
+            disponibilidad[fecha] = self._restantes_del_dia(fecha, nombres)
+        return disponibilidad
+
+
+    @_lectura
+    def dias_disponibles(self, inicio, fin, recursos, sala=None):
+
+        # Días de [inicio, fin] en los que entra el paquete {recurso: cantidad}
+        # (y, si se indica, con la sala libre).
+
+        if isinstance(inicio, datetime):
+            inicio = inicio.date()
+        if isinstance(fin, datetime):
+            fin = fin.date()
+
+        if self._motor is None:
+            dias = (inicio + timedelta(days=d) for d in range((fin - inicio).days + 1))
+            return [fecha for fecha in dias if self._dia_disponible(fecha, recursos, sala)]
+
+        libres = self._motor.dias_libres(sala, inicio, fin, recursos)
+        dias = {inicio + timedelta(days=int(d)) for d in libres.nonzero()[0]}
+
+        for fecha in self._dias_con_ocurrencias(inicio, fin):
+            if self._dia_disponible(fecha, recursos, sala):
+                dias.add(fecha)
+            else:
+                dias.discard(fecha)
+        return sorted(dias)
+
+
+    def _dia_disponible(self, fecha, recursos, sala):
+        return (
+            (sala is None or not self._sala_ocupada(sala, fecha))
+            and self._recursos_alcanzan(recursos, self._uso_del_dia(fecha))
+        )
+
+
+    def _restantes_del_dia(self, fecha, nombres):
+
+        uso = self._uso_del_dia(fecha)
+        capacidad = {}
+        for recurso, total in self._reglas.capacidades:
+            capacidad[recurso] = min(total, capacidad.get(recurso, total))
+        return {recurso: capacidad[recurso] - uso.get(recurso, 0) for recurso in nombres}
+
+
+    def _dias_con_ocurrencias(self, inicio, fin):
+        return {
+            fecha for serie in self.series.values() for fecha in fechas_serie(serie, inicio, fin)
+        }
+
+
+    def _recursos_alcanzan(self, recursos_solicitados, uso):
+        return all(
+            recursos_solicitados.get(recurso, 0) <= total - uso.get(recurso, 0)
+            for recurso, total in self._reglas.capacidades
+        )
+
+
+    @_lectura
+    def sugerir_proxima_franja_libre(self, sala, inicio, evento):
+
+        # Próximo horario, desde inicio y en pasos de franja, en que la sala está libre
+        # y alcanzan los recursos durante toda la duración del evento (hasta un año).
+        # Devuelve un datetime o None.
+
+        desde, hasta = franjas_evento(evento)
+        duracion = hasta - desde
+        recursos_solicitados = evento.get("recursos", {})
+
+        fecha = inicio.date()
+        primera = franjas_evento({"fecha": inicio, "fin": inicio})[0]
+
+        for _ in range(365):
+            # Sin eventos con horario ese día la respuesta es la misma para cualquier franja
+            ultima = FRANJAS_POR_DIA - duracion if self._dia_con_horario(fecha) else primera
+
+            for franja in range(primera, ultima + 1):
+                if self._sala_ocupada_en(sala, fecha, franja, franja + duracion):
+                    continue
+
+                uso = self._uso_maximo(fecha, franja, franja + duracion)
+                if self._recursos_alcanzan(recursos_solicitados, uso):
+                    return hora_franja(fecha, franja)
+
+            fecha += timedelta(days=1)
+            primera = 0
+
+        return None
+
+
+    @_lectura
+    def sugerir_proxima_fecha_libre_referencia(self, sala, fecha_inicial, evento):
+
+        # Implementación de referencia: recorre los días uno por uno.
+        # Debe dar siempre el mismo resultado que sugerir_proxima_fecha_libre.
+
         fecha = fecha_inicial
         recursos_solicitados = evento.get("recursos", {})
 
@@ -481,33 +1381,19 @@ class PlanificadorEventos:
             fecha_actual = fecha
 
             # 1. Verificar si la sala está libre ese día
-            ocupada = any(
-                e["sala"] == sala and e["fecha"].date() == fecha_actual
-                for e in self.eventos
-            )
-            if ocupada:
+            if self._sala_ocupada(sala, fecha_actual):
                 fecha = fecha_actual + timedelta(days=1)
                 continue
 
             # 2. Verificar disponibilidad de recursos ese día
-            recursos_ocupados = {}
-            for e in self.eventos:
-                if e["fecha"].date() != fecha_actual:
-                    continue
-                for recurso, cantidad in e["recursos"].items():
-                    recursos_ocupados[recurso] = recursos_ocupados.get(recurso, 0) + cantidad
+            recursos_ocupados = self._uso_del_dia(fecha_actual)
 
             recursos_ok = True
-            for categoria in self.recursos.values():
-                if not isinstance(categoria, dict):
-                    continue
-                for recurso, total_disponible in categoria.items():
-                    usado = recursos_ocupados.get(recurso, 0)
-                    solicitado = recursos_solicitados.get(recurso, 0)
-                    if solicitado > (total_disponible - usado):
-                        recursos_ok = False
-                        break
-                if not recursos_ok:
+            for recurso, total_disponible in self._reglas.capacidades:
+                usado = recursos_ocupados.get(recurso, 0)
+                solicitado = recursos_solicitados.get(recurso, 0)
+                if solicitado > (total_disponible - usado):
+                    recursos_ok = False
                     break
 
             if recursos_ok:
@@ -518,38 +1404,593 @@ class PlanificadorEventos:
         return None  # No existe fecha válida en el rango buscado
 
 
+    # índices de ocupación
+
+    def _indexar_evento(self, evento):
+
+        # Suma los recursos del evento al uso de su día y marca la sala como ocupada.
+        # El uso del día y la lista de _por_clave se reemplazan en vez de modificarse,
+        # porque la vista publicada los comparte (ver _publicar_vista).
+
+        fecha = evento["fecha"].date()
+        self._cambios += 1
+
+        uso = dict(self._uso_por_dia.get(fecha, ()))
+        for recurso, cantidad in evento.get("recursos", {}).items():
+            uso[recurso] = uso.get(recurso, 0) + cantidad
+        self._uso_por_dia[fecha] = uso
+
+        clave = (evento["sala"], fecha)
+        self._salas_ocupadas[clave] = self._salas_ocupadas.get(clave, 0) + 1
+
+        self._registrar_franjas(evento)
+        if self._con_series:
+            self._con_series.pop(fecha, None)
+        self._sugerencias.invalidar((fecha,))
+
+        self._por_id[evento["id"]] = evento
+        clave = (evento["tipo"], evento["sala"], fecha)
+        candidatos = list(self._por_clave.get(clave, ()))
+        insort(candidatos, evento, key=_fecha_evento)
+        self._por_clave[clave] = candidatos
+
+        if self._motor is not None:
+            self._motor.registrar(evento)
+
+
+    def _desindexar_evento(self, evento):
+
+        # Operación inversa de _indexar_evento.
+
+        fecha = evento["fecha"].date()
+        self._cambios += 1
+
+        uso = dict(self._uso_por_dia.get(fecha, ()))
+        for recurso, cantidad in evento.get("recursos", {}).items():
+            restante = uso.get(recurso, 0) - cantidad
+            if restante:
+                uso[recurso] = restante
+            else:
+                uso.pop(recurso, None)
+        if uso:
+            self._uso_por_dia[fecha] = uso
+        else:
+            self._uso_por_dia.pop(fecha, None)
+
+        self._registrar_franjas(evento, signo=-1)
+        if self._con_series:
+            self._con_series.pop(fecha, None)
+        self._sugerencias.invalidar((fecha,))
+
+        clave = (evento["sala"], fecha)
+        restantes = self._salas_ocupadas.get(clave, 0) - 1
+        if restantes > 0:
+            self._salas_ocupadas[clave] = restantes
+        else:
+            self._salas_ocupadas.pop(clave, None)
+
+        self._por_id.pop(evento["id"], None)
+        clave = (evento["tipo"], evento["sala"], fecha)
+        candidatos = [e for e in self._por_clave.get(clave, ()) if e is not evento]
+        if candidatos:
+            self._por_clave[clave] = candidatos
+        else:
+            self._por_clave.pop(clave, None)
+
+        if self._motor is not None:
+            self._motor.registrar(evento, signo=-1)
+
+
+    def _registrar_franjas(self, evento, signo=1):
+
+        # Mantiene self._franjas. El primer evento con horario de un día crea su
+        # OcupacionDia cargando los eventos ya indexados de ese día; cuando no
+        # quedan eventos con horario se descarta. Si la vista publicada tiene el
+        # mismo OcupacionDia, se modifica una copia.
+
+        fecha = evento["fecha"].date()
+        dia = self._franjas.get(fecha)
+
+        if dia is None:
+            if "fin" not in evento:
+                return
+            dia = self._franjas[fecha] = OcupacionDia()
+            for e in self.eventos_del_dia(fecha):
+                if self._por_id.get(e["id"]) is e:
+                    dia.registrar(e)
+        elif dia is self._vista._franjas.get(fecha):
+            dia = self._franjas[fecha] = dia.copia()
+
+        dia.registrar(evento, signo)
+        if not dia.con_horario:
+            del self._franjas[fecha]
+
+
+    def _reconstruir_indices(self):
+
+        # Recalcula los índices desde cero (p. ej. después de cargar el JSON).
+
+        self._cambios += 1
+        self._uso_por_dia = {}
+        self._salas_ocupadas = {}
+        self._franjas = {}
+        self._con_series = {}
+        self._por_id = {}
+        self._por_clave = {}
+        self._sugerencias.limpiar()
+        self._motor = None
+        if self.recursos is not None:
+            self._motor = MotorDisponibilidad(self.recursos, date.today())
+
+        # Índices por evento (la lista ya está ordenada, así que alcanza con append)
+        dias_con_horario = set()
+        for e in self.eventos:
+            fecha = e.fecha.date()
+            self._por_id[e.id] = e
+            self._por_clave.setdefault((e["tipo"], e["sala"], fecha), []).append(e)
+            clave = (e["sala"], fecha)
+            self._salas_ocupadas[clave] = self._salas_ocupadas.get(clave, 0) + 1
+            if e.fin is not None:
+                dias_con_horario.add(fecha)
+
+        # Uso por día: suma de los vectores de recursos, día por día
+        dias, totales = self._catalogo.sumar_por_dia(self.eventos)
+        nombres = self._catalogo.recursos
+        for fecha, fila in zip(dias, totales.tolist()):
+            self._uso_por_dia[fecha] = {nombres[j]: c for j, c in enumerate(fila) if c}
+
+        if self._motor is not None:
+            self._motor.registrar_totales(dias, nombres, totales, self._salas_ocupadas)
+
+        for fecha in dias_con_horario:
+            dia = self._franjas[fecha] = OcupacionDia()
+            for e in self.eventos_del_dia(fecha):
+                dia.registrar(e)
+
+
+    def _nuevo_id(self):
+        return uuid.uuid4().hex
+
+
+    # Las consultas de ocupación suman las ocurrencias de las series de ese día
+
+    def _uso_del_dia(self, fecha):
+
+        con_series = self._ocupacion_con_series(fecha)
+        if con_series is not None:
+            return con_series[0]
+        return self._uso_por_dia.get(fecha, {})
+
+
+    def _sala_ocupada(self, sala, fecha):
+
+        con_series = self._ocupacion_con_series(fecha)
+        if con_series is not None:
+            return con_series[2].sala_ocupada(sala, 0, FRANJAS_POR_DIA)
+        return (sala, fecha) in self._salas_ocupadas
+
+
+    def _sala_ocupada_en(self, sala, fecha, desde, hasta):
+
+        # ¿Hay algún evento en la sala entre las franjas desde y hasta de ese día?
+
+        con_series = self._ocupacion_con_series(fecha)
+        dia = self._franjas.get(fecha) if con_series is None else con_series[2]
+        if dia is None:
+            return self._sala_ocupada(sala, fecha)
+        return dia.sala_ocupada(sala, desde, hasta)
+
+
+    def _uso_maximo(self, fecha, desde, hasta):
+
+        # {recurso: uso simultáneo máximo entre las franjas desde y hasta de ese día}
+
+        con_series = self._ocupacion_con_series(fecha)
+        dia = self._franjas.get(fecha) if con_series is None else con_series[2]
+        if dia is None:
+            return self._uso_del_dia(fecha)
+        return dia.uso_maximo(desde, hasta)
+
+
+    def _dia_con_horario(self, fecha):
+
+        con_series = self._ocupacion_con_series(fecha)
+        if con_series is not None:
+            return con_series[2].con_horario > 0
+        return fecha in self._franjas
+
+
+    def _ocupacion_con_series(self, fecha):
+
+        # (uso total del día, ocurrencias, OcupacionDia) de eventos + ocurrencias de
+        # series, o None si ninguna serie ocurre ese día. Se arma en la primera
+        # consulta del día y se descarta cuando cambia algo de ese día.
+
+        if not self.series:
+            return None
+        if fecha in self._con_series:
+            return self._con_series[fecha]
+
+        ocurrencias = [
+            ocurrencia(serie, fecha)
+            for serie in self._series_por_dia_semana.get(fecha.weekday(), ())
+            if ocurre_el(serie, fecha)
+        ]
+        if not ocurrencias:
+            self._con_series[fecha] = None
+            return None
+
+        uso = dict(self._uso_por_dia.get(fecha, {}))
+        dia = OcupacionDia()
+        for e in self.eventos_del_dia(fecha) + ocurrencias:
+            dia.registrar(e)
+        for e in ocurrencias:
+            for recurso, cantidad in e["recursos"].items():
+                uso[recurso] = uso.get(recurso, 0) + cantidad
+
+        self._con_series[fecha] = uso, ocurrencias, dia
+        return self._con_series[fecha]
+
+
+    def _indexar_serie(self, serie):
+
+        self._cambios += 1
+        self.series[serie["id"]] = serie
+        for dia_semana in set(serie["recurrencia"]["dias_semana"]):
+            self._series_por_dia_semana[dia_semana] = [
+                *self._series_por_dia_semana.get(dia_semana, ()), serie
+            ]
+        self._con_series.clear()
+        self._sugerencias.invalidar(_dias_serie(serie))
+
+
+    def _desindexar_serie(self, serie):
+
+        self._cambios += 1
+        del self.series[serie["id"]]
+        for dia_semana in set(serie["recurrencia"]["dias_semana"]):
+            self._series_por_dia_semana[dia_semana] = [
+                s for s in self._series_por_dia_semana[dia_semana] if s is not serie
+            ]
+        self._con_series.clear()
+        self._sugerencias.invalidar(_dias_serie(serie))
+
+
 
 
     def guardar_eventos_json(self, archivo="data/eventos.json"):
         
         # Guarda todos los eventos actuales en un archivo JSON.
         # Cada fecha se convierte a ISO string para poder guardarla.
-        
-        eventos_a_guardar = []
-        for e in self.eventos:
-            evento_copia = e.copy()
-            if isinstance(evento_copia.get("fecha"), datetime):
-                evento_copia["fecha"] = evento_copia["fecha"].isoformat()
-            eventos_a_guardar.append(evento_copia)
+        # La escritura es atómica (temporal + renombrado).
 
-        with open(archivo, "w", encoding="utf-8") as f:
-            json.dump(eventos_a_guardar, f, ensure_ascii=False, indent=2)
+        eventos_a_guardar = self._eventos_serializados()
+
+        if getattr(self.almacenamiento, "archivo", None) == archivo:
+            self.almacenamiento.guardar(eventos_a_guardar)
+            self._actualizar_firma_eventos()
+        else:
+            AlmacenamientoJSON(archivo).guardar(eventos_a_guardar)
 
 
 
     def cargar_eventos_json(self, archivo="data/eventos.json"):
         
         # Carga eventos desde un archivo JSON.
+        # Acepta la lista simple o una instantánea con bitácora (ver activar_diario).
         # Convierte las fechas de string ISO a datetime.
-        
-        try:
-            with open(archivo, "r", encoding="utf-8") as f:
-                self.eventos = json.load(f)
-            for e in self.eventos:
-                if isinstance(e.get("fecha"), str):
-                    e["fecha"] = datetime.fromisoformat(e["fecha"])
-        except FileNotFoundError:
-            self.eventos = []
+
+        if getattr(self.almacenamiento, "archivo", None) == archivo:
+            self.cargar_eventos()
+        else:
+            eventos, _ = leer_eventos(archivo)
+            self._usar_eventos_cargados(eventos)
+
+
+    def cargar_eventos(self):
+
+        # Carga la agenda desde el almacenamiento configurado (JSON, bitácora o SQLite).
+        # La versión se lee antes que los eventos: si otro escritor guarda en el medio,
+        # la próxima escritura lo nota y vuelve a cargar.
+
+        with self._escribiendo(publicar=True):
+            firma = self.almacenamiento.firma()
+            sin_id = self._usar_eventos_cargados(self.almacenamiento.cargar())
+            self._firmas["eventos"] = firma
+
+            # Eventos guardados antes de existir los identificadores: se guardan una vez
+            # con su id nuevo para que sea estable entre ejecuciones.
+            if sin_id:
+                with self.almacenamiento.candado():
+                    if self.almacenamiento.firma() == firma:
+                        self.almacenamiento.guardar(self._eventos_serializados())
+                        self._firmas["eventos"] = self.almacenamiento.firma()
+
+
+    def _usar_eventos_cargados(self, eventos):
+
+        # Convierte fechas, asigna id a los eventos que no lo tengan y reconstruye índices.
+        # Devuelve cuántos eventos no tenían id. Toma el candado de escritura porque
+        # también se llama desde fuera de cargar_eventos (ver importacion.py).
+
+        sin_id = 0
+        for e in eventos:
+            self._deserializar_evento(e)
+            if "id" not in e:
+                e["id"] = self._nuevo_id()
+                sin_id += 1
+
+        # Las series se guardan junto con los eventos, marcadas con "recurrencia"
+        series = [e for e in eventos if "recurrencia" in e]
+        eventos = [self._catalogo.compactar(e) for e in eventos if "recurrencia" not in e]
+        eventos.sort(key=_fecha_evento)
+
+        with self._escribiendo(publicar=True):
+            self.eventos = eventos
+            self.series = {}
+            self._series_por_dia_semana = {}
+            for serie in series:
+                self._indexar_serie(serie)
+            self._reconstruir_indices()
+        return sin_id
+
+
+    def _ponerse_al_dia(self):
+
+        # Trae lo que guardaron otros planificadores desde la última carga.
+        # Con bitácora se aplican solo los registros nuevos; si no se puede (otro
+        # almacenamiento, o la bitácora ya se compactó) se vuelve a cargar todo.
+
+        novedades = getattr(self.almacenamiento, "novedades", None)
+        firma = self.almacenamiento.firma()
+        registros = novedades() if novedades is not None else None
+        if registros is None:
+            self.cargar_eventos()
+            return
+
+        for registro in registros:
+            if registro["op"] == "alta":
+                evento = self._deserializar_evento(registro["evento"])
+                if "recurrencia" in evento:
+                    self._indexar_serie(evento)
+                else:
+                    self._insertar_evento(evento)
+            elif registro.get("id") in self.series:
+                self._desindexar_serie(self.series[registro["id"]])
+            else:
+                if "id" in registro:
+                    evento = self._por_id.get(registro["id"])
+                else:
+                    candidatos = self._por_clave.get(
+                        (registro["tipo"], registro["sala"], date.fromisoformat(registro["fecha"]))
+                    )
+                    evento = candidatos[0] if candidatos else None
+                if evento is not None:
+                    self._quitar_evento(evento)
+
+        self._firmas["eventos"] = firma
+
+
+    def activar_diario(self, archivo="data/eventos.json", umbral_bytes=DiarioEventos.UMBRAL_BYTES):
+
+        # Cambia la persistencia a modo bitácora: cada alta o baja agrega una línea
+        # a archivo + ".log" en vez de reescribir todo el JSON. Llamar antes de cargar_eventos_json.
+
+        self.almacenamiento = DiarioEventos(archivo, umbral_bytes)
+
+
+    def _persistir_altas(self, eventos):
+
+        inicio = perf_counter()
+        with self._guardando():
+            self.almacenamiento.registrar_altas(
+                [self._serializar_evento(e) for e in eventos],
+                self._eventos_serializados,
+            )
+
+        if self._instrumentacion is not None:
+            self._instrumentacion.registrar("persistencia", perf_counter() - inicio)
+
+
+    def _persistir_bajas(self, eventos):
+
+        inicio = perf_counter()
+        with self._guardando():
+            self.almacenamiento.registrar_bajas(
+                [self._serializar_evento(e) for e in eventos],
+                self._eventos_serializados,
+            )
+
+        if self._instrumentacion is not None:
+            self._instrumentacion.registrar("persistencia", perf_counter() - inicio)
+
+
+    def _actualizar_firma_eventos(self):
+
+        # Lo que escribe este planificador no cuenta como cambio externo.
+
+        if "eventos" in self._firmas:
+            self._firmas["eventos"] = self.almacenamiento.firma()
+
+
+    def _agenda_desactualizada(self):
+
+        # Otro planificador (otra sesión u otro proceso) guardó desde la última carga
+
+        return "eventos" in self._firmas and self.almacenamiento.firma() != self._firmas["eventos"]
+
+
+    @contextmanager
+    def _guardando(self):
+
+        # Escritura optimista: con el candado del almacenamiento tomado, se guarda solo si
+        # la versión en disco sigue siendo la que se cargó; si no, AgendaDesactualizada
+        # (la atrapa _escritura, que recarga y vuelve a validar).
+
+        with self.almacenamiento.candado():
+            if self._agenda_desactualizada():
+                raise AgendaDesactualizada()
+            yield
+            self._actualizar_firma_eventos()
+
+
+    def recargar_si_modificado(self):
+
+        # Vuelve a cargar recursos, restricciones o eventos solo si su archivo cambió
+        # desde la última carga (p. ej. editado a mano o por otra sesión).
+        # Devuelve la lista de lo que se recargó.
+
+        with self._escribiendo(publicar=True):
+            return self._recargar_si_modificado()
+
+
+    def _recargar_si_modificado(self):
+
+        recargados = []
+        reglas_anteriores = self._reglas
+
+        archivo = self._archivos.get("recursos")
+        if archivo is not None and firma_archivo(archivo) != self._firmas.get("recursos"):
+            self.cargar_recursos_json(archivo)
+            recargados.append("recursos")
+
+        archivo = self._archivos.get("restricciones")
+        if archivo is not None and firma_archivo(archivo) != self._firmas.get("restricciones"):
+            self.cargar_restricciones_json(archivo)
+            recargados.append("restricciones")
+
+        if self._agenda_desactualizada():
+            self._ponerse_al_dia()
+            recargados.append("eventos")
+
+        if "recursos" in recargados or "restricciones" in recargados:
+            self.eventos_invalidos = self.revalidar_por_cambio_de_reglas(reglas_anteriores)
+
+        return recargados
+
+
+    def revalidar_por_cambio_de_reglas(self, reglas_anteriores):
+
+        # Vuelve a validar, desde hoy, solo las reservas que pueden verse afectadas por
+        # lo que cambió entre reglas_anteriores y las reglas actuales: las de salas o
+        # tipos con reglas nuevas, y las que usan recursos con reglas o capacidad nuevas.
+        # Incluye las ocurrencias de las series desde hoy (con id "<serie>:<día>").
+        # Devuelve [{id, tipo, sala, fecha, errores}] con las que ya no las cumplen.
+
+        recursos, salas, tipos = self._reglas.cambios_desde(reglas_anteriores)
+        if not (recursos or salas or tipos):
+            return []
+
+        hoy = date.today()
+        afectados = {}
+
+        # Ocurrencias de las series: no están en los índices de eventos
+        ocurrencias_por_dia = {}
+        if self.series:
+            ultimo = max(serie["recurrencia"]["hasta"] for serie in self.series.values())
+            for o in self.ocurrencias_entre(hoy, ultimo):
+                ocurrencias_por_dia.setdefault(o["fecha"].date(), []).append(o)
+
+        # Por sala o tipo: claves del índice (tipo, sala, día)
+        if salas or tipos:
+            for (tipo, sala, fecha), eventos in self._por_clave.items():
+                if fecha >= hoy and (tipo in tipos or sala in salas):
+                    for e in eventos:
+                        afectados[e["id"]] = e
+            for ocurrencias in ocurrencias_por_dia.values():
+                for o in ocurrencias:
+                    if o["tipo"] in tipos or o["sala"] in salas:
+                        afectados[o["id"]] = o
+
+        # Por recurso: solo los días en que se usa alguno de los recursos cambiados
+        dias = []
+        if recursos:
+            dias = {
+                fecha for fecha, uso in self._uso_por_dia.items()
+                if fecha >= hoy and not recursos.isdisjoint(uso)
+            }
+            for fecha, ocurrencias in ocurrencias_por_dia.items():
+                if any(not recursos.isdisjoint(o["recursos"]) for o in ocurrencias):
+                    dias.add(fecha)
+            dias = sorted(dias)
+            for fecha in dias:
+                for e in self.eventos_del_dia(fecha) + ocurrencias_por_dia.get(fecha, []):
+                    if any(r in e["recursos"] for r in recursos):
+                        afectados[e["id"]] = e
+
+        errores_por_id = {}
+
+        # Reglas de cada evento (todo lo que no depende del día); las ocurrencias de
+        # una serie dan todas lo mismo, así que se valida una por serie
+        errores_por_serie = {}
+        for id_evento, e in afectados.items():
+            if e.get("serie") in errores_por_serie:
+                errores = list(errores_por_serie[e["serie"]])
+            else:
+                errores = []
+                for etapa in self.ETAPAS_VALIDACION:
+                    for nombre in etapa:
+                        if nombre not in self.VALIDADORES_POR_DIA:
+                            errores += getattr(self, nombre)(e)
+                if "serie" in e:
+                    errores_por_serie[e["serie"]] = list(errores)
+            if errores:
+                errores_por_id[id_evento] = errores
+
+        # Capacidad: días en que lo reservado ya supera la nueva capacidad
+        for fecha in dias:
+            uso = self._uso_maximo(fecha, 0, FRANJAS_POR_DIA)
+            excedidos = {
+                recurso: (uso[recurso], total)
+                for recurso, total in self._reglas.capacidades
+                if recurso in recursos and uso.get(recurso, 0) > total
+            }
+            if not excedidos:
+                continue
+            for e in self.eventos_del_dia(fecha) + ocurrencias_por_dia.get(fecha, []):
+                for recurso in excedidos.keys() & e["recursos"].keys():
+                    usado, total = excedidos[recurso]
+                    errores_por_id.setdefault(e["id"], []).append(
+                        f"El {fecha} hay {usado} '{recurso}' reservados y la capacidad ahora es {total}."
+                    )
+
+        return [
+            {
+                "id": e["id"],
+                "tipo": e["tipo"],
+                "sala": e["sala"],
+                "fecha": e["fecha"],
+                "errores": errores_por_id[e["id"]],
+            }
+            for e in sorted(
+                (afectados[i] for i in errores_por_id), key=_fecha_evento
+            )
+        ]
+
+
+    def _deserializar_evento(self, evento):
+
+        for campo in ("fecha", "fin"):
+            if isinstance(evento.get(campo), str):
+                evento[campo] = datetime.fromisoformat(evento[campo])
+        if "recurrencia" in evento:
+            evento["recurrencia"] = regla_desde_texto(evento["recurrencia"])
+        return evento
+
+
+    def _serializar_evento(self, evento):
+
+        evento_copia = evento.copy()
+        for campo in ("fecha", "fin"):
+            if isinstance(evento_copia.get(campo), datetime):
+                evento_copia[campo] = evento_copia[campo].isoformat()
+        if "recurrencia" in evento_copia:
+            evento_copia["recurrencia"] = regla_a_texto(evento_copia["recurrencia"])
+        return evento_copia
+
+
+    def _eventos_serializados(self):
+        return [self._serializar_evento(e) for e in [*self.eventos, *self.series.values()]]
 
 
     def cargar_recursos_json(self, archivo="data/recursos.json"):
@@ -557,11 +1998,42 @@ class PlanificadorEventos:
         # Carga los recursos disponibles desde un archivo JSON.
         
         with open(archivo, "r", encoding="utf-8") as f:
-            self.recursos = json.load(f)
+            recursos = json.load(f)
+
+        with self._escribiendo(publicar=True):
+            self.recursos = recursos
+            self._archivos["recursos"] = archivo
+            self._firmas["recursos"] = firma_archivo(archivo)
+
+            self._catalogo.registrar_recursos(self.recursos)
+            self._compilar_reglas()
+            self._reconstruir_indices()
 
     def cargar_restricciones_json(self, archivo="data/restricciones.json"):
         
         # Carga las restricciones desde un archivo JSON.
         
         with open(archivo, "r", encoding="utf-8") as f:
-            self.restricciones = json.load(f)
+            restricciones = json.load(f)
+
+        with self._escribiendo(publicar=True):
+            self.restricciones = restricciones
+            self._archivos["restricciones"] = archivo
+            self._firmas["restricciones"] = firma_archivo(archivo)
+
+            self._compilar_reglas()
+
+
+    def _compilar_reglas(self):
+
+        # Precalcula las estructuras que usan los validadores.
+
+        self._reglas = ReglasCompiladas(self.recursos, self.restricciones)
+        self._sugerencias.limpiar()
+        self._cambios += 1
+
+
+if __name__ == "__main__":
+    # python -m planificador import|export|validate (ver importacion.py)
+    from importacion import main
+    raise SystemExit(main())
@@ -0,0 +1,275 @@
+from datetime import date, datetime, timedelta
+from time import perf_counter
+
+
+# Programación automática de solicitudes flexibles.
+#
+# Una solicitud es un diccionario:
+#   {"tipo": ..., "recursos": {...}, "salas": [...], "desde": date, "hasta": date}
+# y el programador elige una sala de la lista y un día de la ventana [desde, hasta]
+# para la mayor cantidad posible de solicitudes.
+
+
+class ProgramadorEventos:
+
+    # Asigna sala y fecha a un lote de solicitudes sobre la agenda actual del planificador.
+    #
+    # 1. Dominio: por cada solicitud, las salas que pasan los validadores que no dependen
+    #    del día (todos menos VALIDADORES_POR_DIA) y los días de su ventana.
+    # 2. Asignación voraz: primero las solicitudes con menos opciones y más demanda,
+    #    cada una en el primer (día, sala) donde entra.
+    # 3. Reparación: para cada solicitud que quedó afuera se prueba desalojar una sola
+    #    solicitud ya asignada y reubicarla en otro lugar libre, mientras haya tiempo.
+    #
+    # La sala libre y los recursos del día se controlan con la misma regla que
+    # _validar_disponibilidad_sala y _validar_recursos_fecha, y al final cada evento
+    # pasa por los validadores completos del planificador.
+
+    def __init__(self, planificador):
+
+        self.planificador = planificador
+
+        self._estaticos = tuple(
+            nombre
+            for etapa in planificador.ETAPAS_VALIDACION for nombre in etapa
+            if nombre not in planificador.VALIDADORES_POR_DIA
+        )
+
+        # recurso -> capacidad total (si un nombre se repite entre categorías manda la menor)
+        self._capacidad = {}
+        for recurso, total in planificador._reglas.capacidades:
+            self._capacidad[recurso] = min(total, self._capacidad.get(recurso, total))
+
+
+    def programar(self, solicitudes, presupuesto_segundos=5.0, confirmar=True):
+
+        # Devuelve un (exito, evento | errores) por solicitud, en el mismo orden.
+        # Con confirmar=True los eventos asignados se agregan al planificador (y se
+        # guardan una sola vez); con confirmar=False solo se devuelve la propuesta.
+
+        limite = perf_counter() + presupuesto_segundos
+        solicitudes = list(solicitudes)
+
+        self._uso = {}          # día -> {recurso: cantidad} (agenda + asignaciones)
+        self._ocupante = {}     # (sala, día) -> índice de solicitud asignada
+        self._por_dia = {}      # día -> índices de solicitudes asignadas ese día
+        self._asignacion = {}   # índice -> (sala, día)
+
+        resultados = [None] * len(solicitudes)
+        dominios = {}
+        demandas = {}
+        cache_estatica = {}
+
+        for i, solicitud in enumerate(solicitudes):
+            errores, salas, dias = self._dominio(solicitud, cache_estatica)
+            if errores:
+                resultados[i] = (False, errores)
+                continue
+            dominios[i] = (salas, dias)
+            demandas[i] = [
+                (recurso, cantidad)
+                for recurso, cantidad in solicitud["recursos"].items()
+                if cantidad > 0 and recurso in self._capacidad
+            ]
+
+        # Más restringidas primero: menos (sala, día) posibles y más demanda relativa
+        orden = sorted(
+            dominios,
+            key=lambda i: (
+                len(dominios[i][0]) * len(dominios[i][1]),
+                -sum(c / max(self._capacidad[r], 1) for r, c in demandas[i]),
+            )
+        )
+
+        pendientes = []
+        for i in orden:
+            if perf_counter() > limite:
+                pendientes.append(i)
+                continue
+            lugar = self._primer_lugar(demandas[i], *dominios[i])
+            if lugar is None:
+                pendientes.append(i)
+            else:
+                self._asignar(i, demandas[i], *lugar)
+
+        # Reparación por desalojo de una solicitud, hasta que no haya mejoras o se acabe el tiempo
+        mejora = True
+        while pendientes and mejora and perf_counter() < limite:
+            mejora = False
+            quedan = []
+            for i in pendientes:
+                if perf_counter() < limite and self._reparar(i, dominios, demandas, limite):
+                    mejora = True
+                else:
+                    quedan.append(i)
+            pendientes = quedan
+
+        for i in pendientes:
+            solicitud = solicitudes[i]
+            resultados[i] = (False, [
+                f"No hay sala libre con recursos suficientes entre "
+                f"{_dia(solicitud['desde'])} y {_dia(solicitud['hasta'])}."
+            ])
+
+        indices = sorted(self._asignacion)
+        eventos = [self._evento(solicitudes[i], *self._asignacion[i]) for i in indices]
+
+        if confirmar:
+            confirmados = self.planificador.agregar_eventos_lote(eventos, fallo_rapido=True)
+            for i, evento, (exito, errores) in zip(indices, eventos, confirmados):
+                resultados[i] = (True, evento) if exito else (False, errores)
+        else:
+            for i, evento in zip(indices, eventos):
+                resultados[i] = (True, evento)
+
+        return resultados
+
+
+    def _dominio(self, solicitud, cache_estatica):
+
+        # (errores, salas posibles, días posibles) de una solicitud
+
+        hoy = date.today()
+        desde = max(_dia(solicitud["desde"]), hoy)
+        hasta = min(_dia(solicitud["hasta"]), hoy + timedelta(days=365))
+        if desde > hasta:
+            return ["La ventana de fechas no tiene días entre hoy y un año de anticipación."], (), ()
+
+        dias = [desde + timedelta(days=d) for d in range((hasta - desde).days + 1)]
+
+        salas = []
+        errores = []
+        clave_recursos = tuple(sorted(solicitud["recursos"].items()))
+        for sala in solicitud["salas"]:
+            clave = (solicitud["tipo"], sala, clave_recursos)
+            errores_sala = cache_estatica.get(clave)
+            if errores_sala is None:
+                errores_sala = cache_estatica[clave] = self._validar_estaticos(
+                    self._evento(solicitud, sala, desde)
+                )
+            if errores_sala:
+                errores += [f"{sala}: {error}" for error in errores_sala]
+            else:
+                salas.append(sala)
+
+        if not salas:
+            return errores or ["La solicitud no tiene salas aceptables."], (), ()
+        return None, salas, dias
+
+
+    def _validar_estaticos(self, evento):
+
+        errores = []
+        for nombre in self._estaticos:
+            errores += getattr(self.planificador, nombre)(evento)
+        return errores
+
+
+    # ocupación: agenda del planificador + asignaciones de esta corrida
+
+    def _uso_del_dia(self, dia):
+
+        uso = self._uso.get(dia)
+        if uso is None:
+            uso = self._uso[dia] = dict(self.planificador._uso_del_dia(dia))
+        return uso
+
+
+    def _sala_libre(self, sala, dia):
+        return (sala, dia) not in self._ocupante and not self.planificador._sala_ocupada(sala, dia)
+
+
+    def _entra(self, demanda, dia, liberado=None):
+
+        # ¿Alcanzan los recursos del día? liberado = demanda que se descuenta (desalojo)
+
+        uso = self._uso_del_dia(dia)
+        capacidad = self._capacidad
+        if liberado is None:
+            return all(uso.get(r, 0) + c <= capacidad[r] for r, c in demanda)
+
+        descuento = dict(liberado)
+        return all(
+            uso.get(r, 0) - descuento.get(r, 0) + c <= capacidad[r] for r, c in demanda
+        )
+
+
+    def _primer_lugar(self, demanda, salas, dias):
+
+        for dia in dias:
+            if not self._entra(demanda, dia):
+                continue
+            for sala in salas:
+                if self._sala_libre(sala, dia):
+                    return sala, dia
+        return None
+
+
+    def _asignar(self, i, demanda, sala, dia):
+
+        uso = self._uso_del_dia(dia)
+        for recurso, cantidad in demanda:
+            uso[recurso] = uso.get(recurso, 0) + cantidad
+        self._ocupante[(sala, dia)] = i
+        self._por_dia.setdefault(dia, set()).add(i)
+        self._asignacion[i] = (sala, dia)
+
+
+    def _liberar(self, i, demanda):
+
+        sala, dia = self._asignacion.pop(i)
+        uso = self._uso[dia]
+        for recurso, cantidad in demanda:
+            uso[recurso] -= cantidad
+        del self._ocupante[(sala, dia)]
+        self._por_dia[dia].discard(i)
+
+
+    def _reparar(self, i, dominios, demandas, limite):
+
+        # Intenta ubicar i desalojando una única solicitud j que se pueda reubicar.
+
+        salas, dias = dominios[i]
+        demanda = demandas[i]
+
+        for dia in dias:
+            if perf_counter() > limite:
+                return False
+
+            for j in list(self._por_dia.get(dia, ())):
+                sala_j, _ = self._asignacion[j]
+
+                # Sala donde entraría i si j se va
+                if sala_j in salas:
+                    sala_i = sala_j
+                else:
+                    sala_i = next((s for s in salas if self._sala_libre(s, dia)), None)
+                if sala_i is None or not self._entra(demanda, dia, liberado=demandas[j]):
+                    continue
+
+                self._liberar(j, demandas[j])
+                self._asignar(i, demanda, sala_i, dia)
+
+                lugar = self._primer_lugar(demandas[j], *dominios[j])
+                if lugar is not None:
+                    self._asignar(j, demandas[j], *lugar)
+                    return True
+
+                # No hubo lugar para j: deshacer
+                self._liberar(i, demanda)
+                self._asignar(j, demandas[j], sala_j, dia)
+
+        return False
+
+
+    def _evento(self, solicitud, sala, dia):
+        return {
+            "tipo": solicitud["tipo"],
+            "sala": sala,
+            "fecha": datetime.combine(dia, datetime.min.time()),
+            "recursos": dict(solicitud["recursos"]),
+        }
+
+
+def _dia(fecha):
+    return fecha.date() if isinstance(fecha, datetime) else fecha
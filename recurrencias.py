@@ -0,0 +1,108 @@
+from datetime import date, datetime, timedelta
+
+
+# Series de eventos recurrentes.
+#
+# Una serie se guarda una sola vez, como un evento con una clave "recurrencia":
+#   {"id": ..., "tipo": ..., "sala": ..., "fecha": datetime, ["fin": datetime,]
+#    "recursos": {...},
+#    "recurrencia": {"dias_semana": [0, 3], "hasta": date, "excepciones": [date, ...]}}
+# "fecha" (y "fin") dan el primer día posible y el horario de todas las ocurrencias;
+# dias_semana usa date.weekday() (0 = lunes ... 6 = domingo).
+# Las ocurrencias se arman solo para los días que se consultan.
+
+
+def validar_regla(serie):
+
+    # Errores de forma de la serie (los de cada ocurrencia los dan los validadores del planificador)
+
+    errores = []
+
+    if not isinstance(serie.get("fecha"), datetime):
+        errores.append("La fecha debe ser un objeto datetime")
+
+    regla = serie.get("recurrencia")
+    if not isinstance(regla, dict):
+        return errores + ["La serie debe tener una regla de recurrencia"]
+
+    dias = regla.get("dias_semana")
+    if not dias or any(not isinstance(d, int) or not 0 <= d <= 6 for d in dias):
+        errores.append(
+            "La recurrencia debe indicar al menos un día de la semana (0 = lunes ... 6 = domingo)"
+        )
+
+    if not isinstance(regla.get("hasta"), date):
+        errores.append("La recurrencia debe indicar hasta qué fecha se repite")
+
+    return errores
+
+
+def ocurre_el(serie, fecha):
+
+    regla = serie["recurrencia"]
+    return (
+        serie["fecha"].date() <= fecha <= regla["hasta"]
+        and fecha.weekday() in regla["dias_semana"]
+        and fecha not in regla["excepciones"]
+    )
+
+
+def fechas_serie(serie, inicio, fin):
+
+    # Días de ocurrencia entre inicio y fin (incluidos), en orden
+
+    regla = serie["recurrencia"]
+    fecha = max(inicio, serie["fecha"].date())
+    hasta = min(fin, regla["hasta"])
+
+    while fecha <= hasta:
+        if fecha.weekday() in regla["dias_semana"] and fecha not in regla["excepciones"]:
+            yield fecha
+        fecha += timedelta(days=1)
+
+
+def ocurrencia(serie, fecha):
+
+    # Evento de la serie para el día fecha; su id es "<id de la serie>:<día>"
+
+    inicio = datetime.combine(fecha, serie["fecha"].time())
+    evento = {
+        "id": f"{serie['id']}:{fecha.isoformat()}",
+        "serie": serie["id"],
+        "tipo": serie["tipo"],
+        "sala": serie["sala"],
+        "fecha": inicio,
+        "recursos": serie.get("recursos", {}),
+    }
+    if "fin" in serie:
+        evento["fin"] = inicio + (serie["fin"] - serie["fecha"])
+    return evento
+
+
+def regla_desde_texto(regla):
+
+    # Regla leída del JSON o armada a mano (fechas como texto, date o datetime) -> fechas como date
+
+    return {
+        "dias_semana": list(regla["dias_semana"]),
+        "hasta": _como_date(regla["hasta"]),
+        "excepciones": {_como_date(d) for d in regla.get("excepciones", ())},
+    }
+
+
+def regla_a_texto(regla):
+
+    return {
+        "dias_semana": list(regla["dias_semana"]),
+        "hasta": regla["hasta"].isoformat(),
+        "excepciones": sorted(d.isoformat() for d in regla["excepciones"]),
+    }
+
+
+def _como_date(valor):
+
+    if isinstance(valor, str):
+        return date.fromisoformat(valor)
+    if isinstance(valor, datetime):
+        return valor.date()
+    return valor
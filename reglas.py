@@ -0,0 +1,134 @@
+class ReglasCompiladas:
+
+    # Versión "aplanada" de recursos.json + restricciones.json.
+    # Se construye una sola vez al cargar los archivos y los validadores
+    # consultan estas estructuras en lugar de recorrer los diccionarios anidados.
+
+    def __init__(self, recursos, restricciones):
+
+        recursos = recursos or {}
+        restricciones = restricciones or {}
+
+        # Catálogo: recurso -> categoría, recurso -> ordinal y capacidades
+        self.categoria_de = {}
+        self.ordinal = {}
+        capacidades = []
+
+        for categoria, recursos_categoria in recursos.items():
+            if not isinstance(recursos_categoria, dict):
+                continue
+            for recurso, total in recursos_categoria.items():
+                self.categoria_de.setdefault(recurso, categoria)
+                self.ordinal.setdefault(recurso, len(self.ordinal))
+                capacidades.append((recurso, total))
+
+        # (recurso, total) en el orden de recursos.json
+        self.capacidades = tuple(capacidades)
+        self.instrumentos = frozenset(recursos.get("instrumentos", {}))
+
+        # Corequisitos entre recursos: ((recurso, (requeridos...)), ...)
+        corequisitos = restricciones.get("corequisitos", {})
+        self.corequisitos_recurso = tuple(
+            (recurso, tuple(requeridos))
+            for recurso, requeridos in corequisitos.get("recursos", {}).items()
+        )
+
+        # Corequisitos por categoría ya resueltos a nivel de recurso:
+        # recurso -> (requeridos...), sin los recursos exceptuados
+        self.corequisitos_categoria = {}
+        reglas_categorias = corequisitos.get("categorias", {})
+        for recurso, categoria in self.categoria_de.items():
+            reglas = reglas_categorias.get(categoria, {})
+            requiere = tuple(reglas.get("requiere", []))
+            if requiere and recurso not in reglas.get("excepto", []):
+                self.corequisitos_categoria[recurso] = requiere
+
+        # Exclusiones por sala: sala -> (prohíbe instrumentos, equipos, personal)
+        # y el conjunto completo de recursos prohibidos para descartar rápido.
+        exclusiones = restricciones.get("exclusiones", {})
+        self.exclusiones_sala = {}
+        self.prohibidos_sala = {}
+        for sala, reglas in exclusiones.get("por_sala", {}).items():
+            if not reglas:
+                continue
+            sin_instrumentos = bool(reglas.get("instrumentos", False))
+            equipos = tuple(reglas.get("equipos", []))
+            personal = tuple(reglas.get("personal", []))
+            self.exclusiones_sala[sala] = (sin_instrumentos, equipos, personal)
+
+            prohibidos = set(equipos) | set(personal)
+            if sin_instrumentos:
+                prohibidos |= self.instrumentos
+            self.prohibidos_sala[sala] = frozenset(prohibidos)
+
+        # Exclusiones por tipo de evento: tipo -> (prohibidos...)
+        self.prohibidos_evento = {
+            tipo: tuple(reglas.get("prohibido", []))
+            for tipo, reglas in exclusiones.get("por_evento", {}).items()
+        }
+
+        # Tipos de evento que no se pueden hacer en cada sala
+        self.eventos_prohibidos = {
+            sala: frozenset(tipos)
+            for sala, tipos in exclusiones.get("eventos_prohibidos", {}).items()
+        }
+
+        # Reglas por tipo de evento: mínimos (recurso, cantidad) y si exige instrumentos
+        self.minimos_evento = {}
+        self.requiere_instrumentos = {}
+        for tipo, reglas in restricciones.get("reglas_evento", {}).items():
+            self.minimos_evento[tipo] = tuple(
+                (recurso, minimo) for recurso, minimo in reglas.items()
+                if isinstance(minimo, int) and not isinstance(minimo, bool)
+            )
+            self.requiere_instrumentos[tipo] = bool(reglas.get("requiere_instrumentos"))
+
+        # Personal obligatorio: sala -> ((rol, mínimo), ...)
+        self.personal_obligatorio = {
+            sala: tuple(requerido.items())
+            for sala, requerido in restricciones.get("personal_obligatorio", {}).items()
+        }
+
+
+    def cambios_desde(self, anteriores):
+
+        # Qué cambió respecto de otra compilación: (recursos, salas, tipos) cuyas reglas
+        # o capacidades son distintas. Un evento solo puede haber dejado de cumplir las
+        # reglas si usa alguno de esos recursos, está en una de esas salas o es de ese tipo.
+
+        recursos = (
+            _claves_distintas(_capacidad_minima(anteriores), _capacidad_minima(self))
+            | _claves_distintas(anteriores.categoria_de, self.categoria_de)
+            | (anteriores.instrumentos ^ self.instrumentos)
+            | _claves_distintas(dict(anteriores.corequisitos_recurso), dict(self.corequisitos_recurso))
+            | _claves_distintas(anteriores.corequisitos_categoria, self.corequisitos_categoria)
+        )
+
+        salas = (
+            _claves_distintas(anteriores.exclusiones_sala, self.exclusiones_sala)
+            | _claves_distintas(anteriores.prohibidos_sala, self.prohibidos_sala)
+            | _claves_distintas(anteriores.eventos_prohibidos, self.eventos_prohibidos)
+            | _claves_distintas(anteriores.personal_obligatorio, self.personal_obligatorio)
+        )
+
+        tipos = (
+            _claves_distintas(anteriores.prohibidos_evento, self.prohibidos_evento)
+            | _claves_distintas(anteriores.minimos_evento, self.minimos_evento)
+            | _claves_distintas(anteriores.requiere_instrumentos, self.requiere_instrumentos)
+        )
+
+        return recursos, salas, tipos
+
+
+def _claves_distintas(anterior, nuevo):
+    return {clave for clave in anterior.keys() | nuevo.keys() if anterior.get(clave) != nuevo.get(clave)}
+
+
+def _capacidad_minima(reglas):
+
+    # recurso -> capacidad (si un nombre se repite entre categorías, manda la menor)
+
+    capacidad = {}
+    for recurso, total in reglas.capacidades:
+        capacidad[recurso] = min(total, capacidad.get(recurso, total))
+    return capacidad
@@ -0,0 +1,437 @@
+import argparse
+import asyncio
+import json
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import unquote, urlsplit
+
+from almacenamiento import AlmacenamientoSQLite, DiarioEventos
+from importacion import evento_desde_objeto
+from planificador import PlanificadorEventos
+
+
+# Servicio HTTP/JSON local para reservar desde otras herramientas sin pasar por Streamlit.
+#
+#   python -m servicio [--puerto 8765] [--eventos data/eventos.json]
+#
+#   POST   /validar         evento                                -> {"valido", "errores"}
+#   POST   /eventos         evento (serie si tiene "recurrencia")  -> 201 {"id"} | 409 {"errores"}
+#   DELETE /eventos/<id>    evento o serie                        -> {"id"} | 404
+#   POST   /disponibilidad  {"desde", "hasta", "recursos", "sala"} -> {"dias": [...]}
+#   POST   /sugerir         evento, opcional "k"                   -> {"fecha", "alternativas"}
+#   GET    /estado                                                -> contadores del servicio
+#
+# Los eventos van como en eventos.json (fechas en ISO). Hay un único planificador
+# y todo lo que lo toca corre en un solo hilo aparte; el bucle de asyncio solo
+# atiende las conexiones:
+# - altas y bajas entran a una cola y se aplican de a una, en orden de llegada;
+# - las consultas (validar, disponibilidad, sugerir) que llegan mientras tanto se
+#   juntan y se evalúan en un solo lote entre dos escrituras, así que todas ven la
+#   misma agenda; las consultas iguales dentro de un lote se calculan una sola vez.
+
+RAZONES = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+MAX_CUERPO = 1024 * 1024
+
+
+class ServicioReservas:
+
+    def __init__(self, planificador, lote_maximo=512):
+
+        self.planificador = planificador
+        self.lote_maximo = lote_maximo
+
+        # El único hilo que usa el planificador
+        self._hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planificador")
+
+        # Escrituras pendientes (operacion, datos, futuro; operacion None = alta de un
+        # evento) y consultas pendientes (operacion, clave, datos, futuro);
+        # _trabajo avisa que hay algo en alguna
+        self._escrituras = deque()
+        self._consultas = []
+        self._trabajo = None
+
+        self.contadores = {"consultas": 0, "calculadas": 0, "lotes": 0, "escrituras": 0}
+
+        # Rutas POST que se agrupan en lotes
+        self.consultas = {
+            "/validar": self._validar,
+            "/disponibilidad": self._disponibilidad,
+            "/sugerir": self._sugerir,
+        }
+
+
+    async def servir(self, host="127.0.0.1", puerto=8765):
+
+        self._trabajo = asyncio.Event()
+        despachador = asyncio.create_task(self._despachar())
+        servidor = await asyncio.start_server(self._atender, host, puerto)
+        print(f"Servicio de reservas en http://{host}:{puerto}", file=sys.stderr)
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            despachador.cancel()
+            self._hilo.shutdown(wait=True)
+
+
+    async def responder(self, metodo, ruta, cuerpo):
+
+        # (estado HTTP, respuesta JSON) para un pedido
+
+        if metodo == "GET" and ruta == "/estado":
+            return 200, self.estado()
+
+        if ruta.startswith("/eventos/"):
+            if metodo != "DELETE":
+                return 405, {"error": "Método no permitido"}
+            return await self._escritura(self._eliminar, unquote(ruta[len("/eventos/"):]))
+
+        if ruta != "/eventos" and ruta not in self.consultas:
+            return 404, {"error": f"Ruta desconocida: {ruta}"}
+        if metodo != "POST":
+            return 405, {"error": "Método no permitido"}
+
+        try:
+            datos = json.loads(cuerpo or b"{}")
+        except ValueError as error:
+            return 400, {"error": f"JSON inválido: {error}"}
+
+        if ruta == "/eventos":
+            try:
+                evento = evento_desde_objeto(datos)
+            except (KeyError, TypeError, ValueError) as error:
+                return 400, {"error": f"Pedido inválido: {error}"}
+            if not isinstance(evento.get("id", ""), str):
+                return 400, {"error": "Pedido inválido: 'id' debe ser texto"}
+            if "recurrencia" in evento:
+                return await self._escritura(self._agregar_serie, evento)
+            return await self._escritura(None, evento)
+        return await self._consulta(self.consultas[ruta], datos, (ruta, cuerpo))
+
+
+    def estado(self):
+
+        consultas, lotes = self.contadores["consultas"], self.contadores["lotes"]
+        return {
+            **self.contadores,
+            "consultas_por_lote": round(consultas / lotes, 2) if lotes else 0.0,
+            "pendientes": {"consultas": len(self._consultas), "escrituras": len(self._escrituras)},
+            "eventos": len(self.planificador.eventos),
+            "series": len(self.planificador.series),
+            "sugerencias": self.planificador.estadisticas_sugerencias(),
+        }
+
+
+    # Colas
+
+    async def _consulta(self, operacion, datos, clave):
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._consultas.append((operacion, clave, datos, futuro))
+        self._trabajo.set()
+        return await futuro
+
+
+    async def _escritura(self, operacion, datos):
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._escrituras.append((operacion, datos, futuro))
+        self._trabajo.set()
+        return await futuro
+
+
+    async def _despachar(self):
+
+        # Alterna un lote con las consultas pendientes y uno con las escrituras pendientes
+        # (hasta lote_maximo cada uno). Mientras el hilo del planificador trabaja, lo que
+        # llega se acumula para la vuelta siguiente.
+
+        while True:
+            await self._trabajo.wait()
+            self._trabajo.clear()
+
+            while self._consultas or self._escrituras:
+                if self._consultas:
+                    lote = self._consultas[:self.lote_maximo]
+                    del self._consultas[:self.lote_maximo]
+                    await self._resolver(
+                        lote, self._evaluar_lote, [(op, clave, datos) for op, clave, datos, _ in lote]
+                    )
+
+                if self._escrituras:
+                    lote = [self._escrituras.popleft() for _ in range(min(self.lote_maximo, len(self._escrituras)))]
+                    await self._resolver(lote, self._aplicar_escrituras, [(op, datos) for op, datos, _ in lote])
+
+
+    async def _resolver(self, lote, evaluar, pedidos):
+
+        # Corre evaluar(pedidos) en el hilo del planificador y responde cada futuro del lote.
+        # Si falla el lote entero (p. ej. un restricciones.json roto al recargar), todos
+        # reciben un 500 y el despachador sigue atendiendo los lotes siguientes.
+
+        try:
+            respuestas = await asyncio.get_running_loop().run_in_executor(self._hilo, evaluar, pedidos)
+        except Exception as error:
+            respuestas = [(500, {"error": f"{type(error).__name__}: {error}"})] * len(lote)
+
+        for (*_, futuro), respuesta in zip(lote, respuestas):
+            if not futuro.done():
+                futuro.set_result(respuesta)
+
+
+    def _evaluar_lote(self, lote):
+
+        # En el hilo del planificador: una sola mirada a los archivos por lote
+        # (cambios de otra sesión o de las reglas) y cada consulta distinta una vez.
+
+        self.planificador.recargar_si_modificado()
+
+        calculadas = {}
+        respuestas = []
+        for operacion, clave, datos in lote:
+            if clave not in calculadas:
+                calculadas[clave] = _ejecutar(operacion, datos)
+            respuestas.append(calculadas[clave])
+
+        self.contadores["consultas"] += len(lote)
+        self.contadores["calculadas"] += len(calculadas)
+        self.contadores["lotes"] += 1
+        return respuestas
+
+
+    def _aplicar_escrituras(self, escrituras):
+
+        # En el hilo del planificador, en orden de llegada. Las altas de eventos seguidas
+        # van juntas en agregar_eventos_lote: se validan igual, cada una contra la agenda
+        # con las anteriores, pero se guardan de una vez (un solo fsync por tanda).
+
+        respuestas = [None] * len(escrituras)
+        altas = []
+        ids_altas = set()  # ids propios de las altas todavía sin confirmar
+
+        def confirmar_altas():
+            if not altas:
+                return
+            try:
+                resultados = self.planificador.agregar_eventos_lote([evento for _, evento in altas])
+            except Exception as error:
+                resultados = [error] * len(altas)
+            for (i, evento), resultado in zip(altas, resultados):
+                if isinstance(resultado, Exception):
+                    respuestas[i] = 500, {"error": f"{type(resultado).__name__}: {resultado}"}
+                elif resultado[0]:
+                    respuestas[i] = 201, {"id": evento["id"]}
+                else:
+                    respuestas[i] = 409, {"errores": resultado[1]}
+            altas.clear()
+            ids_altas.clear()
+
+        for i, (operacion, datos) in enumerate(escrituras):
+            if operacion is None:
+                if self._id_existente(datos) or datos.get("id") in ids_altas:
+                    respuestas[i] = _id_repetido(datos)
+                    continue
+                altas.append((i, datos))
+                if "id" in datos:
+                    ids_altas.add(datos["id"])
+                continue
+
+            confirmar_altas()
+            respuestas[i] = _ejecutar(operacion, datos)
+
+        confirmar_altas()
+        self.contadores["escrituras"] += len(escrituras)
+        return respuestas
+
+
+    # Operaciones (corren en el hilo del planificador)
+
+    def _validar(self, datos):
+
+        evento = evento_desde_objeto(datos)
+        if "recurrencia" in evento:
+            errores = self.planificador._validar_serie(evento)
+        else:
+            _, errores = self.planificador.validar_evento(evento)
+        return 200, {"valido": not errores, "errores": errores}
+
+
+    def _id_existente(self, evento):
+
+        # Un id propio que ya usa otro evento o serie (como en importacion.importar)
+
+        return "id" in evento and (
+            self.planificador.obtener_evento(evento["id"]) is not None or
+            self.planificador.obtener_serie(evento["id"]) is not None
+        )
+
+
+    def _agregar_serie(self, serie):
+
+        if self._id_existente(serie):
+            return _id_repetido(serie)
+
+        exito, errores = self.planificador.agregar_serie(serie)
+        if not exito:
+            return 409, {"errores": errores}
+        return 201, {"id": serie["id"]}
+
+
+    def _eliminar(self, id_evento):
+
+        exito, mensaje = self.planificador.eliminar_evento_por_id(id_evento)
+        if not exito and self.planificador.obtener_serie(id_evento) is not None:
+            exito, mensaje = self.planificador.eliminar_serie(id_evento)
+
+        if not exito:
+            return 404, {"error": mensaje}
+        return 200, {"id": id_evento}
+
+
+    def _disponibilidad(self, datos):
+
+        # Días de [desde, hasta] (por defecto los próximos 30) donde entra el paquete
+        # de recursos, con la sala libre si se indica
+
+        desde = date.fromisoformat(datos["desde"]) if "desde" in datos else date.today()
+        hasta = date.fromisoformat(datos["hasta"]) if "hasta" in datos else desde + timedelta(days=30)
+        if hasta < desde:
+            raise ValueError("'hasta' es anterior a 'desde'")
+
+        recursos = datos.get("recursos", {})
+        if not isinstance(recursos, dict):
+            raise TypeError("'recursos' debe ser un objeto {recurso: cantidad}")
+
+        dias = self.planificador.dias_disponibles(desde, hasta, recursos, datos.get("sala"))
+        return 200, {"dias": [dia.isoformat() for dia in sorted(dias)]}
+
+
+    def _sugerir(self, datos):
+
+        # Próxima fecha libre en la misma sala y las k alternativas más cercanas en cualquier sala
+
+        k = datos.pop("k", 5)
+        if not isinstance(k, int) or isinstance(k, bool):
+            raise ValueError("'k' debe ser un número entero")
+        evento = evento_desde_objeto(datos)
+        fecha = self.planificador.sugerir_proxima_fecha_libre(evento["sala"], evento["fecha"].date(), evento)
+        alternativas = self.planificador.sugerir_alternativas(evento, k)
+        return 200, {
+            "fecha": fecha.isoformat() if fecha is not None else None,
+            "alternativas": [{**a, "fecha": a["fecha"].isoformat()} for a in alternativas],
+        }
+
+
+    # HTTP/1.1 mínimo, con conexiones persistentes
+
+    async def _atender(self, lector, escritor):
+
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+
+                partes = linea.decode("latin-1").split()
+                if len(partes) != 3:
+                    await _enviar(escritor, 400, {"error": "Pedido HTTP inválido"}, False)
+                    break
+                metodo, destino, version = partes
+
+                cabeceras = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b"\r\n", b"\n", b""):
+                        break
+                    nombre, _, valor = linea.decode("latin-1").partition(":")
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+
+                seguir = version == "HTTP/1.1" and cabeceras.get("connection", "").lower() != "close"
+
+                largo = int(cabeceras.get("content-length") or 0)
+                if largo > MAX_CUERPO:
+                    await _enviar(escritor, 413, {"error": "Cuerpo demasiado grande"}, False)
+                    break
+                cuerpo = await lector.readexactly(largo) if largo else b""
+
+                estado, respuesta = await self.responder(metodo, urlsplit(destino).path, cuerpo)
+                await _enviar(escritor, estado, respuesta, seguir)
+                if not seguir:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+
+def _id_repetido(evento):
+    return 409, {"errores": [f"Ya existe un evento con el id '{evento['id']}'."]}
+
+
+def _ejecutar(operacion, datos):
+
+    # Errores en los datos del pedido -> 400; cualquier otro -> 500
+
+    try:
+        return operacion(datos)
+    except (KeyError, TypeError, ValueError) as error:
+        return 400, {"error": f"Pedido inválido: {error}"}
+    except Exception as error:
+        return 500, {"error": f"{type(error).__name__}: {error}"}
+
+
+async def _enviar(escritor, estado, respuesta, seguir):
+
+    cuerpo = json.dumps(respuesta, ensure_ascii=False).encode("utf-8")
+    escritor.write(
+        f"HTTP/1.1 {estado} {RAZONES.get(estado, '')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(cuerpo)}\r\n"
+        f"Connection: {'keep-alive' if seguir else 'close'}\r\n\r\n".encode("latin-1") + cuerpo
+    )
+    await escritor.drain()
+
+
+def main(argumentos=None):
+
+    parser = argparse.ArgumentParser(prog="python -m servicio", description="Servicio HTTP/JSON de reservas")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--eventos", default="data/eventos.json",
+                        help="agenda: JSON (con bitácora .log) o base SQLite (.db)")
+    parser.add_argument("--recursos", default="data/recursos.json")
+    parser.add_argument("--restricciones", default="data/restricciones.json")
+    parser.add_argument("--lote", type=int, default=512, help="consultas por lote como máximo")
+    args = parser.parse_args(argumentos)
+
+    if args.eventos.endswith(".db"):
+        almacenamiento = AlmacenamientoSQLite(args.eventos)
+    else:
+        almacenamiento = DiarioEventos(args.eventos)
+
+    planificador = PlanificadorEventos(almacenamiento)
+    planificador.cargar_recursos_json(args.recursos)
+    planificador.cargar_restricciones_json(args.restricciones)
+    planificador.cargar_eventos()
+
+    try:
+        asyncio.run(ServicioReservas(planificador, args.lote).servir(args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if isinstance(almacenamiento, AlmacenamientoSQLite):
+            almacenamiento.cerrar()
+        else:
+            almacenamiento.esperar()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+from collections import OrderedDict
+from datetime import timedelta
+import threading
+
+
+# Cache de sugerencias de fecha libre.
+#
+# La respuesta de sugerir_proxima_fecha_libre(sala, fecha inicial, recursos) solo
+# depende de la ocupación de los días de su ventana de búsqueda: desde la fecha
+# inicial hasta la fecha sugerida (o hasta el final del año buscado si no hubo
+# ninguna). Un alta o una baja en el día D invalida solo las respuestas cuya
+# ventana incluye D; el resto sigue siendo válido.
+#
+# Las consultas pueden correr sobre una vista vieja de la agenda (ver
+# PlanificadorEventos._publicar_vista). Cada invalidación avanza `generacion`, y una
+# respuesta calculada sobre una vista de otra generación se devuelve pero no se guarda.
+
+
+class CacheSugerencias:
+
+    # LRU de a lo sumo `capacidad` respuestas, con clave
+    # (sala, fecha inicial, vector de recursos normalizado).
+    # Para invalidar sin recorrer todas las entradas, cada una se anota en los
+    # bloques de BLOQUE_DIAS días que toca su ventana.
+
+    BLOQUE_DIAS = 16
+
+    def __init__(self, capacidad=4096, dias_busqueda=365):
+
+        self.capacidad = capacidad
+        self.dias_busqueda = dias_busqueda
+
+        self._entradas = OrderedDict()  # clave -> (fecha sugerida, último día de la ventana)
+        self._por_bloque = {}           # bloque -> {claves cuya ventana lo toca}
+
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+        self.desalojos = 0
+
+        # Varias consultas pueden usar la cache a la vez: el candado protege solo
+        # el LRU, no el cálculo
+        self._candado = threading.Lock()
+        self.generacion = 0
+
+
+    def buscar(self, sala, fecha_inicial, recursos, calcular, generacion=None):
+
+        # Respuesta cacheada; si no está, la calcula con calcular() y la guarda
+        # (salvo que se haya calculado sobre una generación anterior de la agenda).
+
+        clave = (sala, fecha_inicial, recursos)
+        with self._candado:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[0]
+            self.fallos += 1
+
+        fecha = calcular()
+
+        hasta = fecha if fecha is not None else fecha_inicial + timedelta(days=self.dias_busqueda - 1)
+        with self._candado:
+            if clave in self._entradas or generacion not in (None, self.generacion):
+                return fecha
+            self._entradas[clave] = (fecha, hasta)
+            for bloque in self._bloques(fecha_inicial, hasta):
+                self._por_bloque.setdefault(bloque, set()).add(clave)
+
+            if len(self._entradas) > self.capacidad:
+                self._quitar(next(iter(self._entradas)))
+                self.desalojos += 1
+
+        return fecha
+
+
+    def invalidar(self, dias):
+
+        # Descarta las respuestas cuya ventana incluye alguno de los días.
+
+        self.generacion += 1
+        if not self._entradas:
+            return
+
+        with self._candado:
+            for dia in dias:
+                candidatas = self._por_bloque.get(dia.toordinal() // self.BLOQUE_DIAS)
+                if not candidatas:
+                    continue
+                vencidas = [
+                    clave for clave in candidatas
+                    if clave[1] <= dia <= self._entradas[clave][1]
+                ]
+                for clave in vencidas:
+                    self._quitar(clave)
+                self.invalidaciones += len(vencidas)
+
+
+    def limpiar(self):
+
+        self.generacion += 1
+        with self._candado:
+            self.invalidaciones += len(self._entradas)
+            self._entradas.clear()
+            self._por_bloque.clear()
+
+
+    def estadisticas(self):
+
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "entradas": len(self._entradas),
+            "capacidad": self.capacidad,
+            "invalidaciones": self.invalidaciones,
+            "desalojos": self.desalojos,
+        }
+
+
+    def _quitar(self, clave):
+
+        _, hasta = self._entradas.pop(clave)
+        for bloque in self._bloques(clave[1], hasta):
+            claves = self._por_bloque[bloque]
+            claves.discard(clave)
+            if not claves:
+                del self._por_bloque[bloque]
+
+
+    def _bloques(self, desde, hasta):
+        return range(desde.toordinal() // self.BLOQUE_DIAS, hasta.toordinal() // self.BLOQUE_DIAS + 1)
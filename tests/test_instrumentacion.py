@@ -0,0 +1,41 @@
+from instrumentacion import percentil
+
+
+# percentil por rango más cercano: el valor en la posición ceil(p/100 * n) (1-based).
+# Lo usan los reportes de benchmarks/suite.py y el cliente de benchmarks/carga_servicio.py.
+
+def test_percentil_largo_impar():
+    valores = [10, 20, 30, 40, 50]
+    assert percentil(valores, 50) == 30
+    assert percentil(valores, 90) == 50
+    assert percentil(valores, 20) == 10
+    assert percentil(valores, 21) == 20
+
+
+def test_percentil_largo_par():
+    valores = [10, 20, 30, 40]
+    assert percentil(valores, 50) == 20
+    assert percentil(valores, 75) == 30
+    assert percentil(valores, 76) == 40
+    assert percentil(valores, 90) == 40
+
+
+def test_percentil_mitad_exacta_no_redondea_al_par():
+    # round() daría 0.5 -> 0 y 2.5 -> 2; el rango más cercano sube siempre
+    assert percentil([1, 2], 25) == 1
+    assert percentil([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 25) == 3
+    assert percentil([1, 2], 50) == 1
+
+
+def test_percentil_p_entero_sin_error_de_redondeo():
+    valores = list(range(1, 101))
+    assert percentil(valores, 7) == 7
+    assert percentil(valores, 99) == 99
+
+
+def test_percentil_extremos():
+    valores = [3, 5, 8]
+    assert percentil(valores, 0) == 3
+    assert percentil(valores, 100) == 8
+    assert percentil([42], 50) == 42
+    assert percentil([], 50) == 0.0